@@ -3,7 +3,11 @@ from django.conf import settings
 from rest_framework.routers import DefaultRouter, SimpleRouter
 
 # SpotUs
-from spotus.assignments.viewsets import ResponseViewSet
+from spotus.assignments.viewsets import (
+    AssignmentViewSet,
+    ResponseViewSet,
+    WebhookViewSet,
+)
 from spotus.users.api.views import UserViewSet
 
 if settings.DEBUG:
@@ -12,7 +16,9 @@ else:
     router = SimpleRouter()
 
 router.register("users", UserViewSet)
+router.register("assignments", AssignmentViewSet)
 router.register("assignment-responses", ResponseViewSet)
+router.register("assignment-webhooks", WebhookViewSet)
 
 
 app_name = "api"
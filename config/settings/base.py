@@ -1,6 +1,9 @@
 """
 Base settings to build other settings files upon.
 """
+# Django
+from celery.schedules import crontab
+
 # Standard Library
 from pathlib import Path
 
@@ -44,6 +47,16 @@ LOCALE_PATHS = [str(ROOT_DIR / "locale")]
 # https://docs.djangoproject.com/en/dev/ref/settings/#databases
 DATABASES = {"default": env.db("DATABASE_URL")}
 DATABASES["default"]["ATOMIC_REQUESTS"] = True
+# an optional read replica, for read heavy views and tasks which tolerate lag
+if env("DATABASE_REPLICA_URL", default=""):
+    DATABASES["replica"] = env.db("DATABASE_REPLICA_URL")
+    REPLICA_DATABASE = "replica"
+else:
+    REPLICA_DATABASE = None
+DATABASE_ROUTERS = ["spotus.core.replica.ReplicaRouter"]
+# how long to read from the primary after a user writes, in seconds
+REPLICA_PIN_SECONDS = env.int("REPLICA_PIN_SECONDS", default=15)
+REPLICA_PIN_COOKIE = "pin_primary"
 
 # URLS
 # ------------------------------------------------------------------------------
@@ -92,7 +105,7 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#authentication-backends
 AUTHENTICATION_BACKENDS = [
-    "rules.permissions.ObjectPermissionBackend",
+    "spotus.core.backends.CachedObjectPermissionBackend",
     "squarelet_auth.backends.SquareletBackend",
     "django.contrib.auth.backends.ModelBackend",
 ]
@@ -154,6 +167,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "spotus.core.replica.PinPrimaryMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.common.BrokenLinkEmailsMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
@@ -235,6 +249,12 @@ SECURE_BROWSER_XSS_FILTER = True
 # https://docs.djangoproject.com/en/dev/ref/settings/#x-frame-options
 X_FRAME_OPTIONS = "DENY"
 
+# MESSAGES
+# ------------------------------------------------------------------------------
+# https://docs.djangoproject.com/en/dev/ref/settings/#message-storage
+# signed cookies, so that messages for anonymous visitors never create a session
+MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+
 # EMAIL
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#email-backend
@@ -243,6 +263,8 @@ EMAIL_BACKEND = env(
 )
 # https://docs.djangoproject.com/en/dev/ref/settings/#email-timeout
 EMAIL_TIMEOUT = 5
+# blind copied on every templated email
+DIAGNOSTICS_EMAIL = env("DIAGNOSTICS_EMAIL", default="diagnostics@muckrock.com")
 
 # ADMIN
 # ------------------------------------------------------------------------------
@@ -281,13 +303,17 @@ if DEBUG:
         "rules": {"handlers": ["console"], "level": "DEBUG", "propagate": False}
     }
 
+# Redis
+# ------------------------------------------------------------------------------
+REDIS_URL = env("REDIS_URL")
+
 # Celery
 # ------------------------------------------------------------------------------
 if USE_TZ:
     # http://docs.celeryproject.org/en/latest/userguide/configuration.html#std:setting-timezone
     CELERY_TIMEZONE = TIME_ZONE
 # http://docs.celeryproject.org/en/latest/userguide/configuration.html#std:setting-broker_url
-CELERY_BROKER_URL = env("REDIS_URL")
+CELERY_BROKER_URL = REDIS_URL
 # http://docs.celeryproject.org/en/latest/userguide/configuration.html#std:setting-result_backend
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 # http://docs.celeryproject.org/en/latest/userguide/configuration.html#std:setting-accept_content
@@ -304,6 +330,32 @@ CELERY_TASK_TIME_LIMIT = 5 * 60
 CELERY_TASK_SOFT_TIME_LIMIT = 60
 # http://docs.celeryproject.org/en/latest/userguide/configuration.html#beat-scheduler
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# http://docs.celeryproject.org/en/latest/userguide/configuration.html#beat-schedule
+CELERY_BEAT_SCHEDULE = {
+    # drains are normally scheduled on submission, this catches any missed
+    "drain-assignment-submissions": {
+        "task": "spotus.assignments.tasks.drain_submissions",
+        "schedule": 60.0,
+    },
+    # deliveries are normally started on submission, this catches any missed
+    # and retries any which failed
+    "deliver-assignment-webhooks": {
+        "task": "spotus.assignments.tasks.deliver_webhooks",
+        "schedule": 60.0,
+    },
+    "update-assignment-consensus": {
+        "task": "spotus.assignments.tasks.update_open_consensus",
+        "schedule": 15 * 60.0,
+    },
+    "prune-assignment-webhook-events": {
+        "task": "spotus.assignments.tasks.prune_webhook_events",
+        "schedule": crontab(hour=4, minute=0),
+    },
+    "archive-closed-assignments": {
+        "task": "spotus.assignments.tasks.archive_closed_assignments",
+        "schedule": crontab(hour=3, minute=0),
+    },
+}
 # django-compressor
 # ------------------------------------------------------------------------------
 # https://django-compressor.readthedocs.io/en/latest/quickstart/#installation
@@ -326,6 +378,57 @@ TAGGIT_CASE_INSENSITIVE = True
 SPOTUS_URL = env("SPOTUS_URL", default="http://dev.spot.us")
 SQUARELET_URL = env("SQUARELET_URL", default="http://dev.squarelet.com")
 BASE_URL = SPOTUS_URL
+# allow requests to URLs on private networks for users, such as to webhooks,
+# which should only be enabled for development
+ALLOW_PRIVATE_URLS = env.bool("ALLOW_PRIVATE_URLS", default=False)
+
+# how long to cache the embed html for assignment data, in seconds
+ASSIGNMENT_EMBED_CACHE_TIMEOUT = env.int(
+    "ASSIGNMENT_EMBED_CACHE_TIMEOUT", default=7 * 24 * 60 * 60
+)
+# how long browsers and CDNs may cache assignment form schemas, in seconds
+ASSIGNMENT_FORM_MAX_AGE = env.int("ASSIGNMENT_FORM_MAX_AGE", default=5 * 60)
+# the default rate limit for each visitor's submissions or skips per assignment
+ASSIGNMENT_SUBMISSION_RATE = env("ASSIGNMENT_SUBMISSION_RATE", default="20/minute")
+# the rate limit for each user of the assignment responses API
+ASSIGNMENT_API_THROTTLE_RATE = env("ASSIGNMENT_API_THROTTLE_RATE", default="120/minute")
+# how long to wait before saving buffered submissions, in seconds,
+# so they may be saved in batches
+ASSIGNMENT_BUFFER_DELAY = env.int("ASSIGNMENT_BUFFER_DELAY", default=5)
+# how many buffered submissions to save at once
+ASSIGNMENT_BUFFER_BATCH_SIZE = env.int("ASSIGNMENT_BUFFER_BATCH_SIZE", default=500)
+# how many batches to save per drain, to stay within the task time limit
+ASSIGNMENT_BUFFER_MAX_BATCHES = env.int("ASSIGNMENT_BUFFER_MAX_BATCHES", default=20)
+# how long to cache the rendered html for assignment form fields, in seconds
+ASSIGNMENT_FORM_HTML_CACHE_TIMEOUT = env.int(
+    "ASSIGNMENT_FORM_HTML_CACHE_TIMEOUT", default=24 * 60 * 60
+)
+# how long after closing an assignment to archive it, in days
+ASSIGNMENT_ARCHIVE_DAYS = env.int("ASSIGNMENT_ARCHIVE_DAYS", default=90)
+# how long to cache archive files once read from storage, in seconds
+ASSIGNMENT_ARCHIVE_CACHE_TIMEOUT = env.int(
+    "ASSIGNMENT_ARCHIVE_CACHE_TIMEOUT", default=60 * 60
+)
+# how long to cache assignment analytics, in seconds, which are also
+# invalidated whenever the assignment's responses change
+ASSIGNMENT_ANALYTICS_CACHE_TIMEOUT = env.int(
+    "ASSIGNMENT_ANALYTICS_CACHE_TIMEOUT", default=24 * 60 * 60
+)
+# how many responses to load at once when exporting them
+ASSIGNMENT_EXPORT_CHUNK_SIZE = env.int("ASSIGNMENT_EXPORT_CHUNK_SIZE", default=2000)
+# how many contributors to send a bulk message to over each connection to the
+# mail server
+ASSIGNMENT_MESSAGE_BATCH_SIZE = env.int("ASSIGNMENT_MESSAGE_BATCH_SIZE", default=100)
+# how many response events to post to a webhook at once
+ASSIGNMENT_WEBHOOK_BATCH_SIZE = env.int("ASSIGNMENT_WEBHOOK_BATCH_SIZE", default=100)
+# how many batches to post per delivery, to stay within the task time limit
+ASSIGNMENT_WEBHOOK_MAX_BATCHES = env.int("ASSIGNMENT_WEBHOOK_MAX_BATCHES", default=20)
+# how long to wait for a webhook to respond, in seconds
+ASSIGNMENT_WEBHOOK_TIMEOUT = env.int("ASSIGNMENT_WEBHOOK_TIMEOUT", default=10)
+# how many deliveries in a row may fail before a webhook is deactivated
+ASSIGNMENT_WEBHOOK_MAX_FAILURES = env.int("ASSIGNMENT_WEBHOOK_MAX_FAILURES", default=15)
+# how long to keep response events for webhooks, in days
+ASSIGNMENT_WEBHOOK_EVENT_DAYS = env.int("ASSIGNMENT_WEBHOOK_EVENT_DAYS", default=30)
 
 # for sorl-thumbnails to avoid error
 # https://github.com/jazzband/sorl-thumbnail/issues/564
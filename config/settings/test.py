@@ -16,6 +16,18 @@ SECRET_KEY = env(
 # https://docs.djangoproject.com/en/dev/ref/settings/#test-runner
 TEST_RUNNER = "django.test.runner.DiscoverRunner"
 
+# DATABASES
+# ------------------------------------------------------------------------------
+# the replica is a second connection to the test database, so it does not see
+# data written inside a test's transaction on the primary, as with replication
+# lag.  It is only used by tests which enable it.
+DATABASES["replica"] = dict(  # noqa F405
+    DATABASES["default"],  # noqa F405
+    ATOMIC_REQUESTS=False,
+    TEST={"MIRROR": "default"},
+)
+REPLICA_DATABASE = None
+
 # CACHES
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#caches
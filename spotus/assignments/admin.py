@@ -2,10 +2,18 @@
 
 # Django
 from django.contrib import admin
+from django.db import transaction
 from django.urls import reverse
+from django.utils import timezone
 
 # SpotUs
+from spotus.assignments.analytics import invalidate_analytics
+from spotus.assignments.choices import WebhookEventType
 from spotus.assignments.models import Assignment, Choice, Field, Response, Value
+from spotus.assignments.search import update_search_vectors
+from spotus.assignments.tasks import deliver_webhooks, rebuild_search_vectors
+from spotus.assignments.webhooks import record_events
+from spotus.core.throttle import get_throttled_counts
 
 
 class FieldInline(admin.TabularInline):
@@ -27,6 +35,25 @@ class AssignmentAdmin(admin.ModelAdmin):
     search_fields = ("title", "description")
     autocomplete_fields = ("user",)
     save_on_top = True
+    readonly_fields = ("throttled_today",)
+
+    def throttled_today(self, obj):
+        """How many submissions and skips have been throttled today"""
+        counts = get_throttled_counts()
+        return "{} submissions, {} skips".format(
+            counts.get(obj.get_throttle_metric("submit"), 0),
+            counts.get(obj.get_throttle_metric("skip"), 0),
+        )
+
+    def save_related(self, request, form, formsets, change):
+        """Fields may have been edited inline"""
+        assignment = form.instance
+        gallery = assignment.get_gallery_field_ids()
+        super().save_related(request, form, formsets, change)
+        assignment.update_has_gallery()
+        assignment.update_form_version()
+        if assignment.get_gallery_field_ids() != gallery:
+            transaction.on_commit(lambda: rebuild_search_vectors.delay(assignment.pk))
 
 
 class ChoiceInline(admin.TabularInline):
@@ -55,6 +82,11 @@ class FieldAdmin(AssignmentLinkMixin, admin.ModelAdmin):
     fields = ("assignment_link", "label", "type", "order")
     readonly_fields = ("assignment_link",)
 
+    def save_related(self, request, form, formsets, change):
+        """Choices may have been edited inline"""
+        super().save_related(request, form, formsets, change)
+        form.instance.assignment.update_form_version()
+
 
 class ValueInline(admin.TabularInline):
     """Assignment Value inline options"""
@@ -70,3 +102,23 @@ class ResponseAdmin(AssignmentLinkMixin, admin.ModelAdmin):
     fields = ("assignment_link", "user", "datetime", "data")
     readonly_fields = ("assignment_link", "data")
     autocomplete_fields = ("user",)
+
+    def save_related(self, request, form, formsets, change):
+        """Values may have been edited inline, which is recorded as an edit, so
+        that the consensus is recounted
+        """
+        super().save_related(request, form, formsets, change)
+        response = form.instance
+        if any(formset.has_changed() for formset in formsets):
+            response.edit_user = request.user
+            response.edit_datetime = timezone.now()
+            response.save(update_fields=["edit_user", "edit_datetime"])
+        response.update_field_values()
+        update_search_vectors(Response.objects.filter(pk=response.pk))
+        invalidate_analytics(response.assignment_id)
+        if record_events(
+            WebhookEventType.edited, [(response.pk, response.assignment_id)]
+        ):
+            transaction.on_commit(
+                lambda: deliver_webhooks.delay(response.assignment_id)
+            )
@@ -0,0 +1,415 @@
+"""
+Live analytics for an assignment's responses
+
+The answers to choice fields are counted per choice by a single grouped query
+over the assignment's values, which only reads its partition.  The answers to
+number and date fields are streamed from the database in batches, parsed, and
+summarized with a histogram and the outlying answers, which are often typos.
+
+The results are cached, along with the version of the assignment's responses
+they counted, which is replaced whenever they are submitted or edited by
+`invalidate_analytics`.  Counting a million values takes around half a second,
+so rather than recounting a busy assignment on every request, out of date
+results are returned marked as stale while they are recounted in the
+background.  Results which have not been counted yet, or have expired, are
+returned empty and marked as pending, rather than counted during the request.
+"""
+
+# Django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+# Standard Library
+import hashlib
+import json
+import math
+from bisect import bisect_left
+from collections import Counter
+from datetime import date
+from functools import partial
+from operator import itemgetter
+from uuid import uuid4
+
+# SpotUs
+from spotus.assignments.fields import (
+    CheckboxField,
+    CheckboxGroupField,
+    DateField,
+    NumberField,
+    SelectField,
+)
+from spotus.assignments.models import Value
+
+DISTRIBUTION_FIELDS = [SelectField.name, CheckboxField.name, CheckboxGroupField.name]
+STATS_FIELDS = [NumberField.name, DateField.name]
+# checkboxes have no choices, their values are saved from the form's booleans
+CHECKBOX_CHOICES = [("True", "Checked"), ("False", "Unchecked")]
+# only one recount is started for each version of the responses, unless it
+# has not finished by this many seconds
+REFRESH_TIMEOUT = 5 * 60
+# values are read from the database in batches of this size
+BATCH_SIZE = 5000
+HISTOGRAM_BINS = 10
+# how many outlying and unparseable answers to list for each field
+MAX_OUTLIERS = 50
+
+
+def invalidate_analytics(*assignment_pks):
+    """The assignments' responses have changed, so their cached analytics
+    are out of date
+    """
+    cache.delete_many([_version_key(pk) for pk in assignment_pks])
+
+
+def get_distribution(assignment, filters=None, refresh=None):
+    """Count the answers to each of the assignment's choice fields, by choice
+
+    The responses may be filtered by `flag`, `gallery`, `tag`, and by the
+    `start` and `end` dates they were submitted.  If they have changed since
+    they were counted, `refresh` is called once to recount them, and the out
+    of date counts are returned, or no counts if they have not been counted,
+    or they are recounted now if there is no `refresh`
+    """
+    filters = filters or {}
+    return _get_cached(
+        assignment.pk,
+        _distribution_key(assignment.pk, filters),
+        partial(_get_distribution, assignment, filters),
+        refresh,
+        {"responses": None, "fields": []},
+    )
+
+
+def refresh_distribution(assignment, filters):
+    """Recount the answers, and cache the counts"""
+    return _set_cached(
+        assignment.pk,
+        _distribution_key(assignment.pk, filters),
+        partial(_get_distribution, assignment, filters),
+    )
+
+
+def get_stats(assignment, refresh=None):
+    """Summarize the answers to each of the assignment's number and date fields
+
+    If the responses have changed since a field was summarized, `refresh` is
+    called once with the field to summarize it again, as for `get_distribution`
+    """
+    return [
+        get_field_stats(field, refresh and partial(refresh, field))
+        for field in assignment.fields.filter(type__in=STATS_FIELDS, deleted=False)
+    ]
+
+
+def get_field_stats(field, refresh=None):
+    """Summarize the answers to a number or date field"""
+    return _get_cached(
+        field.assignment_id,
+        _stats_key(field.pk),
+        partial(_get_field_stats, field),
+        refresh,
+        {"id": field.pk, "label": field.label, "type": field.type, "count": None},
+    )
+
+
+def refresh_field_stats(field):
+    """Summarize the answers to the field again, and cache the summary"""
+    return _set_cached(
+        field.assignment_id, _stats_key(field.pk), partial(_get_field_stats, field)
+    )
+
+
+def _get_distribution(assignment, filters):
+    """Count the answers, without the cache"""
+    fields = list(
+        assignment.fields.filter(
+            type__in=DISTRIBUTION_FIELDS, deleted=False
+        ).prefetch_related("choices")
+    )
+    if assignment.is_archived:
+        counts, responses = _count_archived(assignment, fields, filters)
+    else:
+        counts, responses = _count(assignment, fields, filters)
+
+    distribution = []
+    for field in fields:
+        if field.type == CheckboxField.name:
+            choices = list(CHECKBOX_CHOICES)
+        else:
+            choices = [(c.value, c.choice) for c in field.choices.all()]
+        field_counts = counts.get(field.pk, {})
+        # answers which are not among the choices, if they have been edited
+        choices += [(v, v) for v in field_counts if v not in dict(choices)]
+        distribution.append(
+            {
+                "id": field.pk,
+                "label": field.label,
+                "type": field.type,
+                "choices": [
+                    {
+                        "value": value,
+                        "label": label,
+                        "count": field_counts.get(value, 0),
+                    }
+                    for value, label in choices
+                ],
+            }
+        )
+    return {"responses": responses, "fields": distribution}
+
+
+def _count(assignment, fields, filters):
+    """Count the answers in the database, grouped by field and value"""
+    response_filters = {"skip": False}
+    if "flag" in filters:
+        response_filters["flag"] = filters["flag"]
+    if "gallery" in filters:
+        response_filters["gallery"] = filters["gallery"]
+    if filters.get("tag"):
+        response_filters["tags__name"] = filters["tag"]
+    if filters.get("start"):
+        response_filters["datetime__date__gte"] = filters["start"]
+    if filters.get("end"):
+        response_filters["datetime__date__lte"] = filters["end"]
+
+    values = (
+        Value.objects.filter(assignment=assignment, field__in=fields)
+        .exclude(value="")
+        .order_by()
+        .values_list("field_id", "value")
+        .annotate(count=Count("pk"))
+    )
+    if len(response_filters) > 1:
+        # filtering on the response's assignment lets the join only read
+        # its partition
+        values = values.filter(
+            response__assignment=assignment,
+            **{f"response__{k}": v for k, v in response_filters.items()},
+        )
+    counts = {}
+    for field_id, value, count in values:
+        counts.setdefault(field_id, {})[value] = count
+    responses = assignment.responses.filter(**response_filters).count()
+    return counts, responses
+
+
+def _count_archived(assignment, fields, filters):
+    """Count the answers in an archived assignment's responses"""
+    responses = [
+        r
+        for r in assignment.archived_responses
+        if not r.skip
+        and filters.get("flag", r.flag) == r.flag
+        and filters.get("gallery", r.gallery) == r.gallery
+        and (not filters.get("tag") or filters["tag"] in [t.name for t in r.tags.all()])
+        and filters.get("start", date.min)
+        <= timezone.localdate(r.datetime)
+        <= filters.get("end", date.max)
+    ]
+    counts = {}
+    for field in fields:
+        counts[field.pk] = Counter(
+            value
+            for response in responses
+            for value in response.field_values.get(str(field.pk), [])
+            if value
+        )
+    return counts, len(responses)
+
+
+def _get_field_stats(field):
+    """Summarize the answers to the field, without the cache"""
+    if field.type == DateField.name:
+        parse, display = _parse_dates, _display_date
+    else:
+        parse, display = _parse_numbers, float
+
+    numbers, responses, invalid = [], [], []
+    for rows in _get_answers(field):
+        try:
+            numbers.extend(parse(map(itemgetter(1), rows)))
+            responses.extend(map(itemgetter(0), rows))
+        except ValueError:
+            # parse the batch one by one, to find the answers which can not be parsed
+            for response_id, value in rows:
+                try:
+                    numbers.extend(parse([value]))
+                    responses.append(response_id)
+                except ValueError:
+                    invalid.append({"response": response_id, "value": value})
+    stats = {
+        "id": field.pk,
+        "label": field.label,
+        "type": field.type,
+        "count": len(numbers),
+        "invalid": invalid[:MAX_OUTLIERS],
+        "invalid_count": len(invalid),
+    }
+    if not numbers:
+        return stats
+
+    ordered = sorted(numbers)
+    low, high = ordered[0], ordered[-1]
+    first, third = _quantile(ordered, 0.25), _quantile(ordered, 0.75)
+    # Tukey's fences
+    fences = (first - 1.5 * (third - first), third + 1.5 * (third - first))
+    outliers = [
+        (number, response_id)
+        for number, response_id in zip(numbers, responses)
+        if not fences[0] <= number <= fences[1]
+    ]
+    median = _quantile(ordered, 0.5)
+    outliers.sort(key=lambda o: abs(o[0] - median), reverse=True)
+
+    width = (high - low) / HISTOGRAM_BINS
+    if field.type == DateField.name:
+        # bins of whole days, each ending the day before the next one starts
+        width, gap = math.ceil(width), 1
+    else:
+        gap = 0
+    starts = [low]
+    while width and len(starts) < HISTOGRAM_BINS and low + width * len(starts) <= high:
+        starts.append(low + width * len(starts))
+    # the last bin includes the highest answer
+    ends = [start - gap for start in starts[1:]] + [high]
+    indexes = [bisect_left(ordered, start) for start in starts] + [len(ordered)]
+    histogram = [
+        {
+            "start": display(start),
+            "end": display(end),
+            "count": indexes[i + 1] - indexes[i],
+        }
+        for i, (start, end) in enumerate(zip(starts, ends))
+    ]
+
+    stats.update(
+        {
+            "min": display(low),
+            "max": display(high),
+            "mean": display(math.fsum(ordered) / len(ordered)),
+            "median": display(median),
+            "histogram": histogram,
+            "outliers": [
+                {"response": response_id, "value": display(number)}
+                for number, response_id in outliers[:MAX_OUTLIERS]
+            ],
+            "outlier_count": len(outliers),
+        }
+    )
+    return stats
+
+
+def _get_answers(field):
+    """The response ids and answers to the field, in batches"""
+    if field.assignment.is_archived:
+        rows = [
+            (response.pk, value)
+            for response in field.assignment.archived_responses
+            if not response.skip
+            for value in response.field_values.get(str(field.pk), [])
+            if value
+        ]
+        if rows:
+            yield rows
+        return
+    queryset = (
+        Value.objects.filter(assignment_id=field.assignment_id, field=field)
+        .exclude(value="")
+        .values_list("response_id", "value")
+    )
+    # read the rows directly from a server side cursor, as building each one
+    # from the queryset takes longer than summarizing it
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(*queryset.query.sql_with_params())
+        yield from iter(partial(cursor.fetchmany, BATCH_SIZE), [])
+
+
+def _parse_numbers(values):
+    """Parse a batch of number answers"""
+    numbers = list(map(float, values))
+    if not all(map(math.isfinite, numbers)):
+        raise ValueError("Numbers must be finite")
+    return numbers
+
+
+def _parse_dates(values):
+    """Parse a batch of date answers, as the numbers of their days, so that
+    dates may be summarized as numbers
+    """
+    return list(map(date.toordinal, map(date.fromisoformat, values)))
+
+
+def _display_date(number):
+    """The date for a summarized day number"""
+    return date.fromordinal(round(number)).isoformat()
+
+
+def _quantile(ordered, fraction):
+    """The quantile of sorted numbers, interpolating between them"""
+    position = (len(ordered) - 1) * fraction
+    below = math.floor(position)
+    above = min(below + 1, len(ordered) - 1)
+    return ordered[below] + (ordered[above] - ordered[below]) * (position - below)
+
+
+def _get_cached(assignment_pk, key, count, refresh, empty):
+    """Get the cached results, counting them if they are not cached or are out
+    of date and there is no `refresh` to recount them, or returning the
+    `empty` results, pending, while they are counted if they are not cached
+    """
+    version = _get_version(assignment_pk)
+    cached = cache.get(key)
+    if refresh is None and (cached is None or cached["version"] != version):
+        return _set_cached(assignment_pk, key, count)
+    stale = cached is None or cached["version"] != version
+    if stale and cache.add(f"{key}:{version}:refresh", True, REFRESH_TIMEOUT):
+        refresh()
+    if cached is None:
+        return dict(empty, stale=True, pending=True)
+    return dict(cached["results"], stale=stale, pending=False)
+
+
+def _set_cached(assignment_pk, key, count):
+    """Count the results, and cache them for the responses counted"""
+    # read the version first, so that responses changing while they are counted
+    # leave the results out of date
+    version = _get_version(assignment_pk)
+    results = count()
+    cache.set(
+        key,
+        {"version": version, "results": results},
+        settings.ASSIGNMENT_ANALYTICS_CACHE_TIMEOUT,
+    )
+    return dict(results, stale=False, pending=False)
+
+
+def _distribution_key(assignment_pk, filters):
+    """The cache key for the counts of the assignment's filtered responses"""
+    return "assignments:distribution:{}:{}".format(
+        assignment_pk,
+        hashlib.md5(
+            json.dumps(filters, sort_keys=True, default=str).encode("utf8")
+        ).hexdigest(),
+    )
+
+
+def _stats_key(field_pk):
+    """The cache key for the summary of a field's answers"""
+    return f"assignments:stats:{field_pk}"
+
+
+def _version_key(assignment_pk):
+    """The cache key for the version of the assignment's analytics"""
+    return f"assignments:analytics-version:{assignment_pk}"
+
+
+def _get_version(assignment_pk):
+    """Cached analytics are keyed by a version, which is replaced whenever the
+    assignment's responses change
+    """
+    key = _version_key(assignment_pk)
+    cache.add(key, uuid4().hex, None)
+    return cache.get(key)
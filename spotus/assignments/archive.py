@@ -0,0 +1,212 @@
+"""
+Cold storage for closed assignments
+
+Once an assignment is closed, its data, responses and values are only read for
+exports, the gallery and its stats.  Archiving an assignment writes them to a
+single gzipped JSON file in the default storage, laid out by column, as each
+column's values are alike and so compress well, and then deletes the rows from
+the database, along with their consensus.  The assignment then reads them from
+the archive, see `Assignment.archived_responses`, until it is restored.
+"""
+
+# Django
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+# Standard Library
+import gzip
+import json
+import logging
+from datetime import datetime
+
+# Third Party
+from taggit.models import Tag, TaggedItem
+
+# SpotUs
+from spotus.assignments.choices import Status
+from spotus.assignments.models import (
+    Assignment,
+    Consensus,
+    Data,
+    Response,
+    Value,
+    archived_rows,
+)
+from spotus.assignments.search import update_search_vectors
+
+logger = logging.getLogger(__name__)
+
+DATA_COLUMNS = ("id", "url", "metadata")
+RESPONSE_COLUMNS = (
+    "id",
+    "user_id",
+    "public",
+    "ip_address",
+    "datetime",
+    "data_id",
+    "skip",
+    "number",
+    "flag",
+    "gallery",
+    "edit_user_id",
+    "edit_datetime",
+    "submission_id",
+    "field_values",
+)
+VALUE_COLUMNS = ("id", "response_id", "field_id", "value", "original_value")
+CONSENSUS_COLUMNS = (
+    "id",
+    "data_id",
+    "field_id",
+    "value",
+    "count",
+    "total",
+    "agreement",
+    "conflicts",
+)
+
+
+class ArchiveError(Exception):
+    """The assignment can not be archived or restored"""
+
+
+class ArchiveEncoder(DjangoJSONEncoder):
+    """Keep datetimes' microseconds, which DjangoJSONEncoder drops"""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def archive_assignment(assignment_pk):
+    """Move a closed assignment's data, responses and values to its archive"""
+    with transaction.atomic():
+        assignment = Assignment.objects.select_for_update().get(pk=assignment_pk)
+        if assignment.status != Status.closed:
+            raise ArchiveError(f"{assignment} is not closed")
+        if assignment.is_archived:
+            raise ArchiveError(f"{assignment} is already archived")
+
+        # lock the responses, so none are edited after they are archived
+        responses = assignment.responses.select_for_update().order_by("pk")
+        tags = {}
+        for object_id, name in (
+            _tagged_items(assignment)
+            .order_by("pk")
+            .values_list("object_id", "tag__name")
+        ):
+            tags.setdefault(object_id, []).append(name)
+        response_columns = _columns(responses, RESPONSE_COLUMNS)
+        response_columns["tags"] = [tags.get(i, []) for i in response_columns["id"]]
+        columns = {
+            "data": _columns(assignment.data.order_by("pk"), DATA_COLUMNS),
+            "responses": response_columns,
+            "values": _columns(
+                Value.objects.filter(assignment=assignment).order_by("pk"),
+                VALUE_COLUMNS,
+            ),
+            "consensus": _columns(
+                assignment.consensus.order_by("pk"), CONSENSUS_COLUMNS
+            ),
+        }
+        content = gzip.compress(json.dumps(columns, cls=ArchiveEncoder).encode())
+        assignment.archive.save(
+            f"{assignment.pk}.json.gz", ContentFile(content), save=False
+        )
+        # remove the file if the rows can not be deleted
+        name = assignment.archive.name
+        try:
+            _tagged_items(assignment).delete()
+            Value.objects.filter(assignment=assignment).delete()
+            assignment.consensus.all().delete()
+            assignment.responses.all().delete()
+            assignment.data.all().delete()
+            assignment.datetime_archived = timezone.now()
+            assignment.save(update_fields=["archive", "datetime_archived"])
+        except Exception:
+            assignment.archive.storage.delete(name)
+            raise
+
+    logger.info(
+        "Archived %s: %d data, %d responses, %d values, %d bytes",
+        assignment,
+        len(columns["data"]["id"]),
+        len(columns["responses"]["id"]),
+        len(columns["values"]["id"]),
+        len(content),
+    )
+    return assignment
+
+
+def restore_assignment(assignment_pk):
+    """Move an archived assignment's data, responses and values back in to
+    the database
+    """
+    with transaction.atomic():
+        assignment = Assignment.objects.select_for_update().get(pk=assignment_pk)
+        if not assignment.is_archived:
+            raise ArchiveError(f"{assignment} is not archived")
+        columns = assignment.archived_columns
+
+        # rows keep their ids, which the sequences will not give out again
+        Data.objects.bulk_create(
+            Data(assignment=assignment, **row) for row in archived_rows(columns["data"])
+        )
+        rows = archived_rows(columns["responses"])
+        tags = {row["id"]: row.pop("tags") for row in rows}
+        Response.objects.bulk_create(
+            Response(assignment=assignment, **row) for row in rows
+        )
+        Value.objects.bulk_create(
+            Value(assignment=assignment, **row)
+            for row in archived_rows(columns["values"])
+        )
+        Consensus.objects.bulk_create(
+            Consensus(assignment=assignment, **row)
+            for row in archived_rows(columns.get("consensus", {}))
+        )
+        names = {name for response_tags in tags.values() for name in response_tags}
+        tag_objs = Tag.objects.in_bulk(names, field_name="name")
+        tag_objs.update(
+            (name, Tag.objects.create(name=name)) for name in names - tag_objs.keys()
+        )
+        content_type = ContentType.objects.get_for_model(Response)
+        TaggedItem.objects.bulk_create(
+            TaggedItem(
+                content_type=content_type, object_id=response_id, tag=tag_objs[name]
+            )
+            for response_id, response_tags in tags.items()
+            for name in response_tags
+        )
+        update_search_vectors(assignment.responses.all())
+
+        name = assignment.archive.name
+        storage = assignment.archive.storage
+        assignment.archive = ""
+        assignment.datetime_archived = None
+        assignment.save(update_fields=["archive", "datetime_archived"])
+
+    storage.delete(name)
+    logger.info("Restored %s", assignment)
+    return assignment
+
+
+def _columns(queryset, names):
+    """Read the queryset's rows as lists of values by column"""
+    columns = {name: [] for name in names}
+    for row in queryset.values_list(*names).iterator():
+        for name, value in zip(names, row):
+            columns[name].append(value)
+    return columns
+
+
+def _tagged_items(assignment):
+    """The tagged items for the assignment's responses"""
+    return TaggedItem.objects.filter(
+        content_type=ContentType.objects.get_for_model(Response),
+        object_id__in=assignment.responses.values("pk"),
+    )
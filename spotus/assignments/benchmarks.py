@@ -0,0 +1,320 @@
+"""
+Benchmarks for the assignment hot paths, on synthetic data
+
+`seed` creates an assignment with fields, data and responses, with an answer to
+each field, at a given scale, by inserting the rows with set based SQL.  `run`
+runs each benchmark against it, recording the median wall time of several
+runs, and the queries made and the peak memory allocated by a separate run,
+since tracing allocations slows it down.  The results are plain JSON, so runs
+may be saved and compared.
+"""
+
+# Django
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage import default_storage
+from django.db import DatabaseError, connection, transaction
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+# Standard Library
+import os
+import statistics
+import time
+import tracemalloc
+from collections import OrderedDict
+
+# SpotUs
+from spotus.assignments.choices import Status
+from spotus.assignments.forms import AssignmentForm
+from spotus.assignments.models import Assignment, Field, Response
+from spotus.assignments.tasks import ExportCsv
+from spotus.assignments.views import AssignmentDetailView, AssignmentListView
+from spotus.assignments.viewsets import ResponseViewSet
+from spotus.core.querycount import CountQueries
+from spotus.users.models import User
+
+PREFIX = "benchmark-suite-"
+SCALES = OrderedDict([("10k", 10_000), ("100k", 100_000), ("1m", 1_000_000)])
+# distinct answers to each field
+ANSWERS = 100
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(func):
+    """Register a benchmark, which is called with the benchmark's context"""
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def parse_scale(scale):
+    """The number of responses for a scale, such as 100k, or a plain number"""
+    return SCALES.get(scale.lower()) or int(scale)
+
+
+def get_assignment(responses):
+    """The benchmark assignment with this many responses, if it has been seeded"""
+    return Assignment.objects.filter(slug=f"{PREFIX}{responses}").first()
+
+
+@transaction.atomic
+def seed(responses, fields=5, users=1000):
+    """Create a benchmark assignment with this many responses, returning it
+
+    There are half as many data items as responses, so every data item still
+    needs responses.  Half of the responses are from users and half are
+    anonymous, and one in ten are in the gallery.
+    """
+    owner, _ = User.objects.get_or_create(
+        username=f"{PREFIX}owner",
+        defaults={"email": f"{PREFIX}owner@example.com", "name": "Benchmark Owner"},
+    )
+    User.objects.bulk_create(
+        (
+            User(
+                username=f"{PREFIX}{i}",
+                email=f"{PREFIX}{i}@example.com",
+                name=f"Benchmark {i}",
+            )
+            for i in range(users)
+        ),
+        ignore_conflicts=True,
+    )
+    user_ids = list(
+        User.objects.filter(username__regex=rf"^{PREFIX}\d+$")
+        .order_by("pk")
+        .values_list("pk", flat=True)[:users]
+    )
+    assignment = Assignment.objects.create(
+        title=f"Benchmark {responses}",
+        slug=f"{PREFIX}{responses}",
+        user=owner,
+        status=Status.open,
+        description="",
+        submission_emails="",
+    )
+    Field.objects.bulk_create(
+        Field(assignment=assignment, label=f"Field {i}", type="text", order=i)
+        for i in range(fields)
+    )
+    field_ids = list(assignment.fields.values_list("pk", flat=True))
+
+    with connection.cursor() as cursor:
+        try:
+            # checking each value's foreign key to its partitioned response
+            # dominates inserting them, and the rows are consistent by
+            # construction, but only superusers may skip the checks
+            with transaction.atomic():
+                cursor.execute("SET LOCAL session_replication_role = replica")
+        except DatabaseError:
+            pass
+        cursor.execute(
+            """
+            INSERT INTO assignments_data (assignment_id, url, metadata)
+            SELECT %s, '', jsonb_build_object('number', i)
+            FROM generate_series(1, %s) AS i
+            """,
+            [assignment.pk, max(responses // 2, 1)],
+        )
+        # the values are inserted from the responses' field values, so they
+        # always agree
+        cursor.execute(
+            """
+            WITH data AS (
+                SELECT id, row_number() OVER (ORDER BY id) - 1 AS n
+                FROM assignments_data WHERE assignment_id = %(assignment)s
+            ), responses AS (
+                INSERT INTO assignments_response
+                    (assignment_id, data_id, user_id, ip_address, public, datetime,
+                    skip, number, flag, gallery, field_values)
+                SELECT %(assignment)s, data.id,
+                    CASE WHEN i %% 2 = 0
+                        THEN (%(users)s::int[])[1 + i %% %(user_count)s] END,
+                    CASE WHEN i %% 2 = 1
+                        THEN ('10.0.0.0'::inet + (i %% 65536)) END,
+                    false, now() - i * interval '1 second', false, 1, false,
+                    i %% 10 = 0,
+                    (
+                        SELECT jsonb_object_agg(
+                            field::text,
+                            jsonb_build_array('answer ' || (i * field) %% %(answers)s)
+                        )
+                        FROM unnest(%(fields)s::int[]) AS field
+                    )
+                FROM generate_series(1, %(responses)s) AS i
+                JOIN data ON data.n = i %% (SELECT count(*) FROM data)
+                RETURNING id, field_values
+            )
+            INSERT INTO assignments_value
+                (assignment_id, response_id, field_id, value, original_value)
+            SELECT %(assignment)s, responses.id, field.key::int, answer, answer
+            FROM responses, jsonb_each(responses.field_values) AS field,
+                jsonb_array_elements_text(field.value) AS answer
+            """,
+            {
+                "assignment": assignment.pk,
+                "users": user_ids,
+                "user_count": len(user_ids),
+                "answers": ANSWERS,
+                "fields": field_ids,
+                "responses": responses,
+            },
+        )
+    return assignment
+
+
+def clear(assignment):
+    """Delete a benchmark assignment, and its data, responses and values"""
+    with transaction.atomic(), connection.cursor() as cursor:
+        for table in ("value", "response", "data", "field"):
+            cursor.execute(
+                f"DELETE FROM assignments_{table} WHERE assignment_id = %s",
+                [assignment.pk],
+            )
+        assignment.delete()
+
+
+def analyze():
+    """Update the planner's statistics after seeding"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "ANALYZE users_user, assignments_assignment, assignments_data, "
+            "assignments_field, assignments_response, assignments_value"
+        )
+
+
+def run(assignment, runs=5, names=None):
+    """Run the benchmarks against the assignment, returning their results"""
+    context = get_context(assignment)
+    results = OrderedDict()
+    for name, func in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        results[name] = measure(lambda f=func: f(context), runs)
+    return {
+        "responses": context["responses"],
+        "runs": runs,
+        "datetime": timezone.now().isoformat(),
+        "results": results,
+    }
+
+
+def measure(func, runs):
+    """The queries made and peak memory allocated by one run of the function,
+    and the median wall time of several more
+    """
+    with CountQueries() as queries:
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {
+        "wall_ms": round(statistics.median(times) * 1000, 2),
+        "min_ms": round(min(times) * 1000, 2),
+        "queries": len(queries),
+        "peak_memory_kb": round(peak / 1024),
+    }
+
+
+def get_context(assignment):
+    """The objects the benchmarks use, loaded once"""
+    response = assignment.responses.exclude(user=None).select_related("user").first()
+    return {
+        "assignment": assignment,
+        "owner": assignment.user,
+        "contributor": response.user if response else assignment.user,
+        "datum": assignment.data.order_by("pk").first(),
+        "answers": {
+            str(pk): "answer" for pk in assignment.fields.values_list("pk", flat=True)
+        },
+        "responses": assignment.responses.count(),
+    }
+
+
+def _host():
+    """A host the requests may be made to"""
+    hosts = [h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"]
+    return hosts[0] if hosts else "testserver"
+
+
+def _request(user, path):
+    """A GET request from the user, with the messages the views use"""
+    request = RequestFactory(HTTP_HOST=_host()).get(path)
+    request.user = user
+    request._messages = default_storage(request)  # pylint: disable=protected-access
+    return request
+
+
+@benchmark
+def get_data_to_show(context):
+    """Choose the next data item for a contributor"""
+    context["assignment"].get_data_to_show(context["contributor"], None)
+
+
+@benchmark
+def assignment_form(context):
+    """Build the assignment's form for a data item"""
+    AssignmentForm(
+        assignment=context["assignment"],
+        user=context["contributor"],
+        datum=context["datum"],
+    )
+
+
+@benchmark
+def create_values(context):
+    """Save a response's answers, rolled back so each run is the same"""
+    with transaction.atomic():
+        response = Response.objects.create(
+            assignment=context["assignment"],
+            user=context["contributor"],
+            data=context["datum"],
+            number=1,
+        )
+        response.create_values(context["answers"])
+        transaction.set_rollback(True)
+
+
+@benchmark
+def export_csv(context):
+    """Write every response to a CSV, which is discarded"""
+    export = ExportCsv(context["owner"].pk, context["assignment"].pk)
+    with open(os.devnull, "w") as out_file:
+        export.generate_file(out_file)
+
+
+@benchmark
+def responses_api(context):
+    """The first page of the assignment's responses from the API, as its owner"""
+    request = APIRequestFactory(HTTP_HOST=_host()).get(
+        "/api/assignment-responses/", {"assignment": context["assignment"].pk}
+    )
+    force_authenticate(request, user=context["owner"])
+    ResponseViewSet.as_view({"get": "list"})(request).render()
+
+
+@benchmark
+def detail_view(context):
+    """The assignment's detail page, as its owner"""
+    assignment = context["assignment"]
+    request = _request(context["owner"], assignment.get_absolute_url())
+    AssignmentDetailView.as_view()(
+        request, slug=assignment.slug, pk=assignment.pk
+    ).render()
+
+
+@benchmark
+def list_view(context):
+    """The assignment list, anonymously"""
+    request = _request(AnonymousUser(), reverse("assignments:list"))
+    AssignmentListView.as_view()(request).render()
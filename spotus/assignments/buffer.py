@@ -0,0 +1,228 @@
+"""
+Buffered submissions for assignments
+
+Assignments embedded on busy sites may receive bursts of submissions, and
+saving each one in its own request backs up the web workers on lock and write
+contention.  For assignments with buffered submissions enabled, validated
+submissions are instead pushed on to a Redis list, and a task drains them
+into the database in batches.
+
+Each batch is moved on to a processing list while it is saved, and only
+removed once the save has committed, so a batch which fails is saved again by
+the next drain.  Each submission has a unique ID which is stored on its
+response, so a batch which is saved twice does not create duplicates.
+
+Submissions are numbered when they are saved, after their contributor's
+earlier responses to the same data, so submissions made in quick succession,
+before the earlier ones were saved, are still numbered in order.
+"""
+
+# Django
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Standard Library
+import json
+import uuid
+from collections import Counter
+
+# SpotUs
+from spotus.assignments.analytics import invalidate_analytics
+from spotus.assignments.choices import WebhookEventType
+from spotus.assignments.leaderboard import record_responses
+from spotus.assignments.models import Assignment, Data, Field, Response, Value
+from spotus.assignments.search import update_search_vectors
+from spotus.assignments.webhooks import record_events
+from spotus.core.redis import get_redis
+from spotus.users.models import User
+
+BUFFER_KEY = "assignments:submissions"
+PROCESSING_KEY = "assignments:submissions:processing"
+SCHEDULED_KEY = "assignments:submissions:scheduled"
+LOCK_KEY = "assignments:submissions:lock"
+# this should outlast the drain task's time limit
+LOCK_TIMEOUT = 10 * 60
+
+
+def buffer_submission(assignment, user, ip_address, data, form_data):
+    """Push a validated submission on to the buffer
+
+    Returns True if this is the first submission since the buffer was last
+    drained, in which case the caller should schedule a drain
+    """
+    submission = {
+        "id": str(uuid.uuid4()),
+        "assignment": assignment.pk,
+        "user": user.pk if user else None,
+        "ip_address": ip_address,
+        "data": data.pk if data else None,
+        "public": form_data.get("public", False),
+        "datetime": timezone.now().isoformat(),
+        "values": [
+            [pk, str(value)] for pk, value in Response.get_value_items(form_data)
+        ],
+    }
+    pipeline = get_redis().pipeline()
+    pipeline.lpush(BUFFER_KEY, json.dumps(submission))
+    pipeline.set(SCHEDULED_KEY, 1, nx=True, ex=settings.ASSIGNMENT_BUFFER_DELAY * 10)
+    _, scheduled = pipeline.execute()
+    return bool(scheduled)
+
+
+def drain_submissions():
+    """Save buffered submissions in batches, returning the new responses, and
+    whether submissions are left over, for which the caller should schedule
+    another drain
+    """
+    conn = get_redis()
+    # submissions after this point schedule a new drain
+    conn.delete(SCHEDULED_KEY)
+    if not conn.set(LOCK_KEY, 1, nx=True, ex=LOCK_TIMEOUT):
+        # another drain is running
+        return [], False
+    try:
+        responses = []
+        for _ in range(settings.ASSIGNMENT_BUFFER_MAX_BATCHES):
+            # finish any batch left over from a failed drain first
+            batch = conn.lrange(PROCESSING_KEY, 0, -1)
+            if not batch:
+                pipeline = conn.pipeline(transaction=False)
+                for _ in range(settings.ASSIGNMENT_BUFFER_BATCH_SIZE):
+                    pipeline.rpoplpush(BUFFER_KEY, PROCESSING_KEY)
+                batch = [s for s in pipeline.execute() if s is not None]
+            if not batch:
+                return responses, False
+            responses.extend(save_submissions([json.loads(s) for s in batch]))
+            conn.delete(PROCESSING_KEY)
+        return responses, bool(conn.llen(BUFFER_KEY))
+    finally:
+        conn.delete(LOCK_KEY)
+
+
+@transaction.atomic
+def save_submissions(submissions):
+    """Bulk create responses and values for the submissions which have not
+    already been saved
+    """
+    saved = {
+        str(pk)
+        for pk in Response.objects.filter(
+            assignment_id__in={s["assignment"] for s in submissions},
+            submission_id__in=[s["id"] for s in submissions],
+        ).values_list("submission_id", flat=True)
+    }
+    submissions = {s["id"]: s for s in submissions if s["id"] not in saved}
+    submissions = list(submissions.values())
+
+    # anything deleted since the submission was buffered is dropped,
+    # as it was by the form view
+    assignments = _existing(Assignment, submissions, "assignment")
+    data = _existing(Data, submissions, "data")
+    users = _existing(User, submissions, "user")
+    fields = set(
+        Field.objects.filter(
+            pk__in={int(pk) for s in submissions for pk, _ in s["values"]}
+        ).values_list("assignment_id", "pk")
+    )
+    submissions = [s for s in submissions if s["assignment"] in assignments]
+    numbers = _numbers(submissions)
+
+    responses = Response.objects.bulk_create(
+        Response(
+            submission_id=s["id"],
+            assignment_id=s["assignment"],
+            user_id=s["user"] if s["user"] in users else None,
+            ip_address=s["ip_address"],
+            data_id=s["data"] if s["data"] in data else None,
+            number=number,
+            public=s["public"],
+            datetime=parse_datetime(s["datetime"]),
+            field_values=_field_values(s, fields),
+        )
+        for s, number in zip(submissions, numbers)
+    )
+    Value.objects.bulk_create(
+        Value(
+            assignment_id=response.assignment_id,
+            response=response,
+            field_id=int(pk),
+            value=value,
+            original_value=value,
+        )
+        for response, submission in zip(responses, submissions)
+        for pk, value in submission["values"]
+        if (submission["assignment"], int(pk)) in fields
+    )
+    update_search_vectors(Response.objects.filter(pk__in=[r.pk for r in responses]))
+    invalidate_analytics(*{r.assignment_id for r in responses})
+    record_events(
+        WebhookEventType.created, [(r.pk, r.assignment_id) for r in responses]
+    )
+    transaction.on_commit(lambda: record_responses(responses))
+    return responses
+
+
+def _numbers(submissions):
+    """Number each submission after its contributor's earlier responses to the
+    same data, counting the submissions before it in this batch, as the form
+    view does for responses which are not buffered
+    """
+    contributors = {_contributor(s) for s in submissions} - {None}
+    counts = Counter()
+    if contributors:
+        responses = (
+            Response.objects.filter(
+                Q(user__in={c[1] for c in contributors if c[1]})
+                | Q(ip_address__in={c[2] for c in contributors if c[2]}),
+                assignment__in={c[0] for c in contributors},
+            )
+            .order_by()
+            .values_list("assignment_id", "user_id", "ip_address", "data_id")
+            .annotate(count=Count("pk"))
+        )
+        counts.update({r[:4]: r[4] for r in responses if r[:4] in contributors})
+    numbers = []
+    for submission in submissions:
+        contributor = _contributor(submission)
+        if contributor is None:
+            numbers.append(1)
+        else:
+            counts[contributor] += 1
+            numbers.append(counts[contributor])
+    return numbers
+
+
+def _contributor(submission):
+    """The submission's assignment, contributor and data, which its number
+    counts responses by, if it has a contributor
+    """
+    if submission["user"] or submission["ip_address"]:
+        return (
+            submission["assignment"],
+            submission["user"],
+            submission["ip_address"],
+            submission["data"],
+        )
+    else:
+        return None
+
+
+def _field_values(submission, fields):
+    """The current values to store on the submission's response"""
+    field_values = {}
+    for pk, value in submission["values"]:
+        if (submission["assignment"], int(pk)) in fields:
+            field_values.setdefault(str(pk), []).append(value)
+    return field_values
+
+
+def _existing(model, submissions, key):
+    """The primary keys which still exist for the model referenced by key"""
+    return set(
+        model.objects.filter(
+            pk__in={s[key] for s in submissions if s[key] is not None}
+        ).values_list("pk", flat=True)
+    )
@@ -15,3 +15,8 @@ class Registration(DjangoChoices):
     required = ChoiceItem(0, _("Required"))
     off = ChoiceItem(1, _("Off"))
     optional = ChoiceItem(2, _("Optional"))
+
+
+class WebhookEventType(DjangoChoices):
+    created = ChoiceItem(0, _("Created"))
+    edited = ChoiceItem(1, _("Edited"))
@@ -0,0 +1,163 @@
+"""
+Consensus across the redundant responses to each data item
+
+When an assignment's data limit is more than one, each data item is answered by
+several people.  For each data item and field, the most common answer is the
+consensus value, and its agreement is the fraction of the responses answering
+the field which gave it.  Answers are compared ignoring case and surrounding
+whitespace, and a multi valued field's answer is all of its values together.
+Blank answers are not counted.
+
+The answers are counted and the results saved by a single grouped query over
+the responses' current values, so the database does the work in bulk, without
+sending the answers back and forth, and the results may be filtered, exported
+and served by the API.  Updates are incremental, recounting only the data items
+whose responses were submitted or edited since the last update, and only
+writing the results which changed.
+"""
+
+# Django
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+# Standard Library
+import logging
+from datetime import timedelta
+
+# SpotUs
+from spotus.assignments.fields import STATIC_FIELDS
+from spotus.assignments.models import Assignment
+
+logger = logging.getLogger(__name__)
+
+# buffered submissions keep the time they were submitted, which may be a little
+# before they are saved, so look back this far before the last update
+OVERLAP = timedelta(minutes=5)
+
+CONSENSUS_SQL = """
+WITH answers AS (
+    SELECT r.id AS response_id, r.data_id, f.id AS field_id, CASE
+        WHEN jsonb_array_length(fv.value) = 1 THEN nullif(btrim(fv.value->>0), '')
+        ELSE (
+            SELECT string_agg(btrim(v), ', ' ORDER BY btrim(v))
+            FROM jsonb_array_elements_text(fv.value) AS v
+            WHERE btrim(v) <> ''
+        )
+    END AS answer
+    FROM assignments_response AS r
+    CROSS JOIN LATERAL jsonb_each(r.field_values) AS fv
+    JOIN assignments_field AS f ON f.id = fv.key::int
+    WHERE r.assignment_id = %(assignment)s
+    AND (%(data)s::int[] IS NULL OR r.data_id = ANY(%(data)s::int[]))
+    AND r.data_id IS NOT NULL
+    AND NOT r.skip
+    AND NOT f.deleted
+    AND f.type <> ALL(%(static)s)
+), counts AS (
+    SELECT data_id, field_id, lower(answer) AS key,
+        mode() WITHIN GROUP (ORDER BY answer) AS value, count(*) AS count,
+        array_agg(response_id ORDER BY response_id) AS responses
+    FROM answers
+    WHERE answer IS NOT NULL
+    GROUP BY data_id, field_id, lower(answer)
+), results AS (
+    SELECT data_id, field_id,
+        (array_agg(value ORDER BY count DESC, key))[1] AS value,
+        max(count) AS count,
+        sum(count) AS total,
+        max(count)::float / sum(count) AS agreement,
+        -- the conflicts are all but the most common answer
+        jsonb_agg(
+            jsonb_build_object('value', value, 'count', count, 'responses', responses)
+            ORDER BY count DESC, key
+        ) - 0 AS conflicts
+    FROM counts
+    GROUP BY data_id, field_id
+), saved AS (
+    -- most of the consensus is unchanged from the last update, and is not
+    -- written again
+    INSERT INTO assignments_consensus AS c (
+        assignment_id, data_id, field_id, value, count, total, agreement,
+        conflicts, datetime_updated
+    )
+    SELECT %(assignment)s, data_id, field_id, value, count, total, agreement,
+        conflicts, now()
+    FROM results
+    ON CONFLICT (data_id, field_id) DO UPDATE SET
+        value = EXCLUDED.value,
+        count = EXCLUDED.count,
+        total = EXCLUDED.total,
+        agreement = EXCLUDED.agreement,
+        conflicts = EXCLUDED.conflicts,
+        datetime_updated = EXCLUDED.datetime_updated
+    WHERE (c.value, c.count, c.total, c.conflicts)
+        IS DISTINCT FROM (EXCLUDED.value, EXCLUDED.count, EXCLUDED.total, EXCLUDED.conflicts)
+    RETURNING 1
+), removed AS (
+    -- data items and fields which are no longer answered
+    DELETE FROM assignments_consensus AS c
+    WHERE c.assignment_id = %(assignment)s
+    AND (%(data)s::int[] IS NULL OR c.data_id = ANY(%(data)s::int[]))
+    AND NOT EXISTS (
+        SELECT 1 FROM results
+        WHERE results.data_id = c.data_id AND results.field_id = c.field_id
+    )
+    RETURNING 1
+)
+SELECT
+    (SELECT count(*) FROM results),
+    (SELECT count(*) FROM saved),
+    (SELECT count(*) FROM removed)
+"""
+
+
+def update_consensus(assignment_pk, full=False):
+    """Update the consensus for the data items which have been responded to
+    since the last update, or for all of them, returning how many data items
+    and fields were counted
+    """
+    started = timezone.now()
+    assignment = Assignment.objects.get(pk=assignment_pk)
+    if assignment.is_archived:
+        # the responses are no longer in the database, and the consensus
+        # was archived with them
+        return 0
+    if full or assignment.datetime_consensus is None:
+        data_ids = None
+    else:
+        since = assignment.datetime_consensus - OVERLAP
+        data_ids = list(
+            assignment.responses.filter(
+                Q(datetime__gte=since) | Q(edit_datetime__gte=since)
+            )
+            .exclude(data=None)
+            .order_by()
+            .values_list("data_id", flat=True)
+            .distinct()
+        )
+
+    counted = saved = removed = 0
+    with transaction.atomic():
+        if data_ids != []:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    CONSENSUS_SQL,
+                    {
+                        "assignment": assignment.pk,
+                        "data": data_ids,
+                        "static": STATIC_FIELDS,
+                    },
+                )
+                counted, saved, removed = cursor.fetchone()
+        Assignment.objects.filter(pk=assignment.pk).update(datetime_consensus=started)
+
+    logger.info(
+        "Updated the consensus for %s: %d data items and fields counted, "
+        "%d changed, %d removed",
+        assignment,
+        counted,
+        saved,
+        removed,
+    )
+    return counted
@@ -2,7 +2,13 @@
 
 # Django
 from django import forms
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from django.core.validators import URLValidator, validate_email
+from django.template.loader import render_to_string
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
 # Standard Library
@@ -19,6 +25,31 @@ from spotus.assignments.models import Assignment, Data, Response
 from spotus.assignments.tasks import datum_per_page, import_doccloud_proj
 from spotus.users.models import User
 
+TEMPLATE_TAG_RE = re.compile(r"{\s*(\w+)\s*}")
+
+
+def sub_metadata(text, metadata):
+    """Swap in template tags from the data's metadata"""
+    if text is None or metadata is None:
+        return text
+    text = re.sub(r"{\s*", "{", text)
+    text = re.sub(r"\s*}", "}", text)
+    return text.format_map(metadata)
+
+
+def sub_metadata_html(html, metadata):
+    """Swap in template tags from the data's metadata to rendered html,
+    escaping the values as the template would
+    """
+    if not metadata:
+        return html
+    return TEMPLATE_TAG_RE.sub(
+        lambda match: escape(metadata[match.group(1)])
+        if match.group(1) in metadata
+        else match.group(0),
+        html,
+    )
+
 
 class AssignmentForm(forms.Form):
     """Generic assignment form
@@ -37,45 +68,80 @@ class AssignmentForm(forms.Form):
     )
 
     def __init__(self, *args, **kwargs):
-        assignment = kwargs.pop("assignment")
+        self.assignment = kwargs.pop("assignment")
         datum = kwargs.pop("datum")
-        metadata = datum.metadata if datum else None
+        self.metadata = datum.metadata if datum else None
 
         user = kwargs.pop("user")
         super().__init__(*args, **kwargs)
 
-        def sub(text, metadata):
-            if text is None:
-                return text
-            text = re.sub("{\s*", "{", text)
-            text = re.sub("\s*}", "}", text)
-            return text.format_map(metadata)
-
-        for field in assignment.fields.filter(deleted=False):
+        self.assignment_field_names = []
+        for field in self.assignment.fields.filter(deleted=False).prefetch_related(
+            "choices"
+        ):
             # swap in template tags from metadata
             form_field = field.get_form_field()
-            form_field.label = sub(form_field.label, metadata)
-            form_field.help_text = sub(form_field.help_text, metadata)
-            form_field.initial = sub(form_field.initial, metadata)
+            form_field.label = sub_metadata(form_field.label, self.metadata)
+            form_field.help_text = sub_metadata(form_field.help_text, self.metadata)
+            form_field.initial = sub_metadata(form_field.initial, self.metadata)
             self.fields[str(field.pk)] = form_field
-        if user.is_anonymous and assignment.registration != Registration.off:
-            required = assignment.registration == Registration.required
+            self.assignment_field_names.append(str(field.pk))
+        if user.is_anonymous and self.assignment.registration != Registration.off:
+            required = self.assignment.registration == Registration.required
             self.fields["full_name"] = forms.CharField(
                 label="Full Name or Handle (Public)", required=required
             )
             self.fields["email"] = forms.EmailField(required=required)
-        if assignment.ask_public:
+        if self.assignment.ask_public:
             # move public to the end
             self.fields["public"] = self.fields.pop("public")
         else:
             # remove public
             self.fields.pop("public")
 
+    def render_assignment_fields(self):
+        """Render the assignment's own fields
+
+        Until the form is edited, these render the same for every visitor
+        before their data's metadata is swapped in, so blank forms use html
+        cached per form version and only substitute the metadata
+        """
+        initial = any(name in self.initial for name in self.assignment_field_names)
+        if self.is_bound or initial:
+            return self._render_fields(self.assignment_field_names)
+        key = "assignments:form-html:{}:{}".format(
+            self.assignment.pk, self.assignment.form_version
+        )
+        html = cache.get(key)
+        if html is None:
+            if self.metadata:
+                form = AssignmentForm(
+                    assignment=self.assignment, datum=None, user=AnonymousUser()
+                )
+            else:
+                form = self
+            html = form._render_fields(form.assignment_field_names)
+            cache.set(key, html, settings.ASSIGNMENT_FORM_HTML_CACHE_TIMEOUT)
+        return mark_safe(sub_metadata_html(html, self.metadata))
+
+    def extra_visible_fields(self):
+        """The visible fields which are not from the assignment"""
+        names = set(self.assignment_field_names)
+        return [field for field in self.visible_fields() if field.name not in names]
+
+    def _render_fields(self, names):
+        """Render the given fields"""
+        return "".join(
+            render_to_string("lib/pattern/field.html", {"field": self[name]})
+            for name in names
+        )
+
     def clean_email(self):
         """Do a case insensitive uniqueness check"""
         # XXX should probably do this on squarelet?
         email = self.cleaned_data["email"]
-        if email and User.objects.filter(email__iexact=email).exists():
+        # email is case insensitive, so an exact lookup uses its unique index
+        if email and User.objects.filter(email=email).exists():
             raise forms.ValidationError(
                 _("User with this email already exists. Please login first.")
             )
@@ -268,3 +334,39 @@ class MessageResponseForm(forms.Form):
     )
     subject = forms.CharField()
     body = forms.CharField(widget=forms.Textarea())
+
+
+class BulkMessageForm(forms.Form):
+    """Form to message the authors of an assignment's responses"""
+
+    subject = forms.CharField(max_length=255)
+    body = forms.CharField(widget=forms.Textarea())
+    flag = forms.NullBooleanField(
+        label=_("Flagged"),
+        help_text=_("Only message contributors whose responses are flagged, or not"),
+        required=False,
+    )
+    tag = forms.CharField(
+        help_text=_("Only message contributors whose responses have this tag"),
+        required=False,
+    )
+    data = forms.IntegerField(
+        label=_("Data ID"),
+        help_text=_("Only message contributors who responded to this data item"),
+        min_value=1,
+        required=False,
+    )
+
+    def create_message(self, assignment, user):
+        """Create the message, to be sent to the contributors it is filtered to"""
+        filters = {
+            name: self.cleaned_data[name]
+            for name in ("flag", "tag", "data")
+            if self.cleaned_data[name] not in (None, "")
+        }
+        return assignment.bulk_messages.create(
+            user=user,
+            subject=self.cleaned_data["subject"],
+            body=self.cleaned_data["body"],
+            filters=filters,
+        )
@@ -0,0 +1,191 @@
+"""
+Contributor leaderboards, kept in Redis sorted sets
+
+Each assignment has a leaderboard, and there is one for the whole site.  Every
+response by a registered user, submitted or skipped, adds one to their count in
+a sorted set of all of the contributors.  Only contributors who have asked to be
+publicly credited, by marking a response public, are shown, so their counts are
+copied to a second sorted set of credited contributors, which the leaderboards
+are read from.  Both sets are updated by a Lua script, in a single round trip,
+and reading the top contributors or a contributor's rank is O(log n).
+
+Deleting or editing responses does not update the counts, which may be rebuilt
+from the database by the rebuild_leaderboards command.
+"""
+
+# Django
+from django.contrib.postgres.aggregates import BoolOr
+from django.db.models import Count
+
+# Standard Library
+import logging
+from collections import Counter
+
+# Third Party
+from redis.exceptions import RedisError
+
+# SpotUs
+from spotus.assignments.models import Assignment, Response
+from spotus.core.redis import get_redis
+from spotus.users.models import User
+
+logger = logging.getLogger(__name__)
+
+ALL_KEY = "assignments:leaderboard:{}:all"
+CREDITED_KEY = "assignments:leaderboard:{}:credited"
+SITE = "site"
+
+# for each user and assignment, KEYS are the all and credited contributors' keys
+# for the assignment and for the site, and ARGV is the user, their number of
+# responses and whether any of them were public
+RECORD_SCRIPT = """
+local k = 0
+for i = 1, #ARGV, 3 do
+  local user, count, public = ARGV[i], ARGV[i + 1], ARGV[i + 2]
+  for j = k + 1, k + 4, 2 do
+    local total = redis.call("ZINCRBY", KEYS[j], count, user)
+    if public == "1" then
+      redis.call("ZADD", KEYS[j + 1], total, user)
+    else
+      redis.call("ZADD", KEYS[j + 1], "XX", total, user)
+    end
+  end
+  k = k + 4
+end
+"""
+
+
+def record_responses(responses):
+    """Count new responses towards their assignments' and the site's
+    leaderboards, in a single round trip
+
+    If Redis is unavailable, the responses are not counted rather than failing
+    """
+    counts = Counter()
+    public = set()
+    for response in responses:
+        if response.user_id is not None:
+            counts[response.assignment_id, response.user_id] += 1
+            if response.public:
+                public.add((response.assignment_id, response.user_id))
+    if not counts:
+        return
+
+    keys, args = [], []
+    for (assignment_pk, user_pk), count in counts.items():
+        keys += [
+            ALL_KEY.format(assignment_pk),
+            CREDITED_KEY.format(assignment_pk),
+            ALL_KEY.format(SITE),
+            CREDITED_KEY.format(SITE),
+        ]
+        args += [user_pk, count, int((assignment_pk, user_pk) in public)]
+    try:
+        get_redis().register_script(RECORD_SCRIPT)(keys=keys, args=args)
+    except RedisError:
+        logger.warning("Could not update the leaderboards", exc_info=True)
+
+
+def get_leaderboard(assignment=None, limit=10):
+    """The top credited contributors to the assignment, or to the whole site,
+    and their number of responses
+    """
+    return get_leaderboards([assignment], limit)[assignment]
+
+
+def get_leaderboards(assignments, limit=10):
+    """The top credited contributors to each of the assignments, by assignment,
+    read together
+    """
+    pipeline = get_redis().pipeline(transaction=False)
+    for assignment in assignments:
+        pipeline.zrevrange(
+            CREDITED_KEY.format(_scope(assignment)), 0, limit - 1, withscores=True
+        )
+    try:
+        results = pipeline.execute()
+    except RedisError:
+        logger.warning("Could not read the leaderboards", exc_info=True)
+        results = [[] for _ in assignments]
+    results = [[(int(pk), int(count)) for pk, count in r] for r in results]
+    users = User.objects.in_bulk({pk for result in results for pk, _ in result})
+    return {
+        assignment: [(users[pk], count) for pk, count in result if pk in users]
+        for assignment, result in zip(assignments, results)
+    }
+
+
+def get_rank(user, assignment=None):
+    """The credited contributor's rank and number of responses, for the
+    assignment or the whole site, or None if they are not credited
+    """
+    key = CREDITED_KEY.format(_scope(assignment))
+    pipeline = get_redis().pipeline(transaction=False)
+    pipeline.zrevrank(key, user.pk)
+    pipeline.zscore(key, user.pk)
+    try:
+        rank, count = pipeline.execute()
+    except RedisError:
+        logger.warning("Could not read the leaderboard", exc_info=True)
+        return None
+    if rank is None:
+        return None
+    return rank + 1, int(count)
+
+
+def rebuild_leaderboards():
+    """Recount the leaderboards for every assignment and the whole site from
+    their responses, returning the number of assignments counted
+    """
+    counts = {SITE: Counter()}
+    credited = {SITE: set()}
+
+    def add(assignment_pk, user_pk, count, public):
+        """Count the user's responses to the assignment"""
+        counts.setdefault(assignment_pk, Counter())[user_pk] += count
+        counts[SITE][user_pk] += count
+        if public:
+            credited.setdefault(assignment_pk, set()).add(user_pk)
+            credited[SITE].add(user_pk)
+
+    for assignment_pk, user_pk, count, public in (
+        Response.objects.exclude(user=None)
+        .order_by()
+        .values_list("assignment_id", "user_id")
+        .annotate(count=Count("pk"), public=BoolOr("public"))
+    ):
+        add(assignment_pk, user_pk, count, public)
+    for assignment in Assignment.objects.exclude(archive=""):
+        for response in assignment.archived_responses:
+            if response.user_id is not None:
+                add(assignment.pk, response.user_id, 1, response.public)
+
+    conn = get_redis()
+    stale = set(conn.scan_iter(ALL_KEY.format("*"))) | set(
+        conn.scan_iter(CREDITED_KEY.format("*"))
+    )
+    # the leaderboards are replaced in a transaction, so they are never read
+    # half written
+    pipeline = conn.pipeline()
+    for scope, scope_counts in counts.items():
+        all_key, credited_key = ALL_KEY.format(scope), CREDITED_KEY.format(scope)
+        stale -= {all_key.encode(), credited_key.encode()}
+        pipeline.delete(all_key, credited_key)
+        if scope_counts:
+            pipeline.zadd(all_key, scope_counts)
+        credited_counts = {
+            pk: count
+            for pk, count in scope_counts.items()
+            if pk in credited.get(scope, ())
+        }
+        if credited_counts:
+            pipeline.zadd(credited_key, credited_counts)
+    if stale:
+        pipeline.delete(*stale)
+    pipeline.execute()
+    return len(counts) - 1
+
+
+def _scope(assignment):
+    """The leaderboard for the assignment, or the site"""
+    return SITE if assignment is None else assignment.pk
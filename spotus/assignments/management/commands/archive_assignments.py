@@ -0,0 +1,44 @@
+"""
+Archive closed assignments, or restore archived ones
+"""
+
+# Django
+from django.core.management.base import BaseCommand, CommandError
+
+# SpotUs
+from spotus.assignments.archive import (
+    ArchiveError,
+    archive_assignment,
+    restore_assignment,
+)
+from spotus.assignments.models import Assignment
+
+
+class Command(BaseCommand):
+    """Move closed assignments' data, responses and values to their archives,
+    or with --restore, move them back in to the database
+
+    Closed assignments are also archived by a daily task, once they have been
+    closed for ASSIGNMENT_ARCHIVE_DAYS
+    """
+
+    help = "Archive closed assignments, or restore archived ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument("assignment_ids", nargs="+", type=int)
+        parser.add_argument(
+            "--restore", action="store_true", help="Restore archived assignments"
+        )
+
+    def handle(self, *args, **options):
+        action = restore_assignment if options["restore"] else archive_assignment
+        for assignment_id in options["assignment_ids"]:
+            try:
+                assignment = action(assignment_id)
+            except (ArchiveError, Assignment.DoesNotExist) as exc:
+                raise CommandError(exc)
+            self.stdout.write(
+                "{} {}".format(
+                    "Restored" if options["restore"] else "Archived", assignment
+                )
+            )
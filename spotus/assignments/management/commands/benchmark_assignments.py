@@ -0,0 +1,145 @@
+"""
+Benchmark the assignment hot paths on synthetic data
+"""
+
+# Django
+from django.core.management.base import BaseCommand, CommandError
+
+# Standard Library
+import json
+
+# SpotUs
+from spotus.assignments import benchmarks
+
+# differences smaller than this are noise
+MIN_DIFFERENCE_MS = 1
+
+
+class Command(BaseCommand):
+    """Time the assignment hot paths, and count their queries and peak memory,
+    against a synthetic assignment at each scale
+
+    Use --setup to create the benchmark assignments first, which takes a few
+    minutes at the 1m scale.  Use --output to save the results, and --compare
+    to report any benchmarks which have become slower or make more queries than
+    in saved results.
+    """
+
+    help = "Benchmark the assignment hot paths on synthetic data"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            nargs="+",
+            default=["10k"],
+            help="The number of responses, as 10k, 100k, 1m or a number",
+        )
+        parser.add_argument(
+            "--setup", action="store_true", help="Create the benchmark assignments"
+        )
+        parser.add_argument(
+            "--clear", action="store_true", help="Delete the benchmark assignments"
+        )
+        parser.add_argument("--fields", type=int, default=5, help="Per assignment")
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            choices=list(benchmarks.BENCHMARKS),
+            help="Only run these benchmarks",
+        )
+        parser.add_argument("--output", help="Save the results as JSON to this file")
+        parser.add_argument(
+            "--compare", help="Compare the results to those saved in this file"
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=1.5,
+            help="Report benchmarks this many times slower than the saved results",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            scales = [benchmarks.parse_scale(s) for s in options["scale"]]
+        except ValueError:
+            raise CommandError("Scales must be 10k, 100k, 1m or a number")
+        if options["clear"]:
+            for scale in scales:
+                assignment = benchmarks.get_assignment(scale)
+                if assignment is not None:
+                    benchmarks.clear(assignment)
+            return
+        if options["setup"]:
+            for scale in scales:
+                if benchmarks.get_assignment(scale) is not None:
+                    raise CommandError(f"The {scale} benchmark already exists")
+                self.stdout.write(f"Creating the {scale} benchmark")
+                benchmarks.seed(scale, fields=options["fields"])
+            benchmarks.analyze()
+
+        results = {}
+        for scale in scales:
+            assignment = benchmarks.get_assignment(scale)
+            if assignment is None:
+                raise CommandError(f"No {scale} benchmark, run with --setup first")
+            results[str(scale)] = benchmarks.run(
+                assignment, runs=options["runs"], names=options["only"]
+            )
+            self.report(scale, results[str(scale)]["results"])
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2)
+        if options["compare"]:
+            self.compare(results, options["compare"], options["threshold"])
+
+    def report(self, scale, results):
+        """Write a table of the results"""
+        self.stdout.write(
+            "\n{:<20} {:>10} {:>10} {:>10} {:>12}".format(
+                f"{scale} responses", "wall ms", "min ms", "queries", "peak KiB"
+            )
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                "{:<20} {:>10.2f} {:>10.2f} {:>10} {:>12}".format(
+                    name,
+                    result["wall_ms"],
+                    result["min_ms"],
+                    result["queries"],
+                    result["peak_memory_kb"],
+                )
+            )
+
+    def compare(self, results, path, threshold):
+        """Report benchmarks which are slower, or make more queries, than the
+        saved results
+        """
+        with open(path) as saved_file:
+            saved = json.load(saved_file)
+        regressions = []
+        for scale, scale_results in results.items():
+            saved_results = saved.get(scale, {}).get("results", {})
+            for name, result in scale_results["results"].items():
+                if name not in saved_results:
+                    continue
+                before = saved_results[name]
+                if (
+                    result["wall_ms"] > before["wall_ms"] * threshold
+                    and result["wall_ms"] - before["wall_ms"] > MIN_DIFFERENCE_MS
+                ):
+                    regressions.append(
+                        "{} at {} is slower: {:.2f}ms, was {:.2f}ms".format(
+                            name, scale, result["wall_ms"], before["wall_ms"]
+                        )
+                    )
+                if result["queries"] > before["queries"]:
+                    regressions.append(
+                        "{} at {} makes more queries: {}, was {}".format(
+                            name, scale, result["queries"], before["queries"]
+                        )
+                    )
+        for regression in regressions:
+            self.stdout.write(self.style.WARNING(regression))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS("No benchmarks have regressed"))
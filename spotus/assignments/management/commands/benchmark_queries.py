@@ -0,0 +1,302 @@
+"""
+Benchmark the hot assignment queries with EXPLAIN ANALYZE
+"""
+
+# Django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+# Standard Library
+import json
+import re
+import statistics
+
+# SpotUs
+from spotus.assignments.choices import Status
+from spotus.assignments.models import Assignment, Data, Field, Response, Value
+from spotus.users.models import User
+
+# kept separate from the benchmark_viewable data
+PREFIX = "query-benchmark-"
+PARTITION_RE = re.compile(r"assignments_(response|value)_p\d+$")
+# differences smaller than this are noise
+MIN_DIFFERENCE_MS = 1
+
+
+class Command(BaseCommand):
+    """Run EXPLAIN ANALYZE for each of the hot queries the assignment views
+    make, and report the median execution time and the indexes used
+
+    Use --setup on an empty database to create a large synthetic dataset first.
+    Use --output to save the results, and --compare to report any queries which
+    have become slower than in saved results.
+    """
+
+    help = "Benchmark the hot assignment queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--setup", action="store_true", help="Create the benchmark data"
+        )
+        parser.add_argument("--responses", type=int, default=1_000_000)
+        parser.add_argument("--assignments", type=int, default=1000)
+        parser.add_argument("--data", type=int, default=100, help="Per assignment")
+        parser.add_argument("--fields", type=int, default=5, help="Per assignment")
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--output", help="Save the results as JSON to this file")
+        parser.add_argument(
+            "--compare", help="Compare the results to those saved in this file"
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=1.5,
+            help="Report queries this many times slower than the saved results",
+        )
+
+    def handle(self, *args, **options):
+        if options["setup"]:
+            self.setup(options)
+        results = {}
+        self.stdout.write(
+            "{:<25} {:>10} {:>10} {:>10}  {}".format(
+                "query", "exec ms", "plan ms", "partitions", "indexes"
+            )
+        )
+        for name, queryset in self.get_queries().items():
+            results[name] = self.explain(queryset, options["runs"])
+            self.stdout.write(
+                "{:<25} {:>10.2f} {:>10.2f} {:>10}  {}".format(
+                    name,
+                    results[name]["execution_ms"],
+                    results[name]["planning_ms"],
+                    len(results[name]["partitions"]),
+                    ", ".join(results[name]["indexes"]) or "-",
+                )
+            )
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2)
+        if options["compare"]:
+            self.compare(results, options["compare"], options["threshold"])
+
+    def get_queries(self):
+        """The hot queries, for a typical assignment, data item and user"""
+        assignment = (
+            Assignment.objects.filter(slug__startswith=PREFIX).order_by("pk").first()
+        )
+        if assignment is None:
+            raise CommandError("No benchmark data, run with --setup first")
+        data = assignment.data.order_by("pk").first()
+        field = assignment.fields.order_by("pk").first()
+        response = assignment.responses.exclude(user=None).order_by("pk").first()
+        user = response.user
+        ip_address = (
+            assignment.responses.exclude(ip_address=None)
+            .order_by("pk")
+            .values_list("ip_address", flat=True)
+            .first()
+        )
+        page = list(
+            Response.objects.filter(assignment=assignment)
+            .order_by("-datetime")
+            .values_list("pk", flat=True)[:50]
+        )
+        return {
+            # the response number in the form view
+            "form_number_user": assignment.responses.filter(
+                user=user, ip_address=None, data=data
+            ),
+            "form_number_ip": assignment.responses.filter(
+                user=None, ip_address=ip_address, data=data
+            ),
+            # the data to show in the form view
+            "data_choices_user": assignment.data.get_choices(
+                assignment.data_limit, user, None
+            ),
+            "data_choices_ip": assignment.data.get_choices(
+                assignment.data_limit, None, ip_address
+            ),
+            # the responses API and CSV export
+            "responses_by_datetime": Response.objects.filter(
+                assignment=assignment
+            ).order_by("-datetime")[:50],
+            "gallery_responses": Response.objects.filter(
+                assignment=assignment, gallery=True
+            ).order_by("id")[:50],
+            "response_values": Value.objects.filter(
+                assignment=assignment, response__in=page
+            ),
+            "response_field_values": Value.objects.filter(
+                assignment=assignment, response=response, field=field
+            ),
+            "assignment_fields": assignment.fields.filter(deleted=False),
+            # the registration email check in the assignment form
+            "user_email": User.objects.filter(email=user.email.upper()),
+        }
+
+    def explain(self, queryset, runs):
+        """Median timings and the indexes used by the queryset's plan"""
+        sql, params = queryset.query.sql_with_params()
+        execution, planning = [], []
+        for _ in range(runs):
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params)
+                explain = cursor.fetchone()[0][0]
+            execution.append(explain["Execution Time"])
+            planning.append(explain["Planning Time"])
+        return {
+            "execution_ms": statistics.median(execution),
+            "planning_ms": statistics.median(planning),
+            "indexes": sorted(self.get_indexes(explain["Plan"])),
+            "partitions": sorted(self.get_partitions(explain["Plan"])),
+        }
+
+    def get_indexes(self, plan):
+        """All indexes used in the plan, ignoring any in parts of the plan
+        which were never executed
+        """
+        indexes = set()
+        if "Index Name" in plan and plan["Actual Loops"]:
+            indexes.add(plan["Index Name"])
+        for subplan in plan.get("Plans", []):
+            indexes |= self.get_indexes(subplan)
+        return indexes
+
+    def get_partitions(self, plan):
+        """All partitions read by the plan, ignoring those which were pruned
+        while it was executed
+        """
+        partitions = set()
+        if PARTITION_RE.match(plan.get("Relation Name", "")) and plan["Actual Loops"]:
+            partitions.add(plan["Relation Name"])
+        for subplan in plan.get("Plans", []):
+            partitions |= self.get_partitions(subplan)
+        return partitions
+
+    def compare(self, results, path, threshold):
+        """Report queries which are slower than the saved results"""
+        with open(path) as saved_file:
+            saved = json.load(saved_file)
+        slower = [
+            name
+            for name, result in results.items()
+            if name in saved
+            and result["execution_ms"] > saved[name]["execution_ms"] * threshold
+            and result["execution_ms"] - saved[name]["execution_ms"] > MIN_DIFFERENCE_MS
+        ]
+        for name in slower:
+            self.stdout.write(
+                self.style.WARNING(
+                    "{} is slower: {:.2f}ms, was {:.2f}ms".format(
+                        name,
+                        results[name]["execution_ms"],
+                        saved[name]["execution_ms"],
+                    )
+                )
+            )
+        if not slower:
+            self.stdout.write(self.style.SUCCESS("No queries are slower"))
+
+    @transaction.atomic
+    def setup(self, options):
+        """Create the benchmark data
+        Half of the responses are from users and half are anonymous, one in
+        ten are in the gallery, and each response has a value for each field
+        """
+        if Assignment.objects.filter(slug__startswith=PREFIX).exists():
+            raise CommandError("The benchmark data already exists")
+        User.objects.bulk_create(
+            User(
+                username=f"{PREFIX}{i}",
+                email=f"{PREFIX}{i}@example.com",
+                name=f"Benchmark {i}",
+            )
+            for i in range(options["users"])
+        )
+        staff, _ = User.objects.get_or_create(
+            username=f"{PREFIX}staff",
+            defaults={"email": f"{PREFIX}staff@example.com", "is_staff": True},
+        )
+        Assignment.objects.bulk_create(
+            Assignment(
+                title=f"Benchmark {i}",
+                slug=f"{PREFIX}{i}",
+                user=staff,
+                status=Status.open,
+                description="",
+                submission_emails="",
+            )
+            for i in range(options["assignments"])
+        )
+        assignment_ids = list(
+            Assignment.objects.filter(slug__startswith=PREFIX).values_list(
+                "pk", flat=True
+            )
+        )
+        Field.objects.bulk_create(
+            Field(assignment_id=assignment_id, label=f"Field {i}", type="text", order=i)
+            for assignment_id in assignment_ids
+            for i in range(options["fields"])
+        )
+        Data.objects.bulk_create(
+            Data(assignment_id=assignment_id, url="", metadata={"number": i})
+            for assignment_id in assignment_ids
+            for i in range(options["data"])
+        )
+        user_ids = list(
+            User.objects.filter(username__startswith=PREFIX).values_list(
+                "pk", flat=True
+            )
+        )
+        with connection.cursor() as cursor:
+            # spread the responses evenly over the assignments, and over each
+            # assignment's data
+            cursor.execute(
+                """
+                INSERT INTO assignments_response
+                    (assignment_id, data_id, user_id, ip_address, public, datetime,
+                    skip, number, flag, gallery)
+                SELECT a.id, d.id,
+                    CASE WHEN i %% 2 = 0 THEN (%s::int[])[1 + i %% %s] END,
+                    CASE WHEN i %% 2 = 1
+                        THEN ('10.0.0.0'::inet + (i %% 65536)) END,
+                    false, now() - i * interval '1 second', false, 1, false,
+                    i %% 10 = 0
+                FROM generate_series(1, %s) AS i
+                JOIN LATERAL (
+                    SELECT (%s::int[])[1 + i %% %s] AS id
+                ) a ON true
+                JOIN LATERAL (
+                    SELECT id FROM assignments_data
+                    WHERE assignment_id = a.id
+                    ORDER BY id OFFSET (i / %s) %% %s LIMIT 1
+                ) d ON true
+                """,
+                [
+                    user_ids,
+                    len(user_ids),
+                    options["responses"],
+                    assignment_ids,
+                    len(assignment_ids),
+                    len(assignment_ids),
+                    options["data"],
+                ],
+            )
+            cursor.execute(
+                """
+                INSERT INTO assignments_value
+                    (assignment_id, response_id, field_id, value, original_value)
+                SELECT r.assignment_id, r.id, f.id, 'value ' || r.id, 'value ' || r.id
+                FROM assignments_response r
+                JOIN assignments_field f ON f.assignment_id = r.assignment_id
+                JOIN assignments_assignment a ON a.id = r.assignment_id
+                WHERE a.slug LIKE %s
+                """,
+                [f"{PREFIX}%"],
+            )
+            cursor.execute(
+                "ANALYZE users_user, assignments_assignment, assignments_data, "
+                "assignments_field, assignments_response, assignments_value"
+            )
@@ -0,0 +1,128 @@
+"""
+Benchmark the response visibility filters
+"""
+
+# Django
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+# Standard Library
+import statistics
+import time
+
+# SpotUs
+from spotus.assignments.choices import Status
+from spotus.assignments.models import Assignment, Response
+from spotus.users.models import User
+
+
+class Command(BaseCommand):
+    """Time the viewable response queries for staff, owners, other
+    authenticated users and anonymous users
+
+    Use --setup on an empty database to create the benchmark data first
+    """
+
+    help = "Benchmark the response visibility filters"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--setup", action="store_true", help="Create the benchmark data"
+        )
+        parser.add_argument("--responses", type=int, default=1_000_000)
+        parser.add_argument("--assignments", type=int, default=1000)
+        parser.add_argument("--runs", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if options["setup"]:
+            self.setup(options["responses"], options["assignments"])
+        users = self.get_users()
+        assignment = Assignment.objects.filter(user=users["owner"]).first()
+        self.stdout.write(
+            "{:<15} {:>10} {:>12} {:>12} {:>12}".format(
+                "user", "visible", "count ms", "page ms", "filtered ms"
+            )
+        )
+        for name, user in users.items():
+            queryset = Response.objects.select_related(
+                "assignment", "data", "user", "edit_user"
+            ).get_viewable(user)
+            count = queryset.count()
+            count_ms = self.time(queryset.count, options["runs"])
+            page_ms = self.time(
+                lambda q=queryset: list(q.order_by("id")[:50]), options["runs"]
+            )
+            filtered_ms = self.time(
+                lambda q=queryset: list(
+                    q.filter(assignment=assignment).order_by("id")[:50]
+                ),
+                options["runs"],
+            )
+            self.stdout.write(
+                "{:<15} {:>10} {:>12.1f} {:>12.1f} {:>12.1f}".format(
+                    name, count, count_ms, page_ms, filtered_ms
+                )
+            )
+
+    def time(self, func, runs):
+        """Median time in milliseconds to run the function"""
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        return statistics.median(times) * 1000
+
+    def get_users(self):
+        """Get the users to benchmark as"""
+        return {
+            "staff": User.objects.get(username="benchmark-staff"),
+            "owner": User.objects.get(username="benchmark-owner"),
+            "authenticated": User.objects.get(username="benchmark-user"),
+            "anonymous": AnonymousUser(),
+        }
+
+    @transaction.atomic
+    def setup(self, responses, assignments):
+        """Create the benchmark data
+        One percent of the assignments belong to the owner, half of the
+        assignments are open, and ten percent of the responses are in the gallery
+        """
+        users = {}
+        for name, is_staff in [("staff", True), ("owner", False), ("user", False)]:
+            users[name], _ = User.objects.get_or_create(
+                username=f"benchmark-{name}",
+                defaults={
+                    "email": f"benchmark-{name}@example.com",
+                    "is_staff": is_staff,
+                },
+            )
+        Assignment.objects.bulk_create(
+            Assignment(
+                title=f"Benchmark {i}",
+                slug=f"benchmark-{i}",
+                user=users["owner"] if i % 100 == 0 else users["staff"],
+                status=Status.open if i % 2 == 0 else Status.closed,
+                description="",
+                submission_emails="",
+            )
+            for i in range(assignments)
+        )
+        assignment_ids = list(
+            Assignment.objects.filter(slug__startswith="benchmark-").values_list(
+                "pk", flat=True
+            )
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO assignments_response
+                    (assignment_id, public, datetime, skip, number, flag, gallery)
+                SELECT (%s::int[])[1 + i %% %s], false, now(), false, 1, false,
+                    i %% 10 = 0
+                FROM generate_series(1, %s) AS i
+                """,
+                [assignment_ids, len(assignment_ids), responses],
+            )
+            cursor.execute("ANALYZE assignments_assignment, assignments_response")
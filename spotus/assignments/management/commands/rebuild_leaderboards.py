@@ -0,0 +1,26 @@
+"""
+Rebuild the contributor leaderboards from the database
+"""
+
+# Django
+from django.core.management.base import BaseCommand
+
+# SpotUs
+from spotus.assignments.leaderboard import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    """Recount the leaderboards for every assignment and the whole site from
+    their responses
+
+    The leaderboards are counted as responses are submitted, but are not
+    updated when responses are deleted or edited
+    """
+
+    help = "Rebuild the contributor leaderboards from the database"
+
+    def handle(self, *args, **options):
+        count = rebuild_leaderboards()
+        self.stdout.write(
+            "Rebuilt the leaderboards for the site and {} assignments".format(count)
+        )
@@ -0,0 +1,37 @@
+"""
+Update the consensus for assignments' data items
+"""
+
+# Django
+from django.core.management.base import BaseCommand, CommandError
+
+# SpotUs
+from spotus.assignments.consensus import update_consensus
+from spotus.assignments.models import Assignment
+
+
+class Command(BaseCommand):
+    """Update the consensus for the data items responded to since the last
+    update, or with --full, recount it for all of them
+
+    Open assignments' consensus is also updated by a periodic task
+    """
+
+    help = "Update the consensus for assignments' data items"
+
+    def add_arguments(self, parser):
+        parser.add_argument("assignment_ids", nargs="+", type=int)
+        parser.add_argument(
+            "--full", action="store_true", help="Recount all of the data items"
+        )
+
+    def handle(self, *args, **options):
+        for assignment_id in options["assignment_ids"]:
+            try:
+                count = update_consensus(assignment_id, full=options["full"])
+            except Assignment.DoesNotExist as exc:
+                raise CommandError(exc)
+            self.stdout.write(
+                "Updated the consensus for {} data items and fields of "
+                "assignment {}".format(count, assignment_id)
+            )
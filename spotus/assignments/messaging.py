@@ -0,0 +1,102 @@
+"""
+Messages to an assignment's contributors, sent in bulk
+
+Rendering a message's email inlines its styles, which takes far longer than
+sending it, so it is rendered once with placeholders for the recipient's name
+and email address, which are filled in for each recipient.  The recipients are
+sent the message in batches, each over a single connection to the mail server,
+and each batch adds how many were sent or failed to the message's progress.
+Rather than copying every recipient's email to the diagnostics address, it is
+sent a single copy of each message.
+"""
+
+# Django
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db.models import F
+from django.utils.html import escape
+
+# Standard Library
+import logging
+
+# SpotUs
+from spotus.assignments.models import BulkMessage
+from spotus.core.email import TemplateEmail
+from spotus.users.models import User
+
+logger = logging.getLogger(__name__)
+
+FROM_EMAIL = "info@muckrock.com"
+HTML_TEMPLATE = "assignments/email/message_user.html"
+# placeholders which are left intact by rendering and by converting to text
+NAME = "bulkmessagerecipientname"
+EMAIL = "bulkmessagerecipientemail"
+
+
+def render_message(message):
+    """The html and text of the message's email, for any recipient"""
+    email = _email(message, User(name=NAME, email=EMAIL))
+    return email.alternatives[0][0], email.body
+
+
+def send_diagnostics(message):
+    """Send a single copy of the message, with its placeholders, to the
+    diagnostics address
+    """
+    html, text = render_message(message)
+    _email(message, None, html=html, text=text, to=[settings.DIAGNOSTICS_EMAIL]).send()
+
+
+def send_batch(message, user_pks):
+    """Send the message to a batch of its recipients, over one connection,
+    returning how many were sent and how many failed
+    """
+    html, text = render_message(message)
+    sent = 0
+    with get_connection() as connection:
+        for user in User.objects.filter(pk__in=user_pks).exclude(email=""):
+            email = _email(
+                message,
+                user,
+                html=html.replace(NAME, escape(user.name)).replace(
+                    EMAIL, escape(user.email)
+                ),
+                text=text.replace(NAME, user.name).replace(EMAIL, user.email),
+                connection=connection,
+            )
+            try:
+                email.send()
+                sent += 1
+            # the errors depend on the email backend, and one recipient failing
+            # should not stop the rest of the batch
+            except Exception:
+                logger.warning(
+                    "Could not send bulk message %s to user %s",
+                    message.pk,
+                    user.pk,
+                    exc_info=True,
+                )
+    # including users who have since been deleted or removed their email address
+    failed = len(user_pks) - sent
+    BulkMessage.objects.filter(pk=message.pk).update(
+        sent=F("sent") + sent, failed=F("failed") + failed
+    )
+    return sent, failed
+
+
+def _email(message, user, **kwargs):
+    """The message's email to the user"""
+    return TemplateEmail(
+        subject=message.subject,
+        from_email=FROM_EMAIL,
+        reply_to=[message.user.email],
+        user=user,
+        html_template=HTML_TEMPLATE,
+        bcc_diagnostics=False,
+        extra_context={
+            "body": message.body,
+            "assignment": message.assignment,
+            "from_user": message.user,
+        },
+        **kwargs,
+    )
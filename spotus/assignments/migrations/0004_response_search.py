@@ -0,0 +1,55 @@
+# Generated by Django 3.0.5 on 2026-10-19 01:08
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0003_auto_20200507_1224'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='response',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='search vector'),
+        ),
+        migrations.AddIndex(
+            model_name='response',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='response_search_vector'),
+        ),
+        # icontains lookups compare upper cased text, so index the upper cased text
+        migrations.RunSQL(
+            sql='CREATE INDEX "value_value_trgm" ON "assignments_value" USING gin (UPPER("value") gin_trgm_ops)',
+            reverse_sql='DROP INDEX "value_value_trgm"',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX "taggit_tag_name_trgm" ON "taggit_tag" USING gin (UPPER("name") gin_trgm_ops)',
+            reverse_sql='DROP INDEX "taggit_tag_name_trgm"',
+        ),
+        migrations.RunSQL(
+            sql="""
+            UPDATE "assignments_response" AS r SET "search_vector" =
+                setweight(to_tsvector('simple', COALESCE((
+                    SELECT string_agg(v."value", ' ')
+                    FROM "assignments_value" AS v
+                    WHERE v."response_id" = r."id"
+                ), '')), 'A') ||
+                setweight(to_tsvector('simple', COALESCE((
+                    SELECT string_agg(t."name", ' ')
+                    FROM "taggit_taggeditem" AS ti
+                    JOIN "taggit_tag" AS t ON t."id" = ti."tag_id"
+                    JOIN "django_content_type" AS ct ON ct."id" = ti."content_type_id"
+                    WHERE ct."app_label" = 'assignments' AND ct."model" = 'response'
+                    AND ti."object_id" = r."id"
+                ), '')), 'B')
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.0.5 on 2026-10-19 01:19
+
+from django.db import migrations, models
+
+
+def set_has_gallery(apps, schema_editor):
+    Assignment = apps.get_model('assignments', 'Assignment')
+    Field = apps.get_model('assignments', 'Field')
+    Assignment.objects.filter(
+        pk__in=Field.objects.filter(gallery=True).values('assignment_id')
+    ).update(has_gallery=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0004_response_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='has_gallery',
+            field=models.BooleanField(default=False, editable=False, help_text='Does this assignment have any gallery fields? Kept up to date from the fields', verbose_name='has gallery'),
+        ),
+        migrations.RunPython(set_has_gallery, migrations.RunPython.noop),
+    ]
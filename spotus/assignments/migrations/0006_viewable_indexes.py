@@ -0,0 +1,21 @@
+# Generated by Django 3.0.5 on 2026-10-19 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0005_assignment_has_gallery'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(condition=models.Q(status=1), fields=['id'], name='assignment_open'),
+        ),
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(condition=models.Q(gallery=True), fields=['assignment', 'id'], name='response_gallery'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.5 on 2026-10-19 01:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0006_viewable_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='form_version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Incremented each time the form is changed, for caching', verbose_name='form version'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.0.5 on 2026-10-19 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0007_assignment_form_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='buffer_submissions',
+            field=models.BooleanField(default=False, help_text='Save submissions in batches in the background, for assignments expecting bursts of traffic, such as when embedded on a busy site.  Submissions may take a short while to appear.', verbose_name='buffer submissions'),
+        ),
+        migrations.AddField(
+            model_name='response',
+            name='submission_id',
+            field=models.UUIDField(editable=False, help_text='Identifies buffered submissions, so they are only saved once', null=True, unique=True, verbose_name='submission id'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.0.5 on 2026-10-19 01:42
+
+from django.db import migrations, models
+import spotus.core.throttle
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0008_buffer_submissions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='submission_rate',
+            field=models.CharField(blank=True, help_text='The most submissions or skips each visitor may make, such as 10/minute.  Short bursts are allowed.  Leave blank for the default', max_length=20, validators=[spotus.core.throttle.validate_rate], verbose_name='submission rate'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.0.5 on 2026-10-19 01:45
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('assignments', '0009_assignment_submission_rate'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='response',
+            index=models.Index(condition=models.Q(user__isnull=False), fields=['assignment', 'user'], name='response_assignment_user'),
+        ),
+        AddIndexConcurrently(
+            model_name='response',
+            index=models.Index(condition=models.Q(ip_address__isnull=False), fields=['assignment', 'ip_address'], name='response_assignment_ip'),
+        ),
+        AddIndexConcurrently(
+            model_name='response',
+            index=models.Index(fields=['data', 'number'], name='response_data_number'),
+        ),
+        AddIndexConcurrently(
+            model_name='response',
+            index=models.Index(fields=['assignment', 'datetime'], name='response_assignment_datetime'),
+        ),
+        AddIndexConcurrently(
+            model_name='value',
+            index=models.Index(fields=['response', 'field'], name='value_response_field'),
+        ),
+        migrations.AlterField(
+            model_name='response',
+            name='assignment',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='responses', to='assignments.Assignment', verbose_name='response'),
+        ),
+        migrations.AlterField(
+            model_name='response',
+            name='data',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='responses', to='assignments.Data', verbose_name='data'),
+        ),
+        migrations.AlterField(
+            model_name='value',
+            name='response',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='values', to='assignments.Response', verbose_name='response'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.0.5 on 2026-10-19 01:58
+
+import django.contrib.postgres.fields.jsonb
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+BATCH_SIZE = 10000
+
+
+def set_field_values(apps, schema_editor):
+    """Copy the current values on to their responses, in batches so the
+    response table is not locked for the whole copy
+    """
+    Response = apps.get_model('assignments', 'Response')
+    last = Response.objects.order_by('-pk').values_list('pk', flat=True).first()
+    if last is None:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for start in range(0, last + 1, BATCH_SIZE):
+            cursor.execute(
+                """
+                UPDATE "assignments_response" AS r SET "field_values" = v."field_values"
+                FROM (
+                    SELECT "response_id", jsonb_object_agg("field_id"::text, "values") AS "field_values"
+                    FROM (
+                        SELECT v."response_id", v."field_id", jsonb_agg(v."value" ORDER BY v."id") AS "values"
+                        FROM "assignments_value" AS v
+                        JOIN "assignments_field" AS f ON f."id" = v."field_id"
+                        WHERE v."response_id" >= %s AND v."response_id" < %s
+                        AND NOT (v."value" = '' AND f."type" = 'checkbox-group')
+                        GROUP BY v."response_id", v."field_id"
+                    ) AS grouped
+                    GROUP BY "response_id"
+                ) AS v
+                WHERE r."id" = v."response_id"
+                """,
+                [start, start + BATCH_SIZE],
+            )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('assignments', '0010_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='response',
+            name='field_values',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, editable=False, verbose_name='field values'),
+        ),
+        migrations.RunPython(set_field_values, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='response',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['field_values'], name='response_field_values', opclasses=['jsonb_path_ops']),
+        ),
+    ]
@@ -0,0 +1,331 @@
+# Generated by Django 3.0.5 on 2026-10-19 02:08
+
+import re
+
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+
+PARTITIONS = 16
+BATCH_SIZE = 10000
+
+
+def set_value_assignments(apps, schema_editor):
+    """Copy each value's assignment from its response, in batches"""
+    Value = apps.get_model('assignments', 'Value')
+    last = Value.objects.order_by('-pk').values_list('pk', flat=True).first()
+    if last is None:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for start in range(0, last + 1, BATCH_SIZE):
+            cursor.execute(
+                """
+                UPDATE "assignments_value" AS v SET "assignment_id" = r."assignment_id"
+                FROM "assignments_response" AS r
+                WHERE r."id" = v."response_id" AND v."id" >= %s AND v."id" < %s
+                """,
+                [start, start + BATCH_SIZE],
+            )
+
+
+def partition_tables(apps, schema_editor):
+    """Hash partition responses and values by assignment
+
+    Each table is rebuilt as a partitioned table.  Its rows are copied over in
+    batches, while a trigger mirrors any writes to the old table, and then the
+    tables are swapped in a short transaction.  Partitioned tables need the
+    partition key in their primary key and unique constraints, so these are
+    on (assignment_id, id).  PostgreSQL 11 can not reference a partitioned
+    table from a foreign key, so values are checked against their response by
+    constraint triggers instead.
+    """
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        _partition(
+            connection,
+            cursor,
+            'assignments_response',
+            indexes=['CREATE INDEX "response_id_new" ON {table} ("id")'],
+            constraints=[
+                'ALTER TABLE {table} ADD CONSTRAINT "response_assignment_submission_new" '
+                'UNIQUE ("assignment_id", "submission_id")'
+            ],
+        )
+        _partition(
+            connection,
+            cursor,
+            'assignments_value',
+            indexes=['CREATE INDEX "value_id_new" ON {table} ("id")'],
+            constraints=[],
+        )
+        _check_value_responses(cursor)
+
+
+def _check_value_responses(cursor):
+    """Check that each value's response exists, as a deferred foreign key would
+
+    The triggers are created on each partition, as PostgreSQL 11 does not
+    support constraint triggers on partitioned tables, and only check rows
+    whose keys have changed, as saving a model updates every column.
+    """
+    cursor.execute(
+        """
+        CREATE FUNCTION "assignments_value_response_check"() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            -- as with a foreign key, values deleted or changed since are skipped
+            IF NOT EXISTS (
+                SELECT 1 FROM "assignments_value"
+                WHERE "assignment_id" = NEW."assignment_id" AND "id" = NEW."id"
+                AND "response_id" = NEW."response_id"
+            ) THEN
+                RETURN NULL;
+            END IF;
+            IF NOT EXISTS (
+                SELECT 1 FROM "assignments_response"
+                WHERE "assignment_id" = NEW."assignment_id" AND "id" = NEW."response_id"
+            ) THEN
+                RAISE foreign_key_violation USING MESSAGE = format(
+                    'value %s references response %s of assignment %s, which does not exist',
+                    NEW."id", NEW."response_id", NEW."assignment_id"
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$
+        """
+    )
+    cursor.execute(
+        """
+        CREATE FUNCTION "assignments_response_values_check"() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            -- the response may have been restored since
+            IF EXISTS (
+                SELECT 1 FROM "assignments_response"
+                WHERE "assignment_id" = OLD."assignment_id" AND "id" = OLD."id"
+            ) THEN
+                RETURN NULL;
+            END IF;
+            IF EXISTS (
+                SELECT 1 FROM "assignments_value"
+                WHERE "assignment_id" = OLD."assignment_id" AND "response_id" = OLD."id"
+            ) THEN
+                RAISE foreign_key_violation USING MESSAGE = format(
+                    'response %s of assignment %s is still referenced by its values',
+                    OLD."id", OLD."assignment_id"
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$
+        """
+    )
+    # (name, table, event, function, condition)
+    triggers = [
+        (
+            'value_response_insert',
+            'assignments_value',
+            'INSERT',
+            'assignments_value_response_check',
+            None,
+        ),
+        (
+            'value_response_update',
+            'assignments_value',
+            'UPDATE OF "assignment_id", "response_id"',
+            'assignments_value_response_check',
+            '(OLD."assignment_id", OLD."response_id") '
+            'IS DISTINCT FROM (NEW."assignment_id", NEW."response_id")',
+        ),
+        (
+            'response_values_delete',
+            'assignments_response',
+            'DELETE',
+            'assignments_response_values_check',
+            None,
+        ),
+        (
+            'response_values_update',
+            'assignments_response',
+            'UPDATE OF "assignment_id", "id"',
+            'assignments_response_values_check',
+            '(OLD."assignment_id", OLD."id") IS DISTINCT FROM (NEW."assignment_id", NEW."id")',
+        ),
+    ]
+    for i in range(PARTITIONS):
+        for name, table, event, function, condition in triggers:
+            when = f'WHEN ({condition}) ' if condition else ''
+            cursor.execute(
+                f'CREATE CONSTRAINT TRIGGER "{name}" AFTER {event} '
+                f'ON "{table}_p{i}" DEFERRABLE INITIALLY DEFERRED '
+                f'FOR EACH ROW {when}EXECUTE FUNCTION "{function}"()'
+            )
+
+
+def _partition(connection, cursor, table, indexes, constraints):
+    """Rebuild the table partitioned by assignment"""
+    new = f'{table}_new'
+
+    cursor.execute(
+        f'CREATE TABLE "{new}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+        'PARTITION BY HASH ("assignment_id")'
+    )
+    for i in range(PARTITIONS):
+        cursor.execute(
+            f'CREATE TABLE "{table}_p{i}" PARTITION OF "{new}" '
+            f'FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {i})'
+        )
+    cursor.execute(
+        f'ALTER TABLE "{new}" ADD CONSTRAINT "{new}_pkey" PRIMARY KEY ("assignment_id", "id")'
+    )
+
+    # copy the indexes and foreign keys, with temporary names, before the rows,
+    # so that mirrored writes are never blocked building them
+    renames = []
+    cursor.execute(
+        """
+        SELECT i.indexname, i.indexdef FROM pg_indexes AS i
+        WHERE i.tablename = %s AND NOT EXISTS (
+            SELECT 1 FROM pg_constraint AS c
+            WHERE c.conrelid = %s::regclass AND c.conname = i.indexname
+        )
+        """,
+        [table, table],
+    )
+    for name, definition in cursor.fetchall():
+        definition = definition.replace(f'INDEX {name} ON', f'INDEX "{name}_new" ON', 1)
+        definition = re.sub(fr' ON (ONLY )?(public\.)?"?{table}"? ', f' ON "{new}" ', definition)
+        cursor.execute(definition)
+        renames.append(f'ALTER INDEX "{name}_new" RENAME TO "{name}"')
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+        AND confrelid NOT IN ('assignments_response'::regclass, 'assignments_value'::regclass)
+        """,
+        [table],
+    )
+    for name, definition in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE "{new}" ADD CONSTRAINT "{name}_new" {definition}')
+        renames.append(f'ALTER TABLE "{table}" RENAME CONSTRAINT "{name}_new" TO "{name}"')
+    for sql in indexes + constraints:
+        cursor.execute(sql.format(table=f'"{new}"'))
+        name = re.search(r'"(\w+)_new"', sql).group(1)
+        if sql.startswith('CREATE INDEX'):
+            renames.append(f'ALTER INDEX "{name}_new" RENAME TO "{name}"')
+        else:
+            renames.append(f'ALTER TABLE "{table}" RENAME CONSTRAINT "{name}_new" TO "{name}"')
+
+    # mirror writes to the old table while the rows are copied
+    cursor.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = %s ORDER BY ordinal_position
+        """,
+        [table],
+    )
+    columns = [row[0] for row in cursor.fetchall()]
+    updates = ', '.join(f'"{c}" = EXCLUDED."{c}"' for c in columns)
+    cursor.execute(
+        f"""
+        CREATE FUNCTION "{table}_mirror"() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                DELETE FROM "{new}" WHERE "assignment_id" = OLD."assignment_id" AND "id" = OLD."id";
+                RETURN OLD;
+            END IF;
+            INSERT INTO "{new}" VALUES (NEW.*)
+            ON CONFLICT ("assignment_id", "id") DO UPDATE SET {updates};
+            RETURN NEW;
+        END;
+        $$
+        """
+    )
+    cursor.execute(
+        f'CREATE TRIGGER "{table}_mirror" AFTER INSERT OR UPDATE OR DELETE ON "{table}" '
+        f'FOR EACH ROW EXECUTE FUNCTION "{table}_mirror"()'
+    )
+
+    # copy the rows in batches, each in its own transaction, locking them so
+    # they are not changed until their batch is copied
+    cursor.execute(f'SELECT max("id") FROM "{table}"')
+    last = cursor.fetchone()[0]
+    for start in range(0, (last or 0) + 1, BATCH_SIZE):
+        cursor.execute(
+            f"""
+            INSERT INTO "{new}"
+            SELECT * FROM "{table}" WHERE "id" >= %s AND "id" < %s FOR SHARE
+            ON CONFLICT ("assignment_id", "id") DO NOTHING
+            """,
+            [start, start + BATCH_SIZE],
+        )
+
+    # swap in the new table
+    cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, 'id'])
+    sequence = cursor.fetchone()[0]
+    with transaction.atomic(using=connection.alias):
+        cursor.execute(f'LOCK TABLE "{table}" IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+        cursor.execute(f'DROP TABLE "{table}" CASCADE')
+        cursor.execute(f'DROP FUNCTION "{table}_mirror"()')
+        cursor.execute(f'ALTER TABLE "{new}" RENAME TO "{table}"')
+        cursor.execute(f'ALTER TABLE "{table}" RENAME CONSTRAINT "{new}_pkey" TO "{table}_pkey"')
+        for sql in renames:
+            cursor.execute(sql)
+        cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY "{table}"."id"')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('assignments', '0011_response_field_values'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='value',
+            name='assignment',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='values', to='assignments.Assignment', verbose_name='assignment'),
+        ),
+        migrations.RunPython(set_value_assignments, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='value',
+            name='assignment',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='values', to='assignments.Assignment', verbose_name='assignment'),
+        ),
+        migrations.AlterField(
+            model_name='response',
+            name='submission_id',
+            field=models.UUIDField(editable=False, help_text='Identifies buffered submissions, so they are only saved once', null=True, verbose_name='submission id'),
+        ),
+        # the new indexes and constraint are created with the partitioned tables,
+        # which can not be unpartitioned, so this is irreversible.  Values
+        # reference their response by (assignment_id, response_id), checked by
+        # triggers rather than a foreign key constraint
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(partition_tables),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='response',
+                    index=models.Index(fields=['id'], name='response_id'),
+                ),
+                migrations.AddIndex(
+                    model_name='value',
+                    index=models.Index(fields=['id'], name='value_id'),
+                ),
+                migrations.AddConstraint(
+                    model_name='response',
+                    constraint=models.UniqueConstraint(fields=('assignment', 'submission_id'), name='response_assignment_submission'),
+                ),
+                migrations.AlterField(
+                    model_name='value',
+                    name='response',
+                    field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='values', to='assignments.Response', verbose_name='response'),
+                ),
+            ],
+        ),
+    ]
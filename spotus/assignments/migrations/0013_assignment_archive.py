@@ -0,0 +1,23 @@
+# Generated by Django 3.0.5 on 2026-10-19 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0012_partition_responses'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='archive',
+            field=models.FileField(blank=True, editable=False, help_text='The data, responses and values of an archived assignment, which are no longer kept in the database', upload_to='assignments/archives/', verbose_name='archive'),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='datetime_archived',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='datetime archived'),
+        ),
+    ]
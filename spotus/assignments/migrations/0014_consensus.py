@@ -0,0 +1,47 @@
+# Generated by Django 3.0.5 on 2026-10-19 02:29
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0013_assignment_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='datetime_consensus',
+            field=models.DateTimeField(blank=True, editable=False, help_text='When the consensus was last updated', null=True, verbose_name='datetime consensus'),
+        ),
+        migrations.CreateModel(
+            name='Consensus',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.TextField(help_text='The most common answer', verbose_name='value')),
+                ('count', models.PositiveIntegerField(help_text='How many responses gave the most common answer', verbose_name='count')),
+                ('total', models.PositiveIntegerField(help_text='How many responses answered the field', verbose_name='total')),
+                ('agreement', models.FloatField(help_text='The fraction of responses which gave the most common answer', verbose_name='agreement')),
+                ('conflicts', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=list, help_text='The other answers, with their counts and response ids', verbose_name='conflicts')),
+                ('datetime_updated', models.DateTimeField(auto_now=True, verbose_name='datetime updated')),
+                ('assignment', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='consensus', to='assignments.Assignment', verbose_name='assignment')),
+                ('data', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='consensus', to='assignments.Data', verbose_name='data')),
+                ('field', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consensus', to='assignments.Field', verbose_name='field')),
+            ],
+            options={
+                'verbose_name': 'assignment consensus',
+                'verbose_name_plural': 'assignment consensus',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='consensus',
+            index=models.Index(fields=['assignment', 'agreement'], name='consensus_assignment_agreement'),
+        ),
+        migrations.AddConstraint(
+            model_name='consensus',
+            constraint=models.UniqueConstraint(fields=('data', 'field'), name='consensus_data_field'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.0.5 on 2026-10-19 03:39
+
+from django.conf import settings
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('assignments', '0014_consensus'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkMessage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255, verbose_name='subject')),
+                ('body', models.TextField(verbose_name='body')),
+                ('filters', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, help_text='Only message contributors whose responses are flagged or not, are tagged, or are to a data item', verbose_name='filters')),
+                ('total', models.PositiveIntegerField(blank=True, help_text='How many contributors to message, once they have been found', null=True, verbose_name='total')),
+                ('sent', models.PositiveIntegerField(default=0, help_text='How many contributors have been messaged', verbose_name='sent')),
+                ('failed', models.PositiveIntegerField(default=0, help_text='How many contributors could not be messaged', verbose_name='failed')),
+                ('datetime_created', models.DateTimeField(default=django.utils.timezone.now, verbose_name='datetime created')),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bulk_messages', to='assignments.Assignment', verbose_name='assignment')),
+                ('user', models.ForeignKey(help_text='The user who sent the message', on_delete=django.db.models.deletion.PROTECT, related_name='assignment_bulk_messages', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'assignment bulk message',
+                'ordering': ('-datetime_created',),
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.0.5 on 2026-10-19 03:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import spotus.assignments.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('assignments', '0015_bulk_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('type', models.PositiveSmallIntegerField(choices=[(0, 'Created'), (1, 'Edited')], verbose_name='type')),
+                ('datetime', models.DateTimeField(default=django.utils.timezone.now, verbose_name='datetime')),
+                ('assignment', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='webhook_events', to='assignments.Assignment', verbose_name='assignment')),
+                ('response', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='webhook_events', to='assignments.Response', verbose_name='response')),
+            ],
+            options={
+                'verbose_name': 'assignment webhook event',
+            },
+        ),
+        migrations.CreateModel(
+            name='Webhook',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=255, verbose_name='url')),
+                ('secret', models.CharField(default=spotus.assignments.models.make_webhook_secret, help_text='The key each delivery is signed with', max_length=64, verbose_name='secret')),
+                ('active', models.BooleanField(default=True, help_text='Inactive webhooks are not delivered to', verbose_name='active')),
+                ('cursor', models.BigIntegerField(default=0, help_text='The id of the last event delivered, which may be set back to deliver events again', verbose_name='cursor')),
+                ('failures', models.PositiveIntegerField(default=0, help_text='How many deliveries in a row have failed', verbose_name='failures')),
+                ('retry_at', models.DateTimeField(blank=True, help_text='When to retry the failed delivery', null=True, verbose_name='retry at')),
+                ('last_error', models.TextField(blank=True, verbose_name='last error')),
+                ('datetime_created', models.DateTimeField(default=django.utils.timezone.now, verbose_name='datetime created')),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='webhooks', to='assignments.Assignment', verbose_name='assignment')),
+                ('user', models.ForeignKey(help_text='The user who subscribed', on_delete=django.db.models.deletion.PROTECT, related_name='assignment_webhooks', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'assignment webhook',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='webhookevent',
+            index=models.Index(fields=['assignment', 'id'], name='webhook_event_assignment_id'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.0.5 on 2026-10-19 04:28
+
+from django.db import migrations
+
+BATCH_SIZE = 10000
+
+
+def set_search_weights(apps, schema_editor):
+    """Rebuild the search vectors with gallery values weighted A, tags B and
+    other values C, in batches so the response table is not locked for the
+    whole rebuild
+    """
+    Response = apps.get_model('assignments', 'Response')
+    last = Response.objects.order_by('-pk').values_list('pk', flat=True).first()
+    if last is None:
+        return
+    values = """
+        setweight(to_tsvector('simple', COALESCE((
+            SELECT string_agg(v."value", ' ')
+            FROM "assignments_value" AS v
+            JOIN "assignments_field" AS f ON f."id" = v."field_id"
+            WHERE v."assignment_id" = r."assignment_id" AND v."response_id" = r."id"
+            AND {condition}
+        ), '')), '{weight}')
+    """
+    with schema_editor.connection.cursor() as cursor:
+        for start in range(0, last + 1, BATCH_SIZE):
+            cursor.execute(
+                f"""
+                UPDATE "assignments_response" AS r SET "search_vector" =
+                    {values.format(condition='f."gallery" AND NOT f."deleted"', weight='A')} ||
+                    setweight(to_tsvector('simple', COALESCE((
+                        SELECT string_agg(t."name", ' ')
+                        FROM "taggit_taggeditem" AS ti
+                        JOIN "taggit_tag" AS t ON t."id" = ti."tag_id"
+                        JOIN "django_content_type" AS ct ON ct."id" = ti."content_type_id"
+                        WHERE ct."app_label" = 'assignments' AND ct."model" = 'response'
+                        AND ti."object_id" = r."id"
+                    ), '')), 'B') ||
+                    {values.format(condition='NOT (f."gallery" AND NOT f."deleted")', weight='C')}
+                WHERE r."id" >= %s AND r."id" < %s
+                """,
+                [start, start + BATCH_SIZE],
+            )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('assignments', '0016_webhooks'),
+    ]
+
+    operations = [
+        # the vectors are still valid for searching with all weights
+        migrations.RunPython(set_search_weights, migrations.RunPython.noop),
+    ]
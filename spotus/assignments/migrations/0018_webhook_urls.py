@@ -0,0 +1,25 @@
+# Generated by Django 3.0.5 on 2026-10-19 04:31
+
+from django.db import migrations, models
+import django.utils.timezone
+import spotus.core.network
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0017_search_weights'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='webhook',
+            name='url',
+            field=models.URLField(help_text='Only public http and https URLs may be used', max_length=255, validators=[spotus.core.network.validate_public_url], verbose_name='url'),
+        ),
+        migrations.AlterField(
+            model_name='webhookevent',
+            name='datetime',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='datetime'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.0.5 on 2026-10-19 05:10
+
+from django.db import migrations
+from django.utils import timezone
+
+# Status.closed
+CLOSED = 2
+
+
+def backfill_datetime_closed(apps, schema_editor):
+    """Assignments closed without recording when are treated as closed now,
+    so they are archived once they have been closed for long enough from here
+    """
+    Assignment = apps.get_model('assignments', 'Assignment')
+    Assignment.objects.filter(status=CLOSED, datetime_closed=None).update(
+        datetime_closed=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0018_webhook_urls'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_datetime_closed, migrations.RunPython.noop),
+    ]
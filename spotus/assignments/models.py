@@ -2,22 +2,30 @@
 
 # Django
 from django.conf import settings
-from django.contrib.postgres.aggregates import StringAgg
 from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.cache import cache
 from django.core.mail.message import EmailMessage
 from django.core.validators import MinValueValidator
 from django.db import models, transaction
 from django.db.models.aggregates import Count
-from django.db.models.expressions import Case, Value as V, When
+from django.db.models.expressions import Case, F, Value as V, When
 from django.db.models.functions import Concat, TruncDay
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
 # Standard Library
+import gzip
+import hashlib
 import json
+import secrets
+from collections import Counter
 from html import unescape
 from random import choice
 
@@ -28,16 +36,19 @@ from pyembed.core import PyEmbed
 from pyembed.core.consumer import PyEmbedConsumerError
 from pyembed.core.discovery import AutoDiscoverer, ChainingDiscoverer, FileDiscoverer
 from taggit.managers import TaggableManager
+from taggit.models import Tag
 
 # SpotUs
 from spotus.assignments import fields
-from spotus.assignments.choices import Registration, Status
+from spotus.assignments.choices import Registration, Status, WebhookEventType
 from spotus.assignments.constants import DOCUMENT_URL_RE
 from spotus.assignments.querysets import (
     AssignmentQuerySet,
     DataQuerySet,
     ResponseQuerySet,
 )
+from spotus.core.network import validate_public_url
+from spotus.core.throttle import is_throttled, validate_rate
 
 
 class Assignment(models.Model):
@@ -103,6 +114,60 @@ class Assignment(models.Model):
             "for their response"
         ),
     )
+    form_version = models.PositiveIntegerField(
+        _("form version"),
+        default=1,
+        editable=False,
+        help_text=_("Incremented each time the form is changed, for caching"),
+    )
+    buffer_submissions = models.BooleanField(
+        _("buffer submissions"),
+        default=False,
+        help_text=_(
+            "Save submissions in batches in the background, for assignments "
+            "expecting bursts of traffic, such as when embedded on a busy site.  "
+            "Submissions may take a short while to appear."
+        ),
+    )
+    submission_rate = models.CharField(
+        _("submission rate"),
+        max_length=20,
+        blank=True,
+        validators=[validate_rate],
+        help_text=_(
+            "The most submissions or skips each visitor may make, such as "
+            "10/minute.  Short bursts are allowed.  Leave blank for the default"
+        ),
+    )
+    has_gallery = models.BooleanField(
+        _("has gallery"),
+        default=False,
+        editable=False,
+        help_text=_(
+            "Does this assignment have any gallery fields? "
+            "Kept up to date from the fields"
+        ),
+    )
+    archive = models.FileField(
+        _("archive"),
+        upload_to="assignments/archives/",
+        blank=True,
+        editable=False,
+        help_text=_(
+            "The data, responses and values of an archived assignment, "
+            "which are no longer kept in the database"
+        ),
+    )
+    datetime_archived = models.DateTimeField(
+        _("datetime archived"), blank=True, null=True, editable=False
+    )
+    datetime_consensus = models.DateTimeField(
+        _("datetime consensus"),
+        blank=True,
+        null=True,
+        editable=False,
+        help_text=_("When the consensus was last updated"),
+    )
 
     objects = AssignmentQuerySet.as_manager()
 
@@ -112,6 +177,20 @@ class Assignment(models.Model):
     def get_absolute_url(self):
         return reverse("assignments:detail", kwargs={"slug": self.slug, "pk": self.pk})
 
+    def save(self, *args, **kwargs):
+        """Record when the assignment was closed, however its status changed,
+        so it is archived once it has been closed for long enough
+        """
+        # pylint: disable=signature-differs
+        if self.status == Status.closed and self.datetime_closed is None:
+            self.datetime_closed = timezone.now()
+        elif self.status != Status.closed:
+            self.datetime_closed = None
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "status" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "datetime_closed"}
+        super().save(*args, **kwargs)
+
     def get_data_to_show(self, user, ip_address):
         """Get the assignment data to show"""
         options = self.data.get_choices(self.data_limit, user, ip_address)
@@ -167,6 +246,42 @@ class Assignment(models.Model):
         # any field which has no order after all fields are
         # re-created has been deleted
         self.fields.filter(order=None).update(deleted=True)
+        self.update_has_gallery()
+        self.update_form_version()
+
+    def is_throttled(self, user, ip_address, action):
+        """Take a token from the visitor's rate limit for submitting or skipping,
+        returning True if they are submitting too quickly
+        """
+        if user.is_authenticated:
+            ident = "user:{}".format(user.pk)
+        else:
+            ident = "ip:{}".format(ip_address)
+        return is_throttled(
+            "throttle:assignment:{}:{}:{}".format(self.pk, action, ident),
+            self.submission_rate or settings.ASSIGNMENT_SUBMISSION_RATE,
+            self.get_throttle_metric(action),
+        )
+
+    def get_throttle_metric(self, action):
+        """The metric name for counting throttled submissions or skips"""
+        return "assignment-{}:{}".format(action, self.pk)
+
+    def update_form_version(self):
+        """Bump the form version, after the form's fields have been edited"""
+        Assignment.objects.filter(pk=self.pk).update(form_version=F("form_version") + 1)
+        self.refresh_from_db(fields=["form_version"])
+
+    def get_gallery_field_ids(self):
+        """The ids of the fields shown in the gallery, which anyone may search"""
+        return set(
+            self.fields.filter(gallery=True, deleted=False).values_list("pk", flat=True)
+        )
+
+    def update_has_gallery(self):
+        """Update the stored flag for whether this assignment has gallery fields"""
+        self.has_gallery = self.fields.filter(gallery=True).exists()
+        Assignment.objects.filter(pk=self.pk).update(has_gallery=self.has_gallery)
 
     def _uniqify_label_name(self, seen_labels, label):
         """Ensure the label names are all unique"""
@@ -179,6 +294,26 @@ class Assignment(models.Model):
         seen_labels.add(new_label)
         return new_label
 
+    def check_assignment(self, user, ip_address):
+        """Check if the user has a valid assignment to complete
+        Returns whether they do, and the data to show them, if any
+        """
+        if user.is_anonymous:
+            user = None
+        else:
+            ip_address = None
+        data = self.get_data_to_show(user, ip_address)
+        if self.data.exists():
+            return data is not None, data
+        else:
+            return (
+                not (
+                    self.user_limit
+                    and self.responses.filter(user=user, ip_address=ip_address).exists()
+                ),
+                data,
+            )
+
     def get_form_json(self):
         """Get the form JSON for editing the form"""
         return json.dumps([f.get_json() for f in self.fields.filter(deleted=False)])
@@ -190,7 +325,8 @@ class Assignment(models.Model):
             values.insert(1, "email")
         if self.multiple_per_page:
             values.append("number")
-        if self.data.exists():
+        has_data = bool(self.archived_data) if self.is_archived else self.data.exists()
+        if has_data:
             values.append("datum")
             values.extend(metadata_keys)
         field_labels = list(
@@ -204,30 +340,65 @@ class Assignment(models.Model):
         )
         return values + field_labels
 
+    @cached_property
+    def value_fields(self):
+        """The fields which hold values, cached for exporting many responses"""
+        return list(self.fields.exclude(type__in=fields.STATIC_FIELDS))
+
     def get_metadata_keys(self):
         """Get the metadata keys for this assignment's data"""
-        datum = self.data.first()
+        if self.is_archived:
+            datum = next(iter(self.archived_data.values()), None)
+        else:
+            datum = self.data.first()
         if datum:
             return list(datum.metadata.keys())
         else:
             return []
 
+    def get_data(self):
+        """The assignment's data, from the archive if it has been archived"""
+        if self.is_archived:
+            return list(self.archived_data.values())
+        return self.data.all()
+
+    def get_consensus(self):
+        """The consensus for each data item and field, from the archive if it
+        has been archived
+        """
+        if self.is_archived:
+            return [
+                Consensus(assignment=self, **row)
+                for row in archived_rows(self.archived_columns.get("consensus", {}))
+            ]
+        return self.consensus.order_by("data_id", "field_id")
+
     def total_assignments(self):
         """Total assignments to be completed"""
-        if not self.data.all():
+        data = self.get_data()
+        if not data:
             return None
-        return len(self.data.all()) * self.data_limit
+        return len(data) * self.data_limit
+
+    def response_count(self):
+        """The number of responses, from the archive if it has been archived"""
+        if self.is_archived:
+            return len(self.archived_responses)
+        return self.responses.count()
 
     def percent_complete(self):
         """Percent of tasks complete"""
         total = self.total_assignments()
         if not total:
             return 0
-        return int(100 * self.responses.count() / float(total))
+        return int(100 * self.response_count() / float(total))
 
     def contributor_line(self):
         """Line about who has contributed"""
-        responses = self.responses.select_related("user")
+        if self.is_archived:
+            responses = self.archived_responses
+        else:
+            responses = self.responses.select_related("user")
         users = list({r.user for r in responses if r.user and r.public})
         total = len(users)
 
@@ -251,6 +422,14 @@ class Assignment(models.Model):
 
     def responses_per_day(self):
         """How many responses there have been per day"""
+        if self.is_archived:
+            counts = Counter(
+                timezone.localtime(r.datetime).replace(
+                    hour=0, minute=0, second=0, microsecond=0
+                )
+                for r in self.archived_responses
+            )
+            return [{"date": date, "count": counts[date]} for date in sorted(counts)]
         return (
             self.responses.annotate(date=TruncDay("datetime"))
             .values("date")
@@ -258,6 +437,62 @@ class Assignment(models.Model):
             .order_by("date")
         )
 
+    @property
+    def is_archived(self):
+        """Have the assignment's data and responses been moved to its archive"""
+        return bool(self.archive)
+
+    @cached_property
+    def archived_columns(self):
+        """The archive's columns of data, responses and values
+        The file is cached, as it is read for each page of the gallery
+        """
+        key = "assignments:archive:{}".format(self.archive.name)
+        content = cache.get(key)
+        if content is None:
+            with self.archive.open("rb") as archive_file:
+                content = archive_file.read()
+            cache.set(key, content, settings.ASSIGNMENT_ARCHIVE_CACHE_TIMEOUT)
+        return json.loads(gzip.decompress(content))
+
+    @cached_property
+    def archived_data(self):
+        """The archived data, as unsaved data items by id"""
+        return {
+            row["id"]: Data(assignment=self, **row)
+            for row in archived_rows(self.archived_columns["data"])
+        }
+
+    @cached_property
+    def archived_responses(self):
+        """The archived responses, as unsaved responses ordered by id, with
+        their data, users and tags loaded
+        """
+        rows = archived_rows(self.archived_columns["responses"])
+        user_model = Response._meta.get_field("user").related_model
+        user_ids = {r["user_id"] for r in rows} | {r["edit_user_id"] for r in rows}
+        users = user_model.objects.in_bulk(user_ids - {None})
+        tags = Tag.objects.in_bulk(
+            {t for r in rows for t in r["tags"]}, field_name="name"
+        )
+        responses = []
+        for row in rows:
+            # load the tags as if they had been prefetched, from a queryset
+            # which still finds them if it is filtered further
+            names = row.pop("tags")
+            response_tags = Tag.objects.filter(name__in=names)
+            response_tags._result_cache = [tags[t] for t in names if t in tags]
+            response_tags._prefetch_done = True
+            for name in ("datetime", "edit_datetime"):
+                row[name] = row[name] and parse_datetime(row[name])
+            response = Response(assignment=self, **row)
+            response.data = self.archived_data.get(row["data_id"])
+            response.user = users.get(row["user_id"])
+            response.edit_user = users.get(row["edit_user_id"])
+            response._prefetched_objects_cache = {"tags": response_tags}
+            responses.append(response)
+        return responses
+
     class Meta:
         verbose_name = _("assignment")
         permissions = (
@@ -266,6 +501,18 @@ class Assignment(models.Model):
                 "Can view and fill out the assignments for this assignment",
             ),
         )
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(status=Status.open),
+                name="assignment_open",
+            )
+        ]
+
+
+def archived_rows(columns):
+    """Turn an archive's columns back in to rows"""
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
 
 
 DOCCLOUD_EMBED = """
@@ -302,7 +549,22 @@ class Data(models.Model):
         return f"Crowdsource Data: {self.url}"
 
     def embed(self):
-        """Get the html to embed into the assignment"""
+        """Get the html to embed into the assignment
+        This is cached, as it may require an oEmbed request
+        """
+        if not self.url:
+            return None
+        key = "assignments:embed:{}".format(
+            hashlib.md5(self.url.encode("utf8")).hexdigest()
+        )
+        html = cache.get(key)
+        if html is None:
+            html = self._embed()
+            cache.set(key, str(html), settings.ASSIGNMENT_EMBED_CACHE_TIMEOUT)
+        return mark_safe(html)
+
+    def _embed(self):
+        """Build the html to embed into the assignment"""
         if self.url:
             try:
                 # first try to get embed code from oEmbed
@@ -422,13 +684,25 @@ class Choice(models.Model):
 
 
 class Response(models.Model):
-    """A response to an assignment question"""
+    """A response to an assignment question
 
+    Responses are hash partitioned by assignment in the database, so the primary
+    key there is (assignment_id, id), and queries should filter on the
+    assignment wherever possible so they only read its partition.  Django still
+    treats `id` alone as the primary key.  Ids are unique because they all come
+    from the table's sequence, but the database does not enforce it, so rows
+    must never be inserted with explicit ids.  Foreign keys to responses can not
+    be constraints in the database either: values are checked by triggers, and
+    other references, such as webhook events, are not checked.
+    """
+
+    # the assignment, datetime index covers the foreign key
     assignment = models.ForeignKey(
         verbose_name=_("response"),
         to=Assignment,
         on_delete=models.CASCADE,
         related_name="responses",
+        db_index=False,
     )
     user = models.ForeignKey(
         verbose_name=_("user"),
@@ -447,6 +721,7 @@ class Response(models.Model):
     )
     ip_address = models.GenericIPAddressField(_("ip address"), blank=True, null=True)
     datetime = models.DateTimeField(_("datetime"), default=timezone.now)
+    # the data, number index covers the foreign key
     data = models.ForeignKey(
         verbose_name=_("data"),
         to=Data,
@@ -454,6 +729,7 @@ class Response(models.Model):
         blank=True,
         null=True,
         related_name="responses",
+        db_index=False,
     )
     skip = models.BooleanField(_("skip"), default=False)
     # number is only used for multiple_per_page assignment,
@@ -474,6 +750,23 @@ class Response(models.Model):
     )
     edit_datetime = models.DateTimeField(_("edit datetime"), null=True, blank=True)
 
+    # buffered submissions
+    submission_id = models.UUIDField(
+        _("submission id"),
+        null=True,
+        editable=False,
+        help_text=_("Identifies buffered submissions, so they are only saved once"),
+    )
+
+    # the current values, as lists keyed by field id, so responses may be read
+    # without joining their values, which keep the original values for edits
+    field_values = JSONField(
+        _("field values"), default=dict, blank=True, editable=False
+    )
+
+    # search
+    search_vector = SearchVectorField(_("search vector"), null=True, editable=False)
+
     objects = ResponseQuerySet.as_manager()
     tags = TaggableManager()
 
@@ -495,7 +788,7 @@ class Response(models.Model):
             self.skip,
             self.flag,
             self.gallery,
-            ", ".join(self.tags.values_list("name", flat=True)),
+            ", ".join(t.name for t in self.tags.all()),
         ]
         if include_emails:
             values.insert(1, self.user.email if self.user else "")
@@ -504,53 +797,60 @@ class Response(models.Model):
         if self.data:
             values.append(self.data.url)
             values.extend(self.data.metadata.get(k, "") for k in metadata_keys)
-        field_labels = self.assignment.fields.exclude(
-            type__in=fields.STATIC_FIELDS
-        ).values_list("label", flat=True)
-        field_values = self.get_field_values()
-        # ensure exactly one value per field - default to empty string
-        # a multivalued field may have no values
-        values += [field_values.get(label, "") for label in field_labels]
+        # ensure exactly one value per field - a multivalued field may have
+        # no values
+        values += self.get_field_values().values()
         return values
 
     def get_field_values(self):
         """Return a dictionary of field labels to field values
-        This handle filtering and aggregating of multivalued fields
+        Multivalued fields' values are joined with commas
         """
-        return dict(
-            self.values.order_by("field__order")
-            # exclude headers and paragraph fields
-            .exclude(field__type__in=fields.STATIC_FIELDS)
-            # filter out blank values for multivalued fields
-            # there might be blank ones to hold original values,
-            # and we do not want that in the comma separated list
-            .exclude(value="", field__type__in=fields.MULTI_FIELDS)
-            # group by field
-            .values("field")
-            # concat all values for the same field with commas
-            .annotate(agg_value=StringAgg("value", ", "))
-            # select the concated value
-            .values_list("field__label", "agg_value")
-        )
+        return {
+            field.label: ", ".join(self.field_values.get(str(field.pk), []))
+            for field in self.assignment.value_fields
+        }
 
     def create_values(self, data):
         """Given the form data, create the values for this response"""
+        field_values = {}
+        for pk, value in self.get_value_items(data):
+            try:
+                field = Field.objects.get(assignment=self.assignment, pk=pk)
+                self.values.create(field=field, value=value, original_value=value)
+                field_values.setdefault(str(field.pk), []).append(str(value))
+            except Field.DoesNotExist:
+                pass
+        self.field_values = field_values
+        self.save(update_fields=["field_values"])
+
+    def update_field_values(self):
+        """Store the current values on the response, after they are edited"""
+        field_values = {}
+        values = self.values.filter(assignment=self.assignment_id)
+        for value in values.select_related("field").order_by("pk"):
+            # blank values for multivalued fields only hold original values
+            if value.value or value.field.type not in fields.MULTI_FIELDS:
+                field_values.setdefault(str(value.field_id), []).append(value.value)
+        self.field_values = field_values
+        self.save(update_fields=["field_values"])
+
+    @staticmethod
+    def get_value_items(data):
+        """Given the form data, get the field primary key and value pairs to
+        create values for
+        """
         # these values are passed in the form, but should not have
         # values created for them
-        for key in ["data_id", "full_name", "email", "public"]:
-            data.pop(key, None)
+        skip_keys = ["data_id", "full_name", "email", "public"]
         for pk, value in data.items():
+            if pk in skip_keys:
+                continue
             value = value if value is not None else ""
             if not isinstance(value, list):
                 value = [value]
             for value_item in value:
-                try:
-                    field = Field.objects.get(assignment=self.assignment, pk=pk)
-                    self.values.create(
-                        field=field, value=value_item, original_value=value_item
-                    )
-                except Field.DoesNotExist:
-                    pass
+                yield pk, value_item
 
     def send_email(self, email):
         """Send an email of this response"""
@@ -577,16 +877,70 @@ class Response(models.Model):
 
     class Meta:
         verbose_name = _("assignment response")
+        indexes = [
+            GinIndex(fields=["search_vector"], name="response_search_vector"),
+            GinIndex(
+                fields=["field_values"],
+                opclasses=["jsonb_path_ops"],
+                name="response_field_values",
+            ),
+            models.Index(
+                fields=["assignment", "id"],
+                condition=models.Q(gallery=True),
+                name="response_gallery",
+            ),
+            models.Index(
+                fields=["assignment", "user"],
+                condition=models.Q(user__isnull=False),
+                name="response_assignment_user",
+            ),
+            models.Index(
+                fields=["assignment", "ip_address"],
+                condition=models.Q(ip_address__isnull=False),
+                name="response_assignment_ip",
+            ),
+            models.Index(fields=["data", "number"], name="response_data_number"),
+            models.Index(
+                fields=["assignment", "datetime"], name="response_assignment_datetime"
+            ),
+            # the primary key leads with the assignment, so lookups by id alone
+            # need their own index
+            models.Index(fields=["id"], name="response_id"),
+        ]
+        constraints = [
+            # unique constraints must include the partition key
+            models.UniqueConstraint(
+                fields=["assignment", "submission_id"],
+                name="response_assignment_submission",
+            )
+        ]
 
 
 class Value(models.Model):
-    """A field value for a given response"""
+    """A field value for a given response
+
+    Values are partitioned by assignment, as responses are, so the assignment
+    is copied from the response
+    """
 
+    assignment = models.ForeignKey(
+        verbose_name=_("assignment"),
+        to=Assignment,
+        on_delete=models.CASCADE,
+        related_name="values",
+        editable=False,
+        db_index=False,
+    )
+    # the response, field index covers the foreign key, which is checked by
+    # triggers on (assignment_id, response_id), as partitioned tables can not be
+    # referenced by foreign key constraints
     response = models.ForeignKey(
         verbose_name=_("response"),
         to=Response,
         on_delete=models.CASCADE,
         related_name="values",
+        db_index=False,
+        db_constraint=False,
     )
     field = models.ForeignKey(
         verbose_name=_("field"),
@@ -600,5 +954,274 @@ class Value(models.Model):
     def __str__(self):
         return self.value
 
+    def save(self, *args, **kwargs):
+        """Copy the assignment from the response"""
+        # pylint: disable=signature-differs
+        if self.assignment_id is None:
+            self.assignment_id = self.response.assignment_id
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = _("assignment value")
+        indexes = [
+            models.Index(fields=["response", "field"], name="value_response_field"),
+            # the primary key leads with the assignment, so lookups by id alone
+            # need their own index
+            models.Index(fields=["id"], name="value_id"),
+        ]
+
+
+class Consensus(models.Model):
+    """The most common answer to a field for a data item, across the responses
+    to it, kept up to date by `spotus.assignments.consensus`
+    """
+
+    assignment = models.ForeignKey(
+        verbose_name=_("assignment"),
+        to=Assignment,
+        on_delete=models.CASCADE,
+        related_name="consensus",
+        db_index=False,
+    )
+    # the data, field constraint covers the foreign key
+    data = models.ForeignKey(
+        verbose_name=_("data"),
+        to=Data,
+        on_delete=models.CASCADE,
+        related_name="consensus",
+        db_index=False,
+    )
+    field = models.ForeignKey(
+        verbose_name=_("field"),
+        to=Field,
+        on_delete=models.CASCADE,
+        related_name="consensus",
+    )
+    value = models.TextField(_("value"), help_text=_("The most common answer"))
+    count = models.PositiveIntegerField(
+        _("count"), help_text=_("How many responses gave the most common answer")
+    )
+    total = models.PositiveIntegerField(
+        _("total"), help_text=_("How many responses answered the field")
+    )
+    agreement = models.FloatField(
+        _("agreement"),
+        help_text=_("The fraction of responses which gave the most common answer"),
+    )
+    conflicts = JSONField(
+        _("conflicts"),
+        default=list,
+        blank=True,
+        help_text=_("The other answers, with their counts and response ids"),
+    )
+    datetime_updated = models.DateTimeField(_("datetime updated"), auto_now=True)
+
+    def __str__(self):
+        return f"Consensus for {self.data_id}, {self.field_id}: {self.value}"
+
+    class Meta:
+        verbose_name = _("assignment consensus")
+        verbose_name_plural = _("assignment consensus")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["data", "field"], name="consensus_data_field"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["assignment", "agreement"],
+                name="consensus_assignment_agreement",
+            )
+        ]
+
+
+class BulkMessage(models.Model):
+    """A message to an assignment's contributors, sent by
+    `spotus.assignments.tasks.send_bulk_message`
+    """
+
+    assignment = models.ForeignKey(
+        verbose_name=_("assignment"),
+        to=Assignment,
+        on_delete=models.CASCADE,
+        related_name="bulk_messages",
+    )
+    user = models.ForeignKey(
+        verbose_name=_("user"),
+        to="users.User",
+        on_delete=models.PROTECT,
+        related_name="assignment_bulk_messages",
+        help_text=_("The user who sent the message"),
+    )
+    subject = models.CharField(_("subject"), max_length=255)
+    body = models.TextField(_("body"))
+    filters = JSONField(
+        _("filters"),
+        default=dict,
+        blank=True,
+        help_text=_(
+            "Only message contributors whose responses are flagged or not, "
+            "are tagged, or are to a data item"
+        ),
+    )
+    total = models.PositiveIntegerField(
+        _("total"),
+        null=True,
+        blank=True,
+        help_text=_("How many contributors to message, once they have been found"),
+    )
+    sent = models.PositiveIntegerField(
+        _("sent"), default=0, help_text=_("How many contributors have been messaged")
+    )
+    failed = models.PositiveIntegerField(
+        _("failed"),
+        default=0,
+        help_text=_("How many contributors could not be messaged"),
+    )
+    datetime_created = models.DateTimeField(_("datetime created"), default=timezone.now)
+
+    def __str__(self):
+        return self.subject
+
+    class Meta:
+        verbose_name = _("assignment bulk message")
+        ordering = ("-datetime_created",)
+
+    @property
+    def is_done(self):
+        """Has every contributor been messaged, or failed to be"""
+        return self.total is not None and self.sent + self.failed >= self.total
+
+    def get_recipients(self):
+        """The ids of the users to message, once each"""
+        if self.assignment.is_archived:
+            tag = self.filters.get("tag")
+            return sorted(
+                {
+                    r.user_id
+                    for r in self.assignment.archived_responses
+                    if r.user is not None
+                    and r.user.email
+                    and self.filters.get("flag", r.flag) == r.flag
+                    and self.filters.get("data", r.data_id) == r.data_id
+                    and (not tag or tag in [t.name for t in r.tags.all()])
+                }
+            )
+        responses = self.assignment.responses.exclude(user=None).exclude(user__email="")
+        if "flag" in self.filters:
+            responses = responses.filter(flag=self.filters["flag"])
+        if self.filters.get("tag"):
+            responses = responses.filter(tags__name=self.filters["tag"])
+        if self.filters.get("data"):
+            responses = responses.filter(data=self.filters["data"])
+        return list(
+            responses.order_by("user_id").values_list("user_id", flat=True).distinct()
+        )
+
+
+def make_webhook_secret():
+    """A random secret to sign a webhook's deliveries with"""
+    return secrets.token_hex(32)
+
+
+class Webhook(models.Model):
+    """A subscription to an assignment's new and edited responses, which are
+    posted to its URL by `spotus.assignments.webhooks`
+    """
+
+    assignment = models.ForeignKey(
+        verbose_name=_("assignment"),
+        to=Assignment,
+        on_delete=models.CASCADE,
+        related_name="webhooks",
+    )
+    user = models.ForeignKey(
+        verbose_name=_("user"),
+        to="users.User",
+        on_delete=models.PROTECT,
+        related_name="assignment_webhooks",
+        help_text=_("The user who subscribed"),
+    )
+    url = models.URLField(
+        _("url"),
+        max_length=255,
+        validators=[validate_public_url],
+        help_text=_("Only public http and https URLs may be used"),
+    )
+    secret = models.CharField(
+        _("secret"),
+        max_length=64,
+        default=make_webhook_secret,
+        help_text=_("The key each delivery is signed with"),
+    )
+    active = models.BooleanField(
+        _("active"),
+        default=True,
+        help_text=_("Inactive webhooks are not delivered to"),
+    )
+    cursor = models.BigIntegerField(
+        _("cursor"),
+        default=0,
+        help_text=_(
+            "The id of the last event delivered, which may be set back to "
+            "deliver events again"
+        ),
+    )
+    failures = models.PositiveIntegerField(
+        _("failures"),
+        default=0,
+        help_text=_("How many deliveries in a row have failed"),
+    )
+    retry_at = models.DateTimeField(
+        _("retry at"),
+        null=True,
+        blank=True,
+        help_text=_("When to retry the failed delivery"),
+    )
+    last_error = models.TextField(_("last error"), blank=True)
+    datetime_created = models.DateTimeField(_("datetime created"), default=timezone.now)
+
+    def __str__(self):
+        return f"Webhook for {self.assignment_id}: {self.url}"
+
+    class Meta:
+        verbose_name = _("assignment webhook")
+
+
+class WebhookEvent(models.Model):
+    """A response was created or edited, to be delivered to the assignment's
+    webhooks in order of id
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    # the assignment, id index covers the foreign key
+    assignment = models.ForeignKey(
+        verbose_name=_("assignment"),
+        to=Assignment,
+        on_delete=models.CASCADE,
+        related_name="webhook_events",
+        db_index=False,
+    )
+    # responses are partitioned, so their ids can not be referenced alone
+    response = models.ForeignKey(
+        verbose_name=_("response"),
+        to=Response,
+        on_delete=models.CASCADE,
+        related_name="webhook_events",
+        db_index=False,
+        db_constraint=False,
+    )
+    type = models.PositiveSmallIntegerField(_("type"), choices=WebhookEventType.choices)
+    # indexed to prune old events
+    datetime = models.DateTimeField(_("datetime"), default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Webhook event {self.pk}"
+
+    class Meta:
+        verbose_name = _("assignment webhook event")
+        indexes = [
+            models.Index(
+                fields=["assignment", "id"], name="webhook_event_assignment_id"
+            )
+        ]
@@ -2,7 +2,8 @@
 
 # Django
 from django.db import models
-from django.db.models import Case, Count, Q, Sum, Value, When
+from django.db.models import Count, Exists, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 
 # SpotUs
 from spotus.assignments.choices import Status
@@ -25,21 +26,30 @@ class DataQuerySet(models.QuerySet):
     """Object manager for assignment data"""
 
     def get_choices(self, data_limit, user, ip_address):
-        """Get choices for data to show"""
+        """Get choices for data to show
+        Responses are partitioned by assignment, so they are counted with
+        subqueries on the data's assignment, which only read its partition
+        """
+        response_model = self.model._meta.get_field("responses").related_model
+        responses = response_model.objects.filter(
+            assignment=OuterRef("assignment"), data=OuterRef("pk")
+        ).order_by()
+        counts = (
+            responses.filter(number=1)
+            .values("data")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
         choices = self.annotate(
-            count=Sum(
-                Case(
-                    When(responses__number=1, then=Value(1)),
-                    default=0,
-                    output_field=models.IntegerField(),
-                )
-            )
+            count=Coalesce(Subquery(counts, output_field=models.IntegerField()), 0)
         ).filter(count__lt=data_limit)
         if user is not None:
-            choices = choices.exclude(responses__user=user)
+            responded = Exists(responses.filter(user=user))
         elif ip_address is not None:
-            choices = choices.exclude(responses__ip_address=ip_address)
-        return choices
+            responded = Exists(responses.filter(ip_address=ip_address))
+        else:
+            return choices
+        return choices.annotate(responded=responded).filter(responded=False)
 
 
 class ResponseQuerySet(models.QuerySet):
@@ -50,9 +60,17 @@ class ResponseQuerySet(models.QuerySet):
         return self.aggregate(Count("user", distinct=True))["user__count"]
 
     def get_viewable(self, user):
+        """Get the viewable responses for the user
+        Ownership is checked with an `EXISTS` subquery instead of a join, so the
+        results do not need to be made distinct
+        """
         if user.is_staff:
             return self
         elif user.is_authenticated:
-            return self.filter(Q(assignment__user=user) | Q(gallery=True)).distinct()
+            assignment_model = self.model._meta.get_field("assignment").related_model
+            owned = assignment_model.objects.filter(
+                pk=OuterRef("assignment_id"), user_id=user.pk
+            )
+            return self.filter(Q(gallery=True) | Q(Exists(owned)))
         else:
             return self.filter(gallery=True)
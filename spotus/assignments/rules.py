@@ -4,21 +4,28 @@
 # pylint: disable=unused-argument
 
 # Third Party
-from rules import add_perm, always_allow, always_deny, is_staff, predicate
+from rules import (
+    add_perm,
+    always_allow,
+    always_deny,
+    is_authenticated,
+    is_staff,
+    predicate,
+)
 
 
 @predicate
 def is_owner(user, assignment):
     if not assignment:
         return None
-    return assignment.user == user
+    return assignment.user_id == user.pk
 
 
 @predicate
 def has_gallery(user, assignment):
     if not assignment:
         return None
-    return assignment.fields.filter(gallery=True).exists()
+    return assignment.has_gallery
 
 
 is_assignment_admin = is_owner | is_staff
@@ -35,6 +42,8 @@ add_perm("assignments.form_assignment", always_allow)
 def assignment_perm(perm):
     @predicate("assignment_perm:{}".format(perm))
     def inner(user, response):
+        if not response:
+            return None
         return user.has_perm(
             "assignments.{}_assignment".format(perm), response.assignment
         )
@@ -50,6 +59,6 @@ def is_gallery(user, response):
 
 
 add_perm("assignments.add_response", always_allow)
-add_perm("assignments.change_esponse", assignment_perm("change"))
+add_perm("assignments.change_response", is_authenticated & assignment_perm("change"))
 add_perm("assignments.view_response", is_gallery | assignment_perm("change"))
 add_perm("assignments.delete_response", always_deny)
@@ -0,0 +1,119 @@
+"""
+Full text and substring search for assignment responses
+
+Each response stores a `tsvector` built from its values and tags, which is
+GIN indexed for word searches.  Values and tag names also have trigram
+indexes on their upper cased text, so case insensitive substring matches,
+such as a partially typed word, do not need to scan every value.
+
+Only the values of gallery fields are public, so in the vector they are
+weighted A, tags B, and the values of other fields C.  Users who may not change
+an assignment only match its responses by the A and B weighted words, and by
+the values of its gallery fields.
+"""
+
+# Django
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db.models import Exists, OuterRef, Q, Subquery
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+# Standard Library
+import re
+
+# Third Party
+from taggit.models import TaggedItem
+
+# SpotUs
+from spotus.assignments.models import Assignment, Response, Value
+
+SEARCH_CONFIG = "simple"
+# the values of fields shown in the gallery, which anyone may search
+GALLERY_VALUES = Q(field__gallery=True, field__deleted=False)
+GALLERY_WEIGHTS = "AB"
+WORD_RE = re.compile(r"\w+")
+
+
+def _tagged_items():
+    """Tagged items for responses"""
+    return TaggedItem.objects.filter(
+        content_type=ContentType.objects.get_for_model(Response)
+    )
+
+
+def update_search_vectors(queryset):
+    """Rebuild the search vector for the given responses"""
+    values = (
+        Value.objects.filter(assignment=OuterRef("assignment"), response=OuterRef("pk"))
+        .order_by()
+        .values("response")
+        .annotate(text=StringAgg("value", " "))
+        .values("text")
+    )
+    tags = (
+        _tagged_items()
+        .filter(object_id=OuterRef("pk"))
+        .order_by()
+        .values("object_id")
+        .annotate(text=StringAgg("tag__name", " "))
+        .values("text")
+    )
+    queryset.update(
+        search_vector=SearchVector(
+            Subquery(values.filter(GALLERY_VALUES)), config=SEARCH_CONFIG, weight="A"
+        )
+        + SearchVector(Subquery(tags), config=SEARCH_CONFIG, weight="B")
+        + SearchVector(
+            Subquery(values.exclude(GALLERY_VALUES)), config=SEARCH_CONFIG, weight="C"
+        )
+    )
+
+
+def search_responses(queryset, term, user):
+    """Filter responses to those whose values or tags match the search term
+    Matches either whole words, using the search vector, or substrings of a
+    value or tag, using the trigram indexes.  Responses to assignments the user
+    may not change only match by their tags and gallery fields.
+    """
+    tags = Q(
+        pk__in=_tagged_items().filter(tag__name__icontains=term).values("object_id")
+    )
+    public = tags | Q(
+        pk__in=Value.objects.filter(GALLERY_VALUES, value__icontains=term).values(
+            "response_id"
+        )
+    )
+    words = WORD_RE.findall(term)
+    if words:
+        # restrict each word to the public weights
+        query = " & ".join(f"'{word}':{GALLERY_WEIGHTS}" for word in words)
+        public |= Q(
+            search_vector=SearchQuery(query, config=SEARCH_CONFIG, search_type="raw")
+        )
+    full = (
+        tags
+        | Q(search_vector=SearchQuery(term, config=SEARCH_CONFIG))
+        | Q(pk__in=Value.objects.filter(value__icontains=term).values("response_id"))
+    )
+    if user.is_staff:
+        return queryset.filter(full)
+    elif user.is_authenticated:
+        owned = Assignment.objects.filter(pk=OuterRef("assignment_id"), user_id=user.pk)
+        return queryset.filter((Q(Exists(owned)) & full) | public)
+    else:
+        return queryset.filter(public)
+
+
+class ResponseSearchFilter(BaseFilterBackend):
+    """Search filter backend for the response API"""
+
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, "").strip()
+        if term:
+            return search_responses(queryset, term, request.user)
+        else:
+            return queryset
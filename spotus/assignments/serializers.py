@@ -3,18 +3,29 @@ Serializers for the Assignment application API
 """
 
 # Django
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.db.models import Q
+from django.urls import reverse
 from rest_framework import serializers
 
-# Standard Library
-from collections import OrderedDict
-
 # Third Party
-from taggit.models import Tag
+from markdownify.templatetags.markdownify import markdownify
+from taggit.models import Tag, TaggedItem
 from taggit.utils import parse_tags
 
 # SpotUs
+from spotus.assignments.analytics import invalidate_analytics
 from spotus.assignments.fields import STATIC_FIELDS
-from spotus.assignments.models import Response
+from spotus.assignments.models import (
+    Assignment,
+    Consensus,
+    Data,
+    Field,
+    Response,
+    Webhook,
+)
+from spotus.assignments.search import update_search_vectors
 
 
 class TagField(serializers.ListField):
@@ -26,6 +37,15 @@ class TagField(serializers.ListField):
         return [t.name for t in data.all()]
 
 
+class ResponseListSerializer(serializers.ListSerializer):
+    """Load the fields for every assignment on the page up front"""
+
+    def to_representation(self, data):
+        responses = list(data.all() if isinstance(data, models.Manager) else data)
+        self.child.load_field_labels({r.assignment_id for r in responses})
+        return super().to_representation(responses)
+
+
 class ResponseBaseSerializer(serializers.ModelSerializer):
     """Base serializer for Crowdsource Response model"""
 
@@ -39,24 +59,47 @@ class ResponseBaseSerializer(serializers.ModelSerializer):
 
     def get_values(self, obj):
         """Get the values to return"""
-        # use `.all()` calls so they can be prefetched
-        # form data in python
-        fields = obj.assignment.fields.all()
-        values = obj.values.all()
-        field_values = {}
-        field_labels = OrderedDict()
-        for field in fields:
-            if (field.gallery or self.show_all) and field.type not in STATIC_FIELDS:
-                field_values[field.pk] = []
-                field_labels[field.pk] = str(field)
-        for value in values:
-            if value.value and value.field_id in field_values:
-                field_values[value.field_id].append(value.value)
         return [
-            {"field": field_labels[fpk], "value": ", ".join(field_values[fpk])}
-            for fpk in field_labels
+            {
+                "field": label,
+                "value": ", ".join(
+                    v for v in obj.field_values.get(str(field_id), []) if v
+                ),
+            }
+            for field_id, label in self._get_field_labels(obj.assignment_id)
         ]
 
+    def _get_field_labels(self, assignment_id):
+        """The ordered field ids and labels to show for an assignment"""
+        self.load_field_labels([assignment_id])
+        return self.context["field_labels"][(assignment_id, self.show_all)]
+
+    def load_field_labels(self, assignment_ids):
+        """Load the field ids and labels to show for the given assignments
+        These are stored in the context, which is shared by all responses
+        serialized for a request, so they are only computed once per assignment
+        """
+        field_labels = self.context.setdefault("field_labels", {})
+        assignment_ids = {
+            i for i in assignment_ids if (i, self.show_all) not in field_labels
+        }
+        if not assignment_ids:
+            return
+        for assignment_id in assignment_ids:
+            field_labels[(assignment_id, self.show_all)] = []
+        fields = Field.objects.filter(assignment_id__in=assignment_ids).exclude(
+            type__in=STATIC_FIELDS
+        )
+        if not self.show_all:
+            fields = fields.filter(gallery=True)
+        for field in fields:
+            field_labels[(field.assignment_id, self.show_all)].append(
+                (field.pk, str(field))
+            )
+
+    class Meta:
+        list_serializer_class = ResponseListSerializer
+
 
 class ResponseAdminSerializer(ResponseBaseSerializer):
     """Serializer for the Crowdsource Response model for Crowdsource administrators"""
@@ -85,6 +128,7 @@ class ResponseAdminSerializer(ResponseBaseSerializer):
         tags = validated_data.pop("tags", None)
         instance = super().update(instance, validated_data)
         self._set_tags(instance, tags)
+        invalidate_analytics(instance.assignment_id)
         return instance
 
     def _set_tags(self, instance, tags):
@@ -95,10 +139,80 @@ class ResponseAdminSerializer(ResponseBaseSerializer):
                 new_tag, _ = Tag.objects.get_or_create(name=tag)
                 tag_set.add(new_tag)
             instance.tags.set(*tag_set)
+            update_search_vectors(Response.objects.filter(pk=instance.pk))
 
-    class Meta:
+    class Meta(ResponseBaseSerializer.Meta):
         model = Response
-        fields = "__all__"
+        exclude = ("search_vector", "field_values")
+
+
+class ResponseBulkSerializer(serializers.Serializer):
+    """Serializer for applying changes to many responses at once"""
+
+    # pylint: disable=abstract-method
+
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    flag = serializers.BooleanField(required=False)
+    gallery = serializers.BooleanField(required=False)
+    add_tags = serializers.ListField(child=serializers.CharField(), required=False)
+    remove_tags = serializers.ListField(child=serializers.CharField(), required=False)
+
+    def validate(self, attrs):
+        """Require at least one change"""
+        if not attrs.keys() - {"ids"}:
+            raise serializers.ValidationError("No changes were given")
+        return attrs
+
+    def apply(self, response_ids):
+        """Apply the changes to the given responses with set based queries"""
+        responses = Response.objects.filter(pk__in=response_ids)
+        updates = {
+            k: self.validated_data[k]
+            for k in ("flag", "gallery")
+            if k in self.validated_data
+        }
+        if updates:
+            responses.update(**updates)
+        add_tags = self._get_tags(self.validated_data.get("add_tags"), create=True)
+        remove_tags = self._get_tags(self.validated_data.get("remove_tags"))
+        content_type = ContentType.objects.get_for_model(Response)
+        if remove_tags:
+            TaggedItem.objects.filter(
+                content_type=content_type,
+                object_id__in=response_ids,
+                tag__in=remove_tags,
+            ).delete()
+        if add_tags:
+            TaggedItem.objects.bulk_create(
+                [
+                    TaggedItem(
+                        content_type=content_type, object_id=response_id, tag=tag
+                    )
+                    for response_id in response_ids
+                    for tag in add_tags
+                ],
+                ignore_conflicts=True,
+            )
+        if add_tags or remove_tags:
+            update_search_vectors(responses)
+
+    def _get_tags(self, names, create=False):
+        """Look up the tags with the given names, optionally creating missing ones"""
+        if not names:
+            return []
+        names = parse_tags(",".join(names))
+        query = Q()
+        for name in names:
+            query |= Q(name__iexact=name)
+        tags = list(Tag.objects.filter(query))
+        if create:
+            existing = {t.name.lower() for t in tags}
+            tags.extend(
+                Tag.objects.create(name=name)
+                for name in names
+                if name.lower() not in existing
+            )
+        return tags
 
 
 class ResponseGallerySerializer(ResponseBaseSerializer):
@@ -113,7 +227,7 @@ class ResponseGallerySerializer(ResponseBaseSerializer):
         else:
             return "Anonymous"
 
-    class Meta:
+    class Meta(ResponseBaseSerializer.Meta):
         model = Response
         fields = [
             "assignment",
@@ -124,3 +238,120 @@ class ResponseGallerySerializer(ResponseBaseSerializer):
             "edit_datetime",
             "values",
         ]
+
+
+class AssignmentFormSerializer(serializers.ModelSerializer):
+    """Serializer for an assignment's form, for rendering it client side"""
+
+    description = serializers.SerializerMethodField()
+    fields = serializers.SerializerMethodField(method_name="get_form_fields")
+    submit_url = serializers.SerializerMethodField()
+
+    def get_description(self, obj):
+        """Render the markdown description"""
+        return markdownify(obj.description)
+
+    def get_form_fields(self, obj):
+        """The form fields, in the same format as the form builder uses"""
+        return [
+            f.get_json()
+            for f in obj.fields.filter(deleted=False).prefetch_related("choices")
+        ]
+
+    def get_submit_url(self, obj):
+        """Forms are submitted to the embedded form view"""
+        return reverse("assignments:embed", kwargs={"slug": obj.slug, "pk": obj.pk})
+
+    class Meta:
+        model = Assignment
+        fields = [
+            "id",
+            "title",
+            "description",
+            "status",
+            "registration",
+            "ask_public",
+            "multiple_per_page",
+            "form_version",
+            "fields",
+            "submit_url",
+        ]
+
+
+class DataSerializer(serializers.ModelSerializer):
+    """Serializer for an assignment data item, with its embed html"""
+
+    embed = serializers.CharField()
+
+    class Meta:
+        model = Data
+        fields = ["id", "url", "metadata", "embed"]
+
+
+class DistributionFilterSerializer(serializers.Serializer):
+    """Filters for the responses counted in an assignment's answer distribution"""
+
+    flag = serializers.BooleanField(required=False)
+    gallery = serializers.BooleanField(required=False)
+    tag = serializers.CharField(required=False)
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+
+class ConsensusSerializer(serializers.ModelSerializer):
+    """Serializer for the consensus for a data item and field"""
+
+    class Meta:
+        model = Consensus
+        fields = ["data", "field", "value", "count", "total", "agreement", "conflicts"]
+
+
+class WebhookSerializer(serializers.ModelSerializer):
+    """Serializer for subscribing to an assignment's new and edited responses"""
+
+    assignment = serializers.PrimaryKeyRelatedField(queryset=Assignment.objects.all())
+
+    def validate_assignment(self, value):
+        """The user must be able to edit the assignment, which may not be changed"""
+        if self.instance is not None and value != self.instance.assignment:
+            raise serializers.ValidationError("The assignment may not be changed")
+        if not self.context["request"].user.has_perm(
+            "assignments.change_assignment", value
+        ):
+            raise serializers.ValidationError(
+                "You do not have permission to edit this assignment"
+            )
+        return value
+
+    class Meta:
+        model = Webhook
+        fields = [
+            "id",
+            "assignment",
+            "url",
+            "secret",
+            "active",
+            "cursor",
+            "failures",
+            "retry_at",
+            "last_error",
+            "datetime_created",
+        ]
+        read_only_fields = [
+            "secret",
+            "cursor",
+            "failures",
+            "retry_at",
+            "last_error",
+            "datetime_created",
+        ]
+
+
+class WebhookReplaySerializer(serializers.Serializer):
+    """Serializer for delivering a webhook's events again"""
+
+    # pylint: disable=abstract-method
+
+    cursor = serializers.IntegerField(
+        min_value=0, help_text="Deliver the events after this id"
+    )
@@ -4,11 +4,13 @@ Celery tasks for the assignment application
 
 # Django
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 
 # Standard Library
 import csv
 import logging
-from datetime import date
+from datetime import date, timedelta
 from hashlib import md5
 from time import time
 from urllib.parse import quote_plus
@@ -19,8 +21,26 @@ from smart_open import open as smart_open
 
 # SpotUs
 from config import celery_app
-from spotus.assignments.models import Assignment
+from spotus.assignments import buffer
+from spotus.assignments.analytics import (
+    refresh_distribution as _refresh_distribution,
+    refresh_field_stats as _refresh_field_stats,
+)
+from spotus.assignments.archive import archive_assignment as _archive_assignment
+from spotus.assignments.choices import Status
+from spotus.assignments.consensus import update_consensus as _update_consensus
+from spotus.assignments.messaging import send_batch, send_diagnostics
+from spotus.assignments.models import Assignment, BulkMessage, Field, Response
+from spotus.assignments.search import update_search_vectors
+from spotus.assignments.serializers import DistributionFilterSerializer
+from spotus.assignments.webhooks import (
+    deliver,
+    get_pending,
+    get_subscribed,
+    prune_events,
+)
 from spotus.core.email import TemplateEmail
+from spotus.core.replica import use_replica
 from spotus.users.models import User
 
 logger = logging.getLogger(__name__)
@@ -52,6 +72,34 @@ def datum_per_page(assignment_pk, doc_id, metadata, **kwargs):
         )
 
 
+@celery_app.task()
+def send_submission_emails(response_pk):
+    """Email a new response to the assignment's submission email addresses"""
+    response = Response.objects.select_related("assignment", "user").get(pk=response_pk)
+    for email in response.assignment.submission_emails.split(","):
+        response.send_email(email)
+
+
+@celery_app.task()
+def drain_submissions():
+    """Save buffered submissions to the database, continuing in a new task if
+    it stopped with submissions left over
+    """
+    responses, more = buffer.drain_submissions()
+    if more:
+        drain_submissions.delay()
+    emails = set(
+        Assignment.objects.filter(pk__in={r.assignment_id for r in responses})
+        .exclude(submission_emails="")
+        .values_list("pk", flat=True)
+    )
+    for response in responses:
+        if response.assignment_id in emails:
+            send_submission_emails.delay(response.pk)
+    for assignment_pk in get_subscribed({r.assignment_id for r in responses}):
+        deliver_webhooks.delay(assignment_pk)
+
+
 @celery_app.task()
 def import_doccloud_proj(
     assignment_pk, proj_id, metadata, doccloud_each_page, **kwargs
@@ -160,11 +208,201 @@ class ExportCsv(AsyncFileDownloadTask):
         writer.writerow(
             self.assignment.get_header_values(metadata_keys, include_emails)
         )
-        for csr in self.assignment.responses.all().iterator():
+        if self.assignment.is_archived:
+            responses = self.assignment.archived_responses
+        else:
+            responses = self.get_responses()
+        for csr in responses:
             writer.writerow(csr.get_values(metadata_keys, include_emails))
 
+    def get_responses(self):
+        """The assignment's responses, loaded in chunks by id so that their tags
+        may be prefetched for each chunk
+        """
+        responses = (
+            self.assignment.responses.select_related("user", "data")
+            .prefetch_related("tags")
+            .order_by("pk")
+        )
+        last_pk = 0
+        while True:
+            chunk = list(
+                responses.filter(pk__gt=last_pk)[
+                    : settings.ASSIGNMENT_EXPORT_CHUNK_SIZE
+                ]
+            )
+            yield from chunk
+            if len(chunk) < settings.ASSIGNMENT_EXPORT_CHUNK_SIZE:
+                return
+            last_pk = chunk[-1].pk
+
+
+class ExportConsensusCsv(ExportCsv):
+    """Export the consensus for each of the assignment's data items"""
+
+    file_name = "consensus.csv"
+    subject = "Your Consensus CSV Export"
+
+    def generate_file(self, out_file):
+        """Export a row for each data item, with the consensus value and
+        agreement for each field
+        """
+        metadata_keys = self.assignment.get_metadata_keys()
+        value_fields = self.assignment.value_fields
+        consensus = {
+            (c.data_id, c.field_id): c for c in self.assignment.get_consensus()
+        }
+
+        writer = csv.writer(out_file)
+        header = ["datum"] + metadata_keys
+        for field in value_fields:
+            header.extend([str(field), f"{field} agreement", f"{field} responses"])
+        writer.writerow(header)
+        for datum in self.assignment.get_data():
+            row = [datum.url] + [datum.metadata.get(k, "") for k in metadata_keys]
+            for field in value_fields:
+                field_consensus = consensus.get((datum.pk, field.pk))
+                if field_consensus is None:
+                    row.extend(["", "", 0])
+                else:
+                    row.extend(
+                        [
+                            field_consensus.value,
+                            "{:.2f}".format(field_consensus.agreement),
+                            field_consensus.total,
+                        ]
+                    )
+            writer.writerow(row)
+
 
 @celery_app.task()
-def export_csv(assignment_pk, user_pk):
-    """Export the results of the assignment for the user"""
-    ExportCsv(user_pk, assignment_pk).run()
+def export_csv(assignment_pk, user_pk, replica=True):
+    """Export the results of the assignment for the user
+    The export is read from the replica, unless the user has just written
+    """
+    with use_replica(enabled=replica):
+        ExportCsv(user_pk, assignment_pk).run()
+
+
+@celery_app.task()
+def export_consensus_csv(assignment_pk, user_pk):
+    """Export the consensus for each of the assignment's data items, after
+    bringing it up to date
+    """
+    _update_consensus(assignment_pk)
+    ExportConsensusCsv(user_pk, assignment_pk).run()
+
+
+@celery_app.task(soft_time_limit=10 * 60, time_limit=15 * 60)
+def update_consensus(assignment_pk, full=False):
+    """Update the consensus for the assignment's data items"""
+    _update_consensus(assignment_pk, full=full)
+
+
+@celery_app.task()
+def update_open_consensus():
+    """Update the consensus for open assignments with redundant responses"""
+    for assignment_pk in (
+        Assignment.objects.filter(
+            status=Status.open, data_limit__gt=1, data__isnull=False
+        )
+        .distinct()
+        .values_list("pk", flat=True)
+    ):
+        update_consensus.delay(assignment_pk)
+
+
+@celery_app.task()
+def rebuild_search_vectors(assignment_pk):
+    """Rebuild the search vectors for an assignment's responses, after the
+    fields shown in its gallery change
+    """
+    update_search_vectors(Response.objects.filter(assignment=assignment_pk))
+
+
+@celery_app.task()
+def refresh_distribution(assignment_pk, filters):
+    """Recount the answers to the assignment's choice fields"""
+    serializer = DistributionFilterSerializer(data=filters)
+    serializer.is_valid(raise_exception=True)
+    _refresh_distribution(
+        Assignment.objects.get(pk=assignment_pk), serializer.validated_data
+    )
+
+
+@celery_app.task()
+def refresh_field_stats(field_pk):
+    """Summarize the answers to a number or date field"""
+    _refresh_field_stats(Field.objects.select_related("assignment").get(pk=field_pk))
+
+
+@celery_app.task(soft_time_limit=55 * 60, time_limit=60 * 60)
+def archive_assignment(assignment_pk):
+    """Move a closed assignment's data and responses to its archive"""
+    _archive_assignment(assignment_pk)
+
+
+@celery_app.task()
+def archive_closed_assignments():
+    """Archive assignments which have been closed for long enough"""
+    closed = timezone.now() - timedelta(days=settings.ASSIGNMENT_ARCHIVE_DAYS)
+    for assignment_pk in Assignment.objects.filter(
+        status=Status.closed, datetime_closed__lt=closed, archive=""
+    ).values_list("pk", flat=True):
+        archive_assignment.delay(assignment_pk)
+
+
+@celery_app.task()
+def send_bulk_message(message_pk):
+    """Find the message's recipients, and send it to them in batches"""
+    with transaction.atomic():
+        message = (
+            BulkMessage.objects.select_for_update()
+            .select_related("assignment")
+            .get(pk=message_pk)
+        )
+        if message.total is not None:
+            # the recipients have already been found and sent to
+            return
+        user_pks = message.get_recipients()
+        message.total = len(user_pks)
+        message.save(update_fields=["total"])
+    send_diagnostics(message)
+    size = settings.ASSIGNMENT_MESSAGE_BATCH_SIZE
+    for i in range(0, len(user_pks), size):
+        send_bulk_message_batch.delay(message_pk, user_pks[i:i + size])
+
+
+@celery_app.task()
+def send_bulk_message_batch(message_pk, user_pks):
+    """Send the message to a batch of its recipients"""
+    send_batch(
+        BulkMessage.objects.select_related("assignment", "user").get(pk=message_pk),
+        user_pks,
+    )
+
+
+@celery_app.task()
+def deliver_webhooks(assignment_pk=None):
+    """Deliver pending response events to the assignment's webhooks, or to all
+    webhooks
+    """
+    for webhook_pk in get_pending(assignment_pk).values_list("pk", flat=True):
+        deliver_webhook.delay(webhook_pk)
+
+
+@celery_app.task(soft_time_limit=5 * 60, time_limit=6 * 60)
+def deliver_webhook(webhook_pk):
+    """Deliver pending response events to the webhook, retrying later if it
+    fails or there are more to deliver
+    """
+    delay = deliver(webhook_pk)
+    if delay is not None:
+        deliver_webhook.apply_async((webhook_pk,), countdown=delay)
+
+
+@celery_app.task(soft_time_limit=10 * 60, time_limit=11 * 60)
+def prune_webhook_events():
+    """Delete old response events for webhooks"""
+    deleted = prune_events()
+    logger.info("Pruned %d webhook events", deleted)
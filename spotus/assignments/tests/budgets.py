@@ -0,0 +1,20 @@
+"""
+Query budgets for the assignment views, API endpoints and tasks
+
+Each budget is the most queries its test may make, and how many rows its test
+creates, such as responses to export, so that a query made for each row
+exceeds the budget.  Lower a budget when a view needs fewer queries, and only
+raise one knowingly.
+"""
+
+# Standard Library
+from collections import namedtuple
+
+Budget = namedtuple("Budget", ["queries", "size"])
+
+BUDGETS = {
+    "AssignmentListView": Budget(queries=7, size=20),
+    "AssignmentDetailView": Budget(queries=15, size=20),
+    "ResponseViewSet": Budget(queries=5, size=20),
+    "ExportCsv": Budget(queries=11, size=20),
+}
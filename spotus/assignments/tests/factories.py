@@ -113,3 +113,10 @@ class ValueFactory(factory.django.DjangoModelFactory):
     response = factory.SubFactory(ResponseFactory)
     field = factory.SubFactory(FieldFactory)
     value = factory.Faker("word")
+
+    @factory.post_generation
+    def field_values(self, create, extracted, **kwargs):
+        """Keep the response's current values up to date"""
+        # pylint: disable=unused-argument
+        if create:
+            self.response.update_field_values()
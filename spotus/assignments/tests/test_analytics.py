@@ -0,0 +1,306 @@
+"""Tests for assignment analytics"""
+
+# Django
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+# Standard Library
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+# Third Party
+import pytest
+
+# SpotUs
+from spotus.assignments.analytics import (
+    get_distribution,
+    get_stats,
+    invalidate_analytics,
+)
+from spotus.assignments.archive import archive_assignment
+from spotus.assignments.choices import Status
+from spotus.assignments.tasks import refresh_distribution, refresh_field_stats
+from spotus.assignments.tests.factories import (
+    AssignmentCheckboxGroupFieldFactory,
+    AssignmentFactory,
+    AssignmentSelectFieldFactory,
+    AssignmentTextFieldFactory,
+    FieldFactory,
+    ResponseFactory,
+    ValueFactory,
+)
+from spotus.assignments.tests.test_views import mock_middleware
+from spotus.assignments.tests.test_viewsets import assignment_action, bulk_responses
+from spotus.assignments.views import AssignmentDetailView
+from spotus.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def create_assignment():
+    """An assignment with responses to its choice fields"""
+    assignment = AssignmentFactory(status=Status.open)
+    select = AssignmentSelectFieldFactory(assignment=assignment)
+    group = AssignmentCheckboxGroupFieldFactory(assignment=assignment)
+    checkbox = FieldFactory(assignment=assignment, type="checkbox2")
+    text = AssignmentTextFieldFactory(assignment=assignment)
+    first, second = [c.value for c in select.choices.all()[:2]]
+    group_first, group_second = [c.value for c in group.choices.all()[:2]]
+    for flag, values in [
+        (True, {select: [first], group: [group_first, group_second]}),
+        (False, {select: [first], group: [group_second]}),
+        (False, {select: [second], group: [""], text: ["x"]}),
+    ]:
+        values[checkbox] = ["True" if flag else "False"]
+        response = ResponseFactory(assignment=assignment, flag=flag)
+        for field, field_values in values.items():
+            for value in field_values:
+                ValueFactory(response=response, field=field, value=value)
+    return assignment
+
+
+def counts(distribution):
+    """The counts for each field, by choice label"""
+    return {
+        field["type"]: {c["label"]: c["count"] for c in field["choices"]}
+        for field in distribution["fields"]
+    }
+
+
+def create_stats_assignment():
+    """An assignment with answers to a number and a date field"""
+    assignment = AssignmentFactory(status=Status.open)
+    number = FieldFactory(assignment=assignment, type="number")
+    date = FieldFactory(assignment=assignment, type="date")
+    answers = [(number, v) for v in ["1.0", "2.0", "3.0", "4.0", "500.0", "many"]]
+    answers += [(date, v) for v in ["2020-01-01", "2020-01-11", "2020-01-21"]]
+    for field, value in answers:
+        ValueFactory(
+            response=ResponseFactory(assignment=assignment), field=field, value=value
+        )
+    return assignment
+
+
+class TestDistribution:
+    """Test counting the answers to choice fields"""
+
+    def test_distribution(self):
+        """Answers to the choice fields are counted by choice"""
+        assignment = create_assignment()
+        distribution = get_distribution(assignment)
+        labels = [c.choice for c in assignment.fields.get(type="select").choices.all()]
+        group_labels = [
+            c.choice for c in assignment.fields.get(type="checkbox-group").choices.all()
+        ]
+        assert distribution["responses"] == 3
+        assert counts(distribution) == {
+            "select": {labels[0]: 2, labels[1]: 1, labels[2]: 0},
+            "checkbox-group": {
+                group_labels[0]: 1,
+                group_labels[1]: 2,
+                group_labels[2]: 0,
+            },
+            "checkbox2": {"Checked": 1, "Unchecked": 2},
+        }
+
+    def test_distribution_filters(self):
+        """The counted responses may be filtered"""
+        assignment = create_assignment()
+        distribution = get_distribution(assignment, {"flag": True})
+        assert distribution["responses"] == 1
+        assert counts(distribution)["checkbox2"] == {"Checked": 1, "Unchecked": 0}
+
+        assignment.responses.get(flag=True).tags.add("tagged")
+        distribution = get_distribution(assignment, {"tag": "tagged"})
+        assert counts(distribution)["checkbox2"] == {"Checked": 1, "Unchecked": 0}
+
+        assignment.responses.filter(flag=True).update(
+            datetime=timezone.now() - timedelta(days=7)
+        )
+        yesterday = timezone.localdate() - timedelta(days=1)
+        assert get_distribution(assignment, {"start": yesterday})["responses"] == 2
+        assert get_distribution(assignment, {"end": yesterday})["responses"] == 1
+
+    def test_distribution_cache(self):
+        """The counts are cached until the responses change"""
+        assignment = create_assignment()
+        select = assignment.fields.get(type="select")
+        before = counts(get_distribution(assignment))
+        ValueFactory(
+            response=ResponseFactory(assignment=assignment),
+            field=select,
+            value=select.choices.last().value,
+        )
+        assert counts(get_distribution(assignment)) == before
+        invalidate_analytics(assignment.pk)
+        refresh = Mock()
+        distribution = get_distribution(assignment, refresh=refresh)
+        assert distribution["stale"]
+        assert counts(distribution) == before
+        get_distribution(assignment, refresh=refresh)
+        refresh.assert_called_once_with()
+        distribution = get_distribution(assignment)
+        assert not distribution["stale"]
+        assert counts(distribution) != before
+
+    def test_distribution_pending(self):
+        """Counts which are not cached are counted by `refresh`, if it is given,
+        and returned pending, without any counts
+        """
+        assignment = create_assignment()
+        refresh = Mock()
+        distribution = get_distribution(assignment, refresh=refresh)
+        assert distribution == {
+            "responses": None,
+            "fields": [],
+            "stale": True,
+            "pending": True,
+        }
+        get_distribution(assignment, refresh=refresh)
+        refresh.assert_called_once_with()
+        assert get_distribution(assignment)["responses"] == 3
+
+    def test_distribution_archived(self):
+        """An archived assignment's answers are counted from its archive"""
+        assignment = create_assignment()
+        distribution = get_distribution(assignment, {"flag": False})
+        assignment.status = Status.closed
+        assignment.save()
+        archive_assignment(assignment.pk)
+        invalidate_analytics(assignment.pk)
+        assignment.refresh_from_db()
+        assert get_distribution(assignment, {"flag": False}) == distribution
+
+    def test_distribution_api(self):
+        """The distribution is shown to the assignment's editors, and is recounted
+        when responses are edited through the API
+        """
+        assignment = create_assignment()
+        user = assignment.user
+        other_user = UserFactory()
+        with patch("spotus.assignments.viewsets.refresh_distribution") as mock_task:
+            response = assignment_action(
+                "distribution", assignment, user, QUERY_STRING="flag=true"
+            )
+        # nothing is counted during the request
+        assert response.data["pending"]
+        assert response.data["responses"] is None
+        mock_task.delay.assert_called_once_with(assignment.pk, {"flag": True})
+        refresh_distribution(assignment.pk, {"flag": True})
+        response = assignment_action(
+            "distribution", assignment, user, QUERY_STRING="flag=true"
+        )
+        assert not response.data["pending"]
+        assert response.data["responses"] == 1
+        bulk_responses(user, {"flag": True}, {"assignment": assignment.pk})
+        with patch("spotus.assignments.viewsets.refresh_distribution") as mock_task:
+            response = assignment_action(
+                "distribution", assignment, user, QUERY_STRING="flag=true"
+            )
+        assert response.data["stale"]
+        mock_task.delay.assert_called_once_with(assignment.pk, {"flag": True})
+        refresh_distribution(assignment.pk, {"flag": True})
+        response = assignment_action(
+            "distribution", assignment, user, QUERY_STRING="flag=true"
+        )
+        assert not response.data["stale"]
+        assert response.data["responses"] == 3
+        response = assignment_action("distribution", assignment, other_user)
+        assert response.status_code == 403
+
+    def test_distribution_api_invalid(self):
+        """The filters are validated"""
+        assignment = create_assignment()
+        response = assignment_action(
+            "distribution", assignment, assignment.user, QUERY_STRING="start=yesterday"
+        )
+        assert response.status_code == 400
+
+
+class TestStats:
+    """Test summarizing the answers to number and date fields"""
+
+    def test_stats(self):
+        """Number and date answers are summarized, and outliers found"""
+        stats_assignment = create_stats_assignment()
+        stats = {s["type"]: s for s in get_stats(stats_assignment)}
+        number = stats["number"]
+        assert number["count"] == 5
+        assert (number["min"], number["max"]) == (1, 500)
+        assert (number["mean"], number["median"]) == (102, 3)
+        assert [b["count"] for b in number["histogram"]] == [4] + [0] * 8 + [1]
+        assert [o["value"] for o in number["outliers"]] == [500]
+        assert [i["value"] for i in number["invalid"]] == ["many"]
+        assert number["outliers"][0]["response"] == (
+            stats_assignment.responses.get(values__value="500.0").pk
+        )
+
+        date = stats["date"]
+        assert (date["min"], date["max"]) == ("2020-01-01", "2020-01-21")
+        assert (date["mean"], date["median"]) == ("2020-01-11", "2020-01-11")
+        assert date["histogram"][0] == {
+            "start": "2020-01-01",
+            "end": "2020-01-02",
+            "count": 1,
+        }
+        assert date["histogram"][-1]["end"] == "2020-01-21"
+        assert sum(b["count"] for b in date["histogram"]) == 3
+        assert date["outliers"] == []
+
+    def test_stats_archived(self):
+        """An archived assignment's answers are summarized from its archive"""
+        stats_assignment = create_stats_assignment()
+        stats = get_stats(stats_assignment)
+        stats_assignment.status = Status.closed
+        stats_assignment.save()
+        archive_assignment(stats_assignment.pk)
+        invalidate_analytics(stats_assignment.pk)
+        stats_assignment.refresh_from_db()
+        assert get_stats(stats_assignment) == stats
+
+    def test_stats_api(self):
+        """The summaries are shown to editors, and made again in the background
+        once responses change
+        """
+        stats_assignment = create_stats_assignment()
+        user = stats_assignment.user
+        with patch("spotus.assignments.viewsets.refresh_field_stats") as mock_task:
+            response = assignment_action("stats", stats_assignment, user)
+        assert len(response.data["fields"]) == 2
+        assert all(s["pending"] and s["count"] is None for s in response.data["fields"])
+        assert mock_task.delay.call_count == 2
+        for field in stats_assignment.fields.all():
+            refresh_field_stats(field.pk)
+        response = assignment_action("stats", stats_assignment, user)
+        assert not any(s["pending"] or s["stale"] for s in response.data["fields"])
+        number = stats_assignment.fields.get(type="number")
+        ValueFactory(
+            response=ResponseFactory(assignment=stats_assignment),
+            field=number,
+            value="5",
+        )
+        invalidate_analytics(stats_assignment.pk)
+        with patch("spotus.assignments.viewsets.refresh_field_stats") as mock_task:
+            response = assignment_action("stats", stats_assignment, user)
+        assert all(s["stale"] for s in response.data["fields"])
+        assert mock_task.delay.call_count == 2
+        response = assignment_action("stats", stats_assignment, UserFactory())
+        assert response.status_code == 403
+
+    def test_stats_detail(self):
+        """The summaries are shown in the detail page's info tab, linking to the
+        outlying responses
+        """
+        stats_assignment = create_stats_assignment()
+        get_stats(stats_assignment)
+        request = RequestFactory().get(stats_assignment.get_absolute_url())
+        request = mock_middleware(request)
+        request.user = stats_assignment.user
+        response = AssignmentDetailView.as_view()(
+            request, slug=stats_assignment.slug, pk=stats_assignment.pk
+        )
+        outlier = stats_assignment.responses.get(values__value="500.0")
+        assert reverse("assignments:edit-response", kwargs={"pk": outlier.pk}) in (
+            response.rendered_content
+        )
@@ -0,0 +1,157 @@
+"""Tests for archiving assignments"""
+
+# Django
+from django.contrib.auth.models import AnonymousUser
+from django.utils import timezone
+
+# Standard Library
+import csv
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+# Third Party
+import pytest
+
+# SpotUs
+from spotus.assignments.archive import (
+    ArchiveError,
+    archive_assignment,
+    restore_assignment,
+)
+from spotus.assignments.choices import Status
+from spotus.assignments.models import Assignment, Data, Response, Value
+from spotus.assignments.tasks import ExportCsv, archive_closed_assignments
+from spotus.assignments.tests.factories import (
+    AssignmentFactory,
+    AssignmentTextFieldFactory,
+    DataFactory,
+    ResponseFactory,
+    ValueFactory,
+)
+from spotus.assignments.tests.test_viewsets import list_responses
+from spotus.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def create_assignment():
+    """A closed assignment with data, responses, values and tags"""
+    assignment = AssignmentFactory(status=Status.closed)
+    field = AssignmentTextFieldFactory(assignment=assignment, gallery=True)
+    data = DataFactory(assignment=assignment, metadata={"name": "Document"})
+    public = ResponseFactory(
+        assignment=assignment, data=data, gallery=True, public=True
+    )
+    ValueFactory(response=public, field=field, value="Public")
+    public.tags.add("tag")
+    private = ResponseFactory(assignment=assignment, data=data, flag=True)
+    ValueFactory(response=private, field=field, value="Private")
+    return assignment
+
+
+def get_values(assignment):
+    """The assignment's rows, to compare before archiving and after restoring"""
+    return (
+        list(assignment.data.order_by("pk").values()),
+        list(
+            assignment.responses.order_by("pk").values(
+                "pk", "user", "datetime", "data", "flag", "gallery", "field_values"
+            )
+        ),
+        list(Value.objects.filter(assignment=assignment).order_by("pk").values()),
+        [list(r.tags.names()) for r in assignment.responses.order_by("pk")],
+    )
+
+
+class TestArchive:
+    """Test archiving and restoring assignments"""
+
+    def test_archive(self):
+        """Archiving an assignment moves its rows to the archive"""
+        assignment = create_assignment()
+        values = get_values(assignment)
+        per_day = list(assignment.responses_per_day())
+        archive_assignment(assignment.pk)
+
+        assert not Data.objects.filter(assignment=assignment).exists()
+        assert not Response.objects.filter(assignment=assignment).exists()
+        assert not Value.objects.filter(assignment=assignment).exists()
+        archived = Assignment.objects.get(pk=assignment.pk)
+        assert archived.is_archived
+        assert archived.datetime_archived is not None
+        assert [r.pk for r in archived.archived_responses] == [
+            r["pk"] for r in values[1]
+        ]
+        assert [r.field_values for r in archived.archived_responses] == [
+            r["field_values"] for r in values[1]
+        ]
+        assert [list(r.tags.names()) for r in archived.archived_responses] == values[3]
+        assert archived.archived_responses[0].data.metadata == {"name": "Document"}
+
+        # the stats are read from the archive
+        assert archived.response_count() == 2
+        assert len(archived.get_data()) == 1
+        assert archived.percent_complete() == 66
+        assert archived.get_metadata_keys() == ["name"]
+        assert list(archived.responses_per_day()) == per_day
+
+    def test_archive_open(self):
+        """Only closed assignments may be archived"""
+        assignment = AssignmentFactory(status=Status.open)
+        with pytest.raises(ArchiveError):
+            archive_assignment(assignment.pk)
+
+    def test_restore(self):
+        """Restoring an assignment moves its rows back from the archive"""
+        assignment = create_assignment()
+        values = get_values(assignment)
+        archive_assignment(assignment.pk)
+        name = Assignment.objects.get(pk=assignment.pk).archive.name
+        restored = restore_assignment(assignment.pk)
+
+        assert not restored.is_archived
+        assert not restored.archive.storage.exists(name)
+        assert get_values(restored) == values
+        assert Response.objects.filter(search_vector="tag").count() == 1
+        # archiving again works with the restored rows
+        archive_assignment(assignment.pk)
+
+    def test_export(self):
+        """The CSV export reads an archived assignment's responses"""
+        assignment = create_assignment()
+        user = UserFactory()
+        out_file = StringIO()
+        ExportCsv(user.pk, assignment.pk).generate_file(out_file)
+        archive_assignment(assignment.pk)
+        archived_file = StringIO()
+        ExportCsv(user.pk, assignment.pk).generate_file(archived_file)
+        rows = list(csv.reader(StringIO(archived_file.getvalue())))
+        assert len(rows) == 3
+        assert archived_file.getvalue() == out_file.getvalue()
+
+    def test_list_responses(self):
+        """The responses API reads an archived assignment's gallery"""
+        assignment = create_assignment()
+        archive_assignment(assignment.pk)
+        params = {"assignment": assignment.pk}
+        response = list_responses(AnonymousUser(), params)
+        assert [r["values"][0]["value"] for r in response.data["results"]] == ["Public"]
+        response = list_responses(assignment.user, params)
+        assert response.data["count"] == 2
+        assert response.data["results"][0]["tags"] == ["tag"]
+        response = list_responses(assignment.user, dict(params, flag="true"))
+        assert [r["flag"] for r in response.data["results"]] == [True]
+        response = list_responses(assignment.user, dict(params, search="publ"))
+        assert response.data["count"] == 1
+
+    def test_archive_closed_assignments(self):
+        """Assignments closed long enough ago are archived"""
+        old = AssignmentFactory(
+            status=Status.closed, datetime_closed=timezone.now() - timedelta(days=365)
+        )
+        AssignmentFactory(status=Status.closed, datetime_closed=timezone.now())
+        AssignmentFactory(status=Status.open)
+        with patch("spotus.assignments.tasks.archive_assignment.delay") as mock_delay:
+            archive_closed_assignments()
+        mock_delay.assert_called_once_with(old.pk)
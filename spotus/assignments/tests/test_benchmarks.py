@@ -0,0 +1,54 @@
+"""Tests for the assignment benchmarks
+
+The benchmarks themselves are only run when selected, with `pytest -m
+benchmark`, as seeding the larger scales takes minutes.  Set BENCHMARK_OUTPUT
+to save their results as JSON.
+"""
+
+# Standard Library
+import json
+import os
+
+# Third Party
+import pytest
+
+# SpotUs
+from spotus.assignments import benchmarks
+
+pytestmark = pytest.mark.django_db
+
+
+def test_benchmarks():
+    """Every benchmark runs against a small seeded assignment"""
+    assignment = benchmarks.seed(100, fields=2, users=10)
+    assert assignment.responses.count() == 100
+    assert assignment.values.count() == 200
+    assert assignment.data.count() == 50
+    result = benchmarks.run(assignment, runs=1)
+    assert result["responses"] == 100
+    assert list(result["results"]) == list(benchmarks.BENCHMARKS)
+    for measurement in result["results"].values():
+        assert measurement["queries"] > 0
+        assert measurement["wall_ms"] > 0
+        assert measurement["peak_memory_kb"] >= 0
+    benchmarks.clear(assignment)
+    assert benchmarks.get_assignment(100) is None
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("scale", list(benchmarks.SCALES))
+def test_scale(scale):
+    """Benchmark the hot paths at each scale"""
+    responses = benchmarks.SCALES[scale]
+    assignment = benchmarks.seed(responses)
+    benchmarks.analyze()
+    result = benchmarks.run(assignment)
+    path = os.environ.get("BENCHMARK_OUTPUT")
+    if path:
+        saved = {}
+        if os.path.exists(path):
+            with open(path) as saved_file:
+                saved = json.load(saved_file)
+        saved[str(responses)] = result
+        with open(path, "w") as saved_file:
+            json.dump(saved, saved_file, indent=2)
@@ -0,0 +1,92 @@
+"""Query budgets for the assignment views, API endpoints and tasks
+
+Each test creates as many rows as its budget's size and runs the view or task
+inside the budget, which fails listing the queries made if there are too many.
+The budgets are in `budgets.py`.
+"""
+
+# Django
+from django.contrib.auth.models import AnonymousUser
+from django.urls import reverse
+
+# Standard Library
+import io
+
+# Third Party
+import pytest
+
+# SpotUs
+from spotus.assignments.choices import Status
+from spotus.assignments.tasks import ExportCsv
+from spotus.assignments.tests.factories import (
+    AssignmentFactory,
+    AssignmentTextFieldFactory,
+    ResponseFactory,
+)
+from spotus.assignments.tests.test_views import mock_middleware
+from spotus.assignments.tests.test_viewsets import list_responses
+from spotus.assignments.views import AssignmentDetailView, AssignmentListView
+from spotus.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def create_assignment():
+    """An open assignment with a field"""
+    assignment = AssignmentFactory(status=Status.open)
+    AssignmentTextFieldFactory(assignment=assignment)
+    return assignment
+
+
+def add_responses(assignment, size):
+    """Add tagged responses from different users"""
+    for response in ResponseFactory.create_batch(size, assignment=assignment):
+        response.tags.add("tagged")
+
+
+class TestQueryBudgets:
+    """Test the views, API endpoints and tasks stay within their query budgets"""
+
+    @pytest.mark.parametrize("anonymous", [True, False])
+    def test_list(self, rf, query_budget, anonymous):
+        """The assignment list, with each assignment's data and responses"""
+        budget = query_budget("AssignmentListView")
+        for _ in range(budget.size):
+            add_responses(AssignmentFactory(status=Status.open), 2)
+        request = mock_middleware(rf.get(reverse("assignments:list")))
+        request.user = AnonymousUser() if anonymous else UserFactory()
+        with budget:
+            AssignmentListView.as_view()(request).render()
+
+    def test_detail(self, rf, query_budget):
+        """An assignment's detail page, as its owner"""
+        assignment = create_assignment()
+        budget = query_budget("AssignmentDetailView")
+        add_responses(assignment, budget.size)
+        request = mock_middleware(rf.get(assignment.get_absolute_url()))
+        request.user = assignment.user
+        with budget:
+            AssignmentDetailView.as_view()(
+                request, slug=assignment.slug, pk=assignment.pk
+            ).render()
+
+    def test_responses_api(self, query_budget):
+        """A page of an assignment's responses from the API, as its owner"""
+        assignment = create_assignment()
+        budget = query_budget("ResponseViewSet")
+        add_responses(assignment, budget.size)
+        with budget:
+            response = list_responses(assignment.user, {"assignment": assignment.pk})
+            response.render()
+        assert len(response.data["results"]) == budget.size
+
+    def test_export_csv(self, query_budget, settings):
+        """Exporting an assignment's responses, in several chunks"""
+        assignment = create_assignment()
+        budget = query_budget("ExportCsv")
+        settings.ASSIGNMENT_EXPORT_CHUNK_SIZE = budget.size // 2
+        add_responses(assignment, budget.size)
+        out_file = io.StringIO()
+        with budget:
+            ExportCsv(assignment.user.pk, assignment.pk).generate_file(out_file)
+        assert len(out_file.getvalue().splitlines()) == budget.size + 1
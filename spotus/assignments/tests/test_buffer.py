@@ -0,0 +1,184 @@
+"""Tests for buffered assignment submissions"""
+
+# Django
+from django.urls import reverse
+
+# Standard Library
+from unittest.mock import patch
+
+# Third Party
+import pytest
+
+# SpotUs
+from spotus.assignments import buffer
+from spotus.assignments.choices import Status
+from spotus.assignments.models import Response
+from spotus.assignments.tasks import drain_submissions
+from spotus.assignments.tests.factories import (
+    AssignmentFactory,
+    AssignmentTextFieldFactory,
+    DataFactory,
+    ResponseFactory,
+)
+from spotus.assignments.tests.test_views import mock_middleware
+from spotus.assignments.views import AssignmentFormView
+from spotus.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def submit(assignment, data, form_data, user=None):
+    """Buffer a submission"""
+    return buffer.buffer_submission(assignment, user, "127.0.0.1", data, form_data)
+
+
+class TestBuffer:
+    """Test buffering submissions"""
+
+    def test_drain(self):
+        """Buffered submissions are saved in batches"""
+        assignment = AssignmentFactory()
+        field = AssignmentTextFieldFactory(assignment=assignment)
+        data = DataFactory(assignment=assignment)
+        user = UserFactory()
+        assert submit(assignment, data, {str(field.pk): "First", "public": True}, user)
+        assert not submit(assignment, data, {str(field.pk): "Second"})
+        assert not Response.objects.exists()
+
+        responses, more = buffer.drain_submissions()
+        assert len(responses) == 2
+        assert not more
+        first = Response.objects.get(values__value="First")
+        assert first.user == user
+        assert first.public
+        assert first.data == data
+        assert first.field_values == {str(field.pk): ["First"]}
+        second = Response.objects.get(values__value="Second")
+        assert second.user is None
+        assert second.ip_address == "127.0.0.1"
+        assert Response.objects.filter(search_vector="second").exists()
+
+        assert buffer.drain_submissions() == ([], False)
+        assert Response.objects.count() == 2
+
+    def test_drain_batches(self, settings):
+        """Each batch is saved separately"""
+        settings.ASSIGNMENT_BUFFER_BATCH_SIZE = 2
+        assignment = AssignmentFactory()
+        for _ in range(5):
+            submit(assignment, None, {})
+        with patch(
+            "spotus.assignments.buffer.save_submissions",
+            side_effect=buffer.save_submissions,
+        ) as mock_save:
+            assert len(buffer.drain_submissions()[0]) == 5
+        assert [len(c[0][0]) for c in mock_save.call_args_list] == [2, 2, 1]
+
+    def test_drain_more(self, settings):
+        """A drain which stops at its limit continues in a new task"""
+        settings.ASSIGNMENT_BUFFER_BATCH_SIZE = 2
+        settings.ASSIGNMENT_BUFFER_MAX_BATCHES = 1
+        assignment = AssignmentFactory()
+        for _ in range(3):
+            submit(assignment, None, {})
+        with patch.object(drain_submissions, "delay") as mock_delay:
+            drain_submissions()
+            mock_delay.assert_called_once_with()
+            assert Response.objects.count() == 2
+            drain_submissions()
+            mock_delay.assert_called_once_with()
+        assert Response.objects.count() == 3
+
+    def test_drain_numbers(self):
+        """Submissions are numbered by their contributor and data when saved"""
+        assignment = AssignmentFactory()
+        data = DataFactory(assignment=assignment)
+        user = UserFactory()
+        ResponseFactory(assignment=assignment, user=user, data=data)
+        for _ in range(2):
+            buffer.buffer_submission(assignment, user, None, data, {})
+            submit(assignment, data, {})
+        buffer.buffer_submission(assignment, user, None, None, {})
+        buffer.buffer_submission(assignment, None, None, data, {})
+        buffer.drain_submissions()
+        numbers = Response.objects.order_by("pk").values_list(
+            "user", "ip_address", "data", "number"
+        )
+        assert list(numbers) == [
+            (user.pk, None, data.pk, 1),
+            (user.pk, None, data.pk, 2),
+            (None, "127.0.0.1", data.pk, 1),
+            (user.pk, None, data.pk, 3),
+            (None, "127.0.0.1", data.pk, 2),
+            (user.pk, None, None, 1),
+            (None, None, data.pk, 1),
+        ]
+
+    def test_drain_failure(self, fake_redis):
+        """A failed batch is saved by the next drain, only once"""
+        assignment = AssignmentFactory()
+        field = AssignmentTextFieldFactory(assignment=assignment)
+        submit(assignment, None, {str(field.pk): "Answer"})
+        with patch(
+            "spotus.assignments.buffer.Value.objects.bulk_create",
+            side_effect=ValueError,
+        ):
+            with pytest.raises(ValueError):
+                buffer.drain_submissions()
+        assert not Response.objects.exists()
+        assert fake_redis.llen(buffer.PROCESSING_KEY) == 1
+
+        # simulate the batch being saved, but not removed from the buffer
+        batch = fake_redis.lrange(buffer.PROCESSING_KEY, 0, -1)
+        buffer.drain_submissions()
+        fake_redis.rpush(buffer.PROCESSING_KEY, *batch)
+        buffer.drain_submissions()
+        response = Response.objects.get()
+        assert response.values.get().value == "Answer"
+        assert fake_redis.llen(buffer.PROCESSING_KEY) == 0
+
+    def test_drain_deleted(self):
+        """Submissions for deleted assignments are dropped, and deleted data is
+        cleared
+        """
+        assignment = AssignmentFactory()
+        data = DataFactory(assignment=assignment)
+        submit(assignment, data, {})
+        deleted_assignment = AssignmentFactory()
+        submit(deleted_assignment, None, {})
+        data.delete()
+        deleted_assignment.delete()
+        responses, _ = buffer.drain_submissions()
+        assert len(responses) == 1
+        assert Response.objects.get().data is None
+
+    def test_drain_task_emails(self):
+        """The drain task sends the submission emails"""
+        assignment = AssignmentFactory(submission_emails="alice@example.com")
+        submit(assignment, None, {})
+        submit(AssignmentFactory(), None, {})
+        with patch("spotus.assignments.tasks.send_submission_emails") as mock_task:
+            drain_submissions()
+        mock_task.delay.assert_called_once_with(
+            Response.objects.get(assignment=assignment).pk
+        )
+
+    def test_view(self, rf):
+        """Buffered assignments buffer submissions from the form"""
+        assignment = AssignmentFactory(status=Status.open, buffer_submissions=True)
+        field = AssignmentTextFieldFactory(assignment=assignment)
+        url = reverse(
+            "assignments:assignment",
+            kwargs={"slug": assignment.slug, "pk": assignment.pk},
+        )
+        request = mock_middleware(rf.post(url, {str(field.pk): "Answer"}))
+        request.user = UserFactory()
+        with patch("spotus.assignments.views.drain_submissions") as mock_task:
+            response = AssignmentFormView.as_view()(
+                request, slug=assignment.slug, pk=assignment.pk
+            )
+        assert response.status_code == 302
+        assert not Response.objects.exists()
+        mock_task.apply_async.assert_called_once()
+        buffer.drain_submissions()
+        assert Response.objects.get().values.get().value == "Answer"
@@ -0,0 +1,183 @@
+"""Tests for the consensus across redundant responses"""
+
+# Django
+from django.contrib import admin
+from django.utils import timezone
+
+# Standard Library
+import csv
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import MagicMock
+
+# Third Party
+import pytest
+
+# SpotUs
+from spotus.assignments.admin import ResponseAdmin
+from spotus.assignments.archive import archive_assignment, restore_assignment
+from spotus.assignments.choices import Status
+from spotus.assignments.consensus import update_consensus
+from spotus.assignments.models import Assignment, Consensus, Response
+from spotus.assignments.tasks import ExportConsensusCsv
+from spotus.assignments.tests.factories import (
+    AssignmentCheckboxGroupFieldFactory,
+    AssignmentFactory,
+    AssignmentTextFieldFactory,
+    DataFactory,
+    ResponseFactory,
+    ValueFactory,
+)
+from spotus.assignments.tests.test_viewsets import assignment_action
+from spotus.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def respond(data, answers):
+    """Respond to the data item with the given values for each field"""
+    response = ResponseFactory(assignment=data.assignment, data=data)
+    for field, values in answers.items():
+        for value in values:
+            ValueFactory(response=response, field=field, value=value)
+    return response
+
+
+def create_assignment():
+    """An assignment with three responses to a data item"""
+    assignment = AssignmentFactory(data_limit=3)
+    field = AssignmentTextFieldFactory(assignment=assignment)
+    data = DataFactory(assignment=assignment, metadata={"name": "Document"})
+    respond(data, {field: ["Yes"]})
+    respond(data, {field: [" yes "]})
+    respond(data, {field: ["No"]})
+    return assignment
+
+
+class TestConsensus:
+    """Test the consensus across redundant responses"""
+
+    def test_consensus(self):
+        """The most common answer is the consensus, ignoring case and whitespace"""
+        assignment = create_assignment()
+        assert update_consensus(assignment.pk) == 1
+        consensus = assignment.consensus.get()
+        assert consensus.value in ("Yes", "yes")
+        assert consensus.count == 2
+        assert consensus.total == 3
+        assert consensus.agreement == pytest.approx(2 / 3)
+        assert [c["value"] for c in consensus.conflicts] == ["No"]
+        assert consensus.conflicts[0]["count"] == 1
+        assert len(consensus.conflicts[0]["responses"]) == 1
+        assert Assignment.objects.get(pk=assignment.pk).datetime_consensus is not None
+
+    def test_consensus_multiple_values(self):
+        """A multi valued field's answer is all of its values, in any order"""
+        assignment = AssignmentFactory(data_limit=2)
+        field = AssignmentCheckboxGroupFieldFactory(assignment=assignment)
+        text = AssignmentTextFieldFactory(assignment=assignment)
+        data = DataFactory(assignment=assignment)
+        respond(data, {field: ["b", "a"], text: [""]})
+        respond(data, {field: ["a", "b"], text: [""]})
+        update_consensus(assignment.pk)
+        consensus = assignment.consensus.get()
+        assert consensus.value == "a, b"
+        assert consensus.agreement == 1
+        assert consensus.conflicts == []
+
+    def test_consensus_incremental(self):
+        """Only data items responded to since the last update are recounted"""
+        assignment = create_assignment()
+        update_consensus(assignment.pk)
+        field = assignment.fields.get()
+        data = assignment.data.get()
+        old = DataFactory(assignment=assignment)
+        respond(old, {field: ["Maybe"]})
+        Response.objects.filter(data=old).update(datetime=timezone.now() - timedelta(1))
+        Assignment.objects.filter(pk=assignment.pk).update(
+            datetime_consensus=timezone.now()
+        )
+        respond(data, {field: ["No"]})
+        respond(data, {field: ["No"]})
+
+        assert update_consensus(assignment.pk) == 1
+        assert assignment.consensus.get().value == "No"
+        assert update_consensus(assignment.pk, full=True) == 2
+        assert assignment.consensus.get(data=old).value == "Maybe"
+        # fields which are no longer answered are removed
+        assignment.fields.update(deleted=True)
+        assert update_consensus(assignment.pk, full=True) == 0
+        assert not assignment.consensus.exists()
+
+    def test_consensus_admin_edit(self, rf):
+        """Values edited in the admin are recounted by incremental updates"""
+        assignment = create_assignment()
+        update_consensus(assignment.pk)
+        Response.objects.update(datetime=timezone.now() - timedelta(1))
+        Assignment.objects.filter(pk=assignment.pk).update(
+            datetime_consensus=timezone.now()
+        )
+        response = assignment.responses.order_by("pk").first()
+        response.values.update(value="No")
+        request = rf.post("/")
+        request.user = UserFactory(is_staff=True)
+        formset = MagicMock()
+        formset.has_changed.return_value = True
+        ResponseAdmin(Response, admin.site).save_related(
+            request, MagicMock(instance=response), [formset], True
+        )
+        response.refresh_from_db()
+        assert response.edit_user == request.user
+        assert update_consensus(assignment.pk) == 1
+        assert assignment.consensus.get().value == "No"
+
+    def test_consensus_export(self):
+        """The consensus CSV has a row for each data item"""
+        assignment = create_assignment()
+        update_consensus(assignment.pk)
+        out_file = StringIO()
+        ExportConsensusCsv(UserFactory().pk, assignment.pk).generate_file(out_file)
+        rows = list(csv.reader(StringIO(out_file.getvalue())))
+        field = assignment.fields.get()
+        assert rows[0][1:] == [
+            "name",
+            field.label,
+            f"{field.label} agreement",
+            f"{field.label} responses",
+        ]
+        assert rows[1][1:] == ["Document", rows[1][2], "0.67", "3"]
+        assert rows[1][2].lower() == "yes"
+
+    def test_consensus_archive(self):
+        """The consensus is archived and restored with the assignment"""
+        assignment = create_assignment()
+        update_consensus(assignment.pk)
+        values = list(
+            assignment.consensus.values("data", "field", "value", "conflicts")
+        )
+        Assignment.objects.filter(pk=assignment.pk).update(status=Status.closed)
+        archive_assignment(assignment.pk)
+        assert not Consensus.objects.exists()
+        archived = Assignment.objects.get(pk=assignment.pk)
+        assert [c.value for c in archived.get_consensus()] == [values[0]["value"]]
+        assert update_consensus(assignment.pk) == 0
+        restore_assignment(assignment.pk)
+        assert (
+            list(assignment.consensus.values("data", "field", "value", "conflicts"))
+            == values
+        )
+
+    def test_consensus_api(self):
+        """The consensus may be filtered by agreement by the assignment's owner"""
+        assignment = create_assignment()
+        Assignment.objects.filter(pk=assignment.pk).update(status=Status.open)
+        update_consensus(assignment.pk)
+        response = assignment_action("consensus", assignment, assignment.user)
+        assert response.data["count"] == 1
+        assert response.data["results"][0]["total"] == 3
+        response = assignment_action(
+            "consensus", assignment, assignment.user, QUERY_STRING="max_agreement=0.5"
+        )
+        assert response.data["count"] == 0
+        response = assignment_action("consensus", assignment, UserFactory())
+        assert response.status_code == 403
@@ -0,0 +1,72 @@
+"""Tests for assignment forms"""
+
+# Django
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Third Party
+import pytest
+
+# SpotUs
+from spotus.assignments.forms import AssignmentForm
+from spotus.assignments.tests.factories import (
+    AssignmentFactory,
+    AssignmentTextFieldFactory,
+    DataFactory,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+class TestAssignmentForm:
+    """Test the assignment form"""
+
+    def test_render_assignment_fields(self):
+        """The rendered fields are cached, with the metadata swapped in"""
+        assignment = AssignmentFactory()
+        AssignmentTextFieldFactory(
+            assignment=assignment, label="Name of { name }", help_text="Help"
+        )
+        first = DataFactory(assignment=assignment, metadata={"name": "<Alice>"})
+        second = DataFactory(assignment=assignment, metadata={"name": "Bob"})
+
+        html = AssignmentForm(
+            assignment=assignment, datum=first, user=AnonymousUser()
+        ).render_assignment_fields()
+        assert "Name of &lt;Alice&gt;" in html
+        assert "Help" in html
+
+        form = AssignmentForm(assignment=assignment, datum=second, user=AnonymousUser())
+        with CaptureQueriesContext(connection) as queries:
+            html = form.render_assignment_fields()
+        assert len(queries) == 0
+        assert "Name of Bob" in html
+
+    def test_render_assignment_fields_edited(self):
+        """Editing the form renders the fields again"""
+        assignment = AssignmentFactory()
+        AssignmentTextFieldFactory(assignment=assignment, label="Old Label")
+        form = AssignmentForm(assignment=assignment, datum=None, user=AnonymousUser())
+        assert "Old Label" in form.render_assignment_fields()
+        assignment.create_form('[{"label": "New Label", "type": "text"}]')
+        form = AssignmentForm(assignment=assignment, datum=None, user=AnonymousUser())
+        assert "New Label" in form.render_assignment_fields()
+
+    def test_render_assignment_fields_bound(self):
+        """Bound forms render their own values and errors"""
+        assignment = AssignmentFactory()
+        field = AssignmentTextFieldFactory(
+            assignment=assignment, label="Required", required=True
+        )
+        AssignmentForm(
+            assignment=assignment, datum=None, user=AnonymousUser()
+        ).render_assignment_fields()
+        form = AssignmentForm(
+            {str(field.pk): ""},
+            assignment=assignment,
+            datum=None,
+            user=AnonymousUser(),
+        )
+        assert not form.is_valid()
+        assert "errorlist" in form.render_assignment_fields()
@@ -0,0 +1,120 @@
+"""Tests for the contributor leaderboards"""
+
+# Django
+from django.core.management import call_command
+from django.test import RequestFactory
+
+# Standard Library
+from io import StringIO
+from unittest.mock import patch
+
+# Third Party
+import pytest
+from redis import Redis
+
+# SpotUs
+from spotus.assignments.archive import archive_assignment
+from spotus.assignments.choices import Status
+from spotus.assignments.leaderboard import (
+    get_leaderboard,
+    get_rank,
+    rebuild_leaderboards,
+    record_responses,
+)
+from spotus.assignments.tests.factories import AssignmentFactory, ResponseFactory
+from spotus.assignments.tests.test_views import mock_middleware
+from spotus.assignments.views import AssignmentExploreView
+from spotus.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def create_responses():
+    """Responses to two assignments, by users who are and are not credited"""
+    assignment, other = AssignmentFactory(), AssignmentFactory()
+    alice, bob, carol = UserFactory.create_batch(3)
+    return [
+        ResponseFactory(assignment=assignment, user=alice, public=True),
+        ResponseFactory(assignment=assignment, user=alice, skip=True),
+        ResponseFactory(assignment=assignment, user=bob, public=True),
+        ResponseFactory(assignment=assignment, user=carol),
+        ResponseFactory(assignment=other, user=bob),
+        ResponseFactory(assignment=other, user=bob),
+        ResponseFactory(assignment=other, user=None),
+    ]
+
+
+class TestLeaderboard:
+    """Test the contributor leaderboards"""
+
+    def test_record(self):
+        """Submissions and skips are counted, but only credited users are shown"""
+        responses = create_responses()
+        record_responses(responses)
+        assignment, other = responses[0].assignment, responses[-1].assignment
+        alice, bob, carol = [responses[i].user for i in (0, 2, 3)]
+        assert get_leaderboard(assignment) == [(alice, 2), (bob, 1)]
+        # bob is credited on the site, but not for the other assignment
+        assert get_leaderboard(other) == []
+        assert get_leaderboard() == [(bob, 3), (alice, 2)]
+        assert get_rank(alice) == (2, 2)
+        assert get_rank(carol) is None
+
+        # once they ask to be credited, all of their responses are counted
+        record_responses(
+            [ResponseFactory(assignment=assignment, user=carol, public=True)]
+        )
+        assert get_leaderboard(assignment)[0] == (carol, 2)
+        assert get_leaderboard(assignment, limit=1) == [(carol, 2)]
+
+    def test_record_unavailable(self):
+        """Responses are not counted, and the leaderboards are empty, if Redis is
+        unavailable
+        """
+        responses = create_responses()
+        with patch(
+            "spotus.assignments.leaderboard.get_redis",
+            return_value=Redis(port=1, socket_connect_timeout=1),
+        ):
+            record_responses(responses)
+            assert get_leaderboard() == []
+            assert get_rank(responses[0].user) is None
+        assert get_leaderboard() == []
+
+    def test_rebuild(self, fake_redis):
+        """The leaderboards may be rebuilt from the database and archives"""
+        responses = create_responses()
+        record_responses(responses)
+        assignment = responses[0].assignment
+        leaderboards = [get_leaderboard(assignment), get_leaderboard()]
+        fake_redis.zadd("assignments:leaderboard:0:all", {1: 1})
+        assignment.status = Status.closed
+        assignment.save()
+        archive_assignment(assignment.pk)
+        fake_redis.zincrby(
+            "assignments:leaderboard:site:credited", 5, responses[0].user_id
+        )
+
+        out = StringIO()
+        call_command("rebuild_leaderboards", stdout=out)
+        assert "2 assignments" in out.getvalue()
+        assert [get_leaderboard(assignment), get_leaderboard()] == leaderboards
+        assert not fake_redis.exists("assignments:leaderboard:0:all")
+        assert rebuild_leaderboards() == 2
+
+    def test_explore(self):
+        """The explore page shows the site's and featured assignments' top
+        contributors
+        """
+        responses = create_responses()
+        record_responses(responses)
+        assignment = responses[0].assignment
+        assignment.status = Status.open
+        assignment.featured = True
+        assignment.save()
+        request = mock_middleware(RequestFactory().get("/"))
+        request.user = responses[0].user
+        context = AssignmentExploreView(request=request).get_context_data()
+        assert context["leaderboard"] == get_leaderboard()
+        assert context["assignments"][0].leaderboard == get_leaderboard(assignment)
+        assert context["rank"] == (2, 2)
@@ -0,0 +1,147 @@
+"""Tests for messaging an assignment's contributors in bulk"""
+
+# Django
+from django.conf import settings
+from django.core import mail
+from django.test import RequestFactory, override_settings
+
+# Standard Library
+from unittest.mock import patch
+
+# Third Party
+import pytest
+
+# SpotUs
+from spotus.assignments.archive import archive_assignment
+from spotus.assignments.choices import Status
+from spotus.assignments.models import BulkMessage
+from spotus.assignments.tasks import send_bulk_message, send_bulk_message_batch
+from spotus.assignments.tests.factories import (
+    AssignmentFactory,
+    DataFactory,
+    ResponseFactory,
+)
+from spotus.assignments.tests.test_views import mock_middleware
+from spotus.assignments.views import AssignmentDetailView
+from spotus.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def create_assignment():
+    """An assignment with responses from several contributors"""
+    assignment = AssignmentFactory(status=Status.open)
+    data = DataFactory(assignment=assignment)
+    alice, bob = UserFactory(name="Alice <A>"), UserFactory(name="Bob")
+    ResponseFactory(assignment=assignment, user=alice, flag=True, data=data)
+    ResponseFactory(assignment=assignment, user=alice)
+    ResponseFactory(assignment=assignment, user=bob)
+    ResponseFactory(assignment=assignment, user=UserFactory(email=""))
+    ResponseFactory(assignment=assignment, user=None)
+    ResponseFactory(assignment=AssignmentFactory(), user=UserFactory())
+    return assignment
+
+
+class TestBulkMessage:
+    """Test messaging an assignment's contributors in bulk"""
+
+    def test_recipients(self):
+        """Each contributor with an email address is messaged once, and may be
+        filtered by their responses
+        """
+        assignment = create_assignment()
+        alice, bob = [r.user for r in assignment.responses.order_by("pk")[1:3]]
+        message = BulkMessage(assignment=assignment, user=assignment.user)
+        assert message.get_recipients() == sorted([alice.pk, bob.pk])
+        message.filters = {"flag": True}
+        assert message.get_recipients() == [alice.pk]
+        message.filters = {"flag": False}
+        assert message.get_recipients() == sorted([alice.pk, bob.pk])
+        message.filters = {"data": assignment.data.get().pk}
+        assert message.get_recipients() == [alice.pk]
+        assignment.responses.get(user=bob).tags.add("tagged")
+        message.filters = {"tag": "tagged"}
+        assert message.get_recipients() == [bob.pk]
+
+        assignment.status = Status.closed
+        assignment.save()
+        archive_assignment(assignment.pk)
+        assignment.refresh_from_db()
+        assert message.get_recipients() == [bob.pk]
+        message.filters = {}
+        assert message.get_recipients() == sorted([alice.pk, bob.pk])
+
+    @override_settings(ASSIGNMENT_MESSAGE_BATCH_SIZE=1)
+    def test_send(self):
+        """The recipients are found once and sent the message in batches, each
+        personalized from a single rendering
+        """
+        assignment = create_assignment()
+        message = BulkMessage.objects.create(
+            assignment=assignment, user=assignment.user, subject="Hi", body="Thanks"
+        )
+        with patch("spotus.assignments.tasks.send_bulk_message_batch") as mock_task:
+            send_bulk_message(message.pk)
+            send_bulk_message(message.pk)
+        assert mock_task.delay.call_count == 2
+        # one copy of the message is sent to the diagnostics address
+        assert [e.to for e in mail.outbox] == [[settings.DIAGNOSTICS_EMAIL]]
+        mail.outbox = []
+        message.refresh_from_db()
+        assert message.total == 2
+        assert not message.is_done
+
+        with patch(
+            "spotus.core.email.render_to_string", return_value="<p>{}</p>"
+        ) as mock_render:
+            for call in mock_task.delay.call_args_list:
+                send_bulk_message_batch(*call[0])
+        assert mock_render.call_count == 2
+        message.refresh_from_db()
+        assert (message.sent, message.failed) == (2, 0)
+        assert message.is_done
+        assert len(mail.outbox) == 2
+        assert mail.outbox[0].reply_to == [assignment.user.email]
+        assert all(e.bcc == [] for e in mail.outbox)
+
+    def test_send_personalized(self):
+        """Each recipient's name and email address are filled in"""
+        assignment = create_assignment()
+        message = BulkMessage.objects.create(
+            assignment=assignment, user=assignment.user, subject="Hi", body="Thanks"
+        )
+        alice = assignment.responses.get(flag=True).user
+        send_bulk_message_batch(message.pk, [alice.pk, 0])
+        email = mail.outbox[0]
+        assert email.to == [alice.email]
+        assert "Hi Alice <A>," in email.body
+        assert "Hi Alice &lt;A&gt;," in email.alternatives[0][0]
+        assert alice.email in email.alternatives[0][0]
+        message.refresh_from_db()
+        # recipients who can no longer be found have failed
+        assert (message.sent, message.failed) == (1, 1)
+
+    def test_detail(self):
+        """Editors may message the contributors from the detail page"""
+        assignment = create_assignment()
+        request = RequestFactory().post(
+            assignment.get_absolute_url(),
+            {
+                "action": "Message Contributors",
+                "subject": "Hi",
+                "body": "Thanks",
+                "flag": "true",
+                "tag": "",
+                "data": "",
+            },
+        )
+        request = mock_middleware(request)
+        request.user = assignment.user
+        with patch("spotus.assignments.views.send_bulk_message") as mock_task:
+            response = AssignmentDetailView.as_view()(
+                request, slug=assignment.slug, pk=assignment.pk
+            )
+        assert response.status_code == 302
+        message = assignment.bulk_messages.get()
+        assert message.filters == {"flag": True}
+        mock_task.delay.assert_called_once_with(message.pk)
@@ -2,18 +2,20 @@
 
 # Django
 from django.contrib.auth.models import AnonymousUser
+from django.db import IntegrityError, connection, transaction
 from django.utils import timezone
 
 # Standard Library
 import json
 from datetime import datetime
+from unittest.mock import patch
 
 # Third Party
 import pytest
 
 # SpotUs
 from spotus.assignments.choices import Status
-from spotus.assignments.models import Assignment
+from spotus.assignments.models import Assignment, Response, Value
 from spotus.assignments.tests.factories import (
     AssignmentCheckboxGroupFieldFactory,
     AssignmentFactory,
@@ -40,6 +42,22 @@ class TestAssignment:
         data = DataFactory(assignment=assignment)
         assert data == assignment.get_data_to_show(assignment.user, ip_address)
 
+    def test_datetime_closed(self):
+        """Closing the assignment records when, however its status is changed"""
+        assignment = AssignmentFactory(status=Status.open)
+        assert assignment.datetime_closed is None
+        assignment.status = Status.closed
+        assignment.save(update_fields=["status"])
+        assignment.refresh_from_db()
+        closed = assignment.datetime_closed
+        assert closed is not None
+        assignment.save()
+        assert assignment.datetime_closed == closed
+        assignment.status = Status.open
+        assignment.save()
+        assignment.refresh_from_db()
+        assert assignment.datetime_closed is None
+
     def test_create_form(self):
         """Create form should create fields from the JSON"""
         assignment = AssignmentFactory()
@@ -71,6 +89,26 @@ class TestAssignment:
             label="Select Field", type="select", order=1
         ).exists()
         assert assignment.fields.get(label="Select Field").choices.count() == 2
+        assert not assignment.has_gallery
+
+    def test_create_form_gallery(self):
+        """Create form should keep track of whether there are gallery fields"""
+        assignment = AssignmentFactory()
+        assignment.create_form(
+            json.dumps([{"label": "Text Field", "type": "text", "gallery": True}])
+        )
+        assert assignment.has_gallery
+        assignment.refresh_from_db()
+        assert assignment.has_gallery
+
+    def test_create_form_version(self):
+        """Create form should bump the form version"""
+        assignment = AssignmentFactory()
+        assert assignment.form_version == 1
+        assignment.create_form(json.dumps([{"label": "Text Field", "type": "text"}]))
+        assert assignment.form_version == 2
+        assignment.refresh_from_db()
+        assert assignment.form_version == 2
 
     def test_uniqify_label_name(self):
         """Uniqify label name should give each label a unqiue name"""
@@ -195,6 +233,16 @@ class TestAssignment:
 class TestData:
     """Test the Assignment Data model"""
 
+    def test_embed_cached(self):
+        """The embed html is cached by URL"""
+        data = DataFactory(url="https://www.example.com/embed/")
+        with patch.object(
+            type(data), "_embed", autospec=True, return_value="<p>Embed</p>"
+        ) as mock_embed:
+            assert data.embed() == "<p>Embed</p>"
+            assert DataFactory(url=data.url).embed() == "<p>Embed</p>"
+        mock_embed.assert_called_once()
+
     def test_get_choices(self):
         """Test the get choices queryset method"""
         assignment = AssignmentFactory()
@@ -287,3 +335,80 @@ class TestResponse:
             "Foo, Foo",
             "",
         ]
+
+    def test_create_values(self):
+        """Creating the values stores the current values on the response"""
+        assignment = AssignmentFactory()
+        text_field = AssignmentTextFieldFactory(assignment=assignment)
+        check_field = AssignmentCheckboxGroupFieldFactory(assignment=assignment)
+        response = ResponseFactory(assignment=assignment)
+        response.create_values(
+            {
+                str(text_field.pk): "Text",
+                str(check_field.pk): ["Choice 1", "Choice 2"],
+                "public": True,
+            }
+        )
+        response.refresh_from_db()
+        assert response.field_values == {
+            str(text_field.pk): ["Text"],
+            str(check_field.pk): ["Choice 1", "Choice 2"],
+        }
+        assert response.values.count() == 3
+        assert set(response.values.values_list("assignment", flat=True)) == {
+            assignment.pk
+        }
+
+    def test_partition_pruning(self):
+        """Responses are partitioned by assignment, so an assignment's
+        responses are read from a single partition
+        """
+        assignment = AssignmentFactory()
+        ResponseFactory.create_batch(2, assignment=assignment)
+        sql, params = Response.objects.filter(
+            assignment=assignment
+        ).query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = json.dumps(cursor.fetchone()[0])
+        assert plan.count('"Relation Name": "assignments_response_p') == 1
+
+    def test_value_response_checked(self):
+        """Values must reference an existing response of their assignment, as
+        if by a foreign key
+        """
+        response = ResponseFactory()
+        field = AssignmentTextFieldFactory(assignment=response.assignment)
+        value = ValueFactory(response=response, field=field)
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        with pytest.raises(IntegrityError), transaction.atomic():
+            Value.objects.create(
+                assignment=AssignmentFactory(), response=response, field=field
+            )
+        with pytest.raises(IntegrityError), transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "DELETE FROM assignments_response WHERE id = %s", [response.pk]
+                )
+        # saving without changing the response is not checked again
+        value.value = "edited"
+        value.save()
+        response.values.all().delete()
+        response.delete()
+
+    def test_get_viewable(self):
+        """Users see gallery responses and responses to their own assignments"""
+        assignment = AssignmentFactory()
+        owned = ResponseFactory.create_batch(2, assignment=assignment)
+        owned.append(ResponseFactory(assignment=assignment, gallery=True))
+        gallery = ResponseFactory(gallery=True)
+        hidden = ResponseFactory()
+        responses = Response.objects.order_by("pk")
+        assert list(responses.get_viewable(assignment.user)) == owned + [gallery]
+        assert list(responses.get_viewable(UserFactory())) == [owned[2], gallery]
+        assert list(responses.get_viewable(AnonymousUser())) == [owned[2], gallery]
+        assert list(responses.get_viewable(UserFactory(is_staff=True))) == owned + [
+            gallery,
+            hidden,
+        ]
@@ -0,0 +1,51 @@
+"""Tests for assignment permissions"""
+
+# Django
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Third Party
+import pytest
+
+# SpotUs
+from spotus.assignments.models import Response
+from spotus.assignments.tests.factories import AssignmentFactory, ResponseFactory
+from spotus.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+class TestRules:
+    """Test the assignment permission rules"""
+
+    def test_view_assignment(self):
+        """Assignments with a gallery may be viewed by anyone"""
+        assignment = AssignmentFactory()
+        gallery_assignment = AssignmentFactory(has_gallery=True)
+        user = AnonymousUser()
+        with CaptureQueriesContext(connection) as queries:
+            assert not user.has_perm("assignments.view_assignment", assignment)
+            assert user.has_perm("assignments.view_assignment", gallery_assignment)
+            assert assignment.user.has_perm("assignments.view_assignment", assignment)
+        assert len(queries) == 0
+
+    def test_change_response(self):
+        """Responses may be changed by the assignment owner"""
+        response = Response.objects.select_related("assignment").get(
+            pk=ResponseFactory().pk
+        )
+        owner = response.assignment.user
+        assert owner.has_perm("assignments.change_response")
+        assert owner.has_perm("assignments.change_response", response)
+        assert not UserFactory().has_perm("assignments.change_response", response)
+        assert not AnonymousUser().has_perm("assignments.change_response")
+
+    def test_cache(self):
+        """Permission checks are cached on the user"""
+        user = UserFactory()
+        response = ResponseFactory()
+        assert not user.has_perm("assignments.view_response", response)
+        with CaptureQueriesContext(connection) as queries:
+            assert not user.has_perm("assignments.view_response", response)
+        assert len(queries) == 0
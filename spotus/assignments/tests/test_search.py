@@ -0,0 +1,97 @@
+"""Tests for assignment response search"""
+
+# pylint: disable=invalid-name
+
+# Django
+from django.contrib.auth.models import AnonymousUser
+
+# Third Party
+import pytest
+
+# SpotUs
+from spotus.assignments.choices import Status
+from spotus.assignments.models import Response
+from spotus.assignments.search import search_responses, update_search_vectors
+from spotus.assignments.tasks import rebuild_search_vectors
+from spotus.assignments.tests.factories import (
+    AssignmentFactory,
+    AssignmentTextFieldFactory,
+    ResponseFactory,
+    ValueFactory,
+)
+from spotus.assignments.tests.test_viewsets import list_responses
+from spotus.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+class TestSearch:
+    """Test searching responses"""
+
+    def test_search_words(self):
+        """Responses may be searched by whole words in their values"""
+        ValueFactory(value="The quick brown fox")
+        ValueFactory(value="The lazy dog")
+        update_search_vectors(Response.objects.all())
+        results = search_responses(
+            Response.objects.all(), "FOX", UserFactory(is_staff=True)
+        )
+        assert [r.values.get().value for r in results] == ["The quick brown fox"]
+
+    def test_search_substring(self):
+        """Responses may be searched by partial words in their values"""
+        value = ValueFactory(value="Springfield")
+        ValueFactory(value="Shelbyville")
+        staff = UserFactory(is_staff=True)
+        assert list(search_responses(Response.objects.all(), "ringf", staff)) == [
+            value.response
+        ]
+
+    def test_search_tags(self):
+        """Responses may be searched by their tags"""
+        response = ResponseFactory()
+        response.tags.add("invoice")
+        ResponseFactory().tags.add("receipt")
+        update_search_vectors(Response.objects.all())
+        responses = Response.objects.all()
+        assert list(search_responses(responses, "invoice", AnonymousUser())) == [
+            response
+        ]
+        assert list(search_responses(responses, "voic", AnonymousUser())) == [response]
+
+    def test_search_private_fields(self):
+        """Only the gallery fields of assignments the user may not change are
+        searched, until their gallery fields change
+        """
+        assignment = AssignmentFactory(status=Status.open)
+        public = AssignmentTextFieldFactory(assignment=assignment, gallery=True)
+        private = AssignmentTextFieldFactory(assignment=assignment)
+        response = ResponseFactory(assignment=assignment, gallery=True)
+        ValueFactory(response=response, field=public, value="shown")
+        ValueFactory(response=response, field=private, value="secret")
+        update_search_vectors(Response.objects.all())
+        responses = Response.objects.all()
+        for user in (AnonymousUser(), UserFactory()):
+            assert list(search_responses(responses, "shown", user)) == [response]
+            assert list(search_responses(responses, "secret", user)) == []
+            assert list(search_responses(responses, "secr", user)) == []
+        for term in ("secret", "secr"):
+            assert list(search_responses(responses, term, assignment.user)) == [
+                response
+            ]
+
+        private.gallery = True
+        private.save()
+        rebuild_search_vectors(assignment.pk)
+        assert list(search_responses(responses, "secret", AnonymousUser())) == [
+            response
+        ]
+
+    def test_search_api(self):
+        """The response API accepts a search term"""
+        value = ValueFactory(value="needle")
+        ValueFactory(value="haystack")
+        update_search_vectors(Response.objects.all())
+        response = list_responses(UserFactory(is_staff=True), {"search": "needle"})
+        assert response.status_code == 200
+        assert [r["id"] for r in response.data["results"]] == [value.response.pk]
@@ -0,0 +1,26 @@
+"""Tests for assignment tasks"""
+
+# Django
+from django.core import mail
+
+# Third Party
+import pytest
+
+# SpotUs
+from spotus.assignments.tasks import send_submission_emails
+from spotus.assignments.tests.factories import AssignmentFactory, ResponseFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def test_send_submission_emails():
+    """A response is emailed to each submission email address"""
+    assignment = AssignmentFactory(
+        submission_emails="alice@example.com,bob@example.com"
+    )
+    response = ResponseFactory(assignment=assignment)
+    send_submission_emails(response.pk)
+    assert [m.to for m in mail.outbox] == [
+        ["alice@example.com"],
+        ["bob@example.com"],
+    ]
@@ -4,19 +4,34 @@
 
 # Django
 from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
 from django.test import RequestFactory, TestCase
 from django.urls import reverse
 
 # Standard Library
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 # Third Party
 import pytest
 
 # SpotUs
-from spotus.assignments.choices import Status
-from spotus.assignments.tests.factories import AssignmentFactory, ResponseFactory
-from spotus.assignments.views import AssignmentDetailView, AssignmentFormView
+from spotus.assignments.choices import Registration, Status
+from spotus.assignments.leaderboard import get_leaderboard
+from spotus.assignments.models import Response
+from spotus.assignments.tests.factories import (
+    AssignmentCheckboxGroupFieldFactory,
+    AssignmentFactory,
+    AssignmentTextFieldFactory,
+    ResponseFactory,
+    ValueFactory,
+)
+from spotus.assignments.views import (
+    AssignmentDetailView,
+    AssignmentEditResponseView,
+    AssignmentEmbededFormView,
+    AssignmentFormView,
+)
+from spotus.core.throttle import get_throttled_counts
 from spotus.users.tests.factories import UserFactory
 
 pytestmark = pytest.mark.django_db
@@ -153,3 +168,146 @@ class TestAssignmentFormView:
         # the ip address replied, they may reply again
         ResponseFactory(assignment=assignment, user=None, ip_address=ip_address)
         assert view._has_assignment(assignment, AnonymousUser(), ip_address)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_submit(self, rf):
+        """Submitting saves the response and emails it once committed"""
+        assignment = AssignmentFactory(
+            status=Status.open, submission_emails="alice@example.com"
+        )
+        field = AssignmentTextFieldFactory(assignment=assignment)
+        url = reverse(
+            "assignments:assignment",
+            kwargs={"slug": assignment.slug, "pk": assignment.pk},
+        )
+        request = rf.post(url, {str(field.pk): "Answer", "public": True})
+        request = mock_middleware(request)
+        request.user = UserFactory()
+        with patch("spotus.assignments.views.send_submission_emails") as mock_task:
+            response = AssignmentFormView.as_view()(
+                request, slug=assignment.slug, pk=assignment.pk
+            )
+        assert response.status_code == 302
+        assignment_response = Response.objects.get(assignment=assignment)
+        assert assignment_response.values.get().value == "Answer"
+        assert assignment_response.field_values == {str(field.pk): ["Answer"]}
+        mock_task.delay.assert_called_once_with(assignment_response.pk)
+        assert get_leaderboard(assignment) == [(request.user, 1)]
+
+
+class TestAssignmentEmbededFormView:
+    """Test the embedded assignment form"""
+
+    def test_anonymous_submit(self, client):
+        """Anonymous visitors may submit without a CSRF cookie or a session"""
+        client.handler.enforce_csrf_checks = True
+        assignment = AssignmentFactory(
+            status=Status.open, registration=Registration.off, ask_public=False
+        )
+        field = AssignmentTextFieldFactory(assignment=assignment)
+        url = reverse(
+            "assignments:embed", kwargs={"slug": assignment.slug, "pk": assignment.pk}
+        )
+        response = client.get(url)
+        assert response.status_code == 200
+        embed_token = response.context["embed_token"]
+        client.cookies.clear()
+
+        response = client.post(url, {str(field.pk): "Answer"})
+        assert response.status_code == 302
+        assert response.url == url
+        assert not Response.objects.exists()
+
+        response = client.post(
+            url, {str(field.pk): "Answer", "embed_token": embed_token}
+        )
+        assert response.status_code == 302
+        assert response.url == reverse("assignments:embed-confirm")
+        assert Response.objects.get().values.get().value == "Answer"
+        assert not Session.objects.exists()
+
+    def test_embed_token(self):
+        """The embed token is tied to the assignment and the user"""
+        view = AssignmentEmbededFormView()
+        view.request = MagicMock(user=AnonymousUser())
+        view.object = AssignmentFactory()
+        token = view.get_embed_token()
+        view.object = AssignmentFactory()
+        assert view.get_embed_token() != token
+
+
+class TestAssignmentThrottle:
+    """Test rate limiting submissions"""
+
+    def test_throttle_submit(self, rf):
+        """Submitting too quickly is throttled"""
+        assignment = AssignmentFactory(status=Status.open, submission_rate="1/hour")
+        field = AssignmentTextFieldFactory(assignment=assignment)
+        user = UserFactory()
+        url = reverse(
+            "assignments:assignment",
+            kwargs={"slug": assignment.slug, "pk": assignment.pk},
+        )
+        for _ in range(2):
+            request = mock_middleware(rf.post(url, {str(field.pk): "Answer"}))
+            request.user = user
+            response = AssignmentFormView.as_view()(
+                request, slug=assignment.slug, pk=assignment.pk
+            )
+            assert response.status_code == 302
+        assert Response.objects.filter(assignment=assignment).count() == 1
+        request._messages.add.assert_called_once()
+        assert get_throttled_counts() == {assignment.get_throttle_metric("submit"): 1}
+
+
+class TestAssignmentEditResponseView:
+    """Test editing responses"""
+
+    def test_edit(self, rf):
+        """Edits update the current values, and keep the original values"""
+        assignment = AssignmentFactory()
+        text_field = AssignmentTextFieldFactory(assignment=assignment)
+        check_field = AssignmentCheckboxGroupFieldFactory(
+            assignment=assignment, required=False
+        )
+        response = ResponseFactory(assignment=assignment, data=None)
+        ValueFactory(
+            response=response, field=text_field, value="Before", original_value="Before"
+        )
+        ValueFactory(
+            response=response,
+            field=check_field,
+            value="Choice 1",
+            original_value="Choice 1",
+        )
+        ValueFactory(
+            response=response,
+            field=check_field,
+            value="Choice 2",
+            original_value="Choice 2",
+        )
+        url = reverse("assignments:edit-response", kwargs={"pk": response.pk})
+
+        request = mock_middleware(rf.get(url))
+        request.user = assignment.user
+        view = AssignmentEditResponseView(request=request, kwargs={"pk": response.pk})
+        view.object = response
+        assert view.get_initial() == {
+            "data_id": None,
+            str(text_field.pk): "Before",
+            str(check_field.pk): ["Choice 1", "Choice 2"],
+        }
+
+        request = mock_middleware(
+            rf.post(url, {str(text_field.pk): "After", str(check_field.pk): []})
+        )
+        request.user = assignment.user
+        result = AssignmentEditResponseView.as_view()(request, pk=response.pk)
+        assert result.status_code == 302
+        response.refresh_from_db()
+        assert response.field_values == {str(text_field.pk): ["After"]}
+        assert set(response.values.values_list("original_value", flat=True)) == {
+            "Before",
+            "Choice 1",
+            "Choice 2",
+        }
@@ -0,0 +1,252 @@
+"""Tests for assignment API viewsets"""
+
+# pylint: disable=invalid-name
+
+# Django
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+# Standard Library
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlencode, urlparse
+
+# Third Party
+import pytest
+
+# SpotUs
+from spotus.assignments.choices import Status
+from spotus.assignments.models import Response
+from spotus.assignments.tests.factories import (
+    AssignmentFactory,
+    AssignmentTextFieldFactory,
+    DataFactory,
+    ResponseFactory,
+    ValueFactory,
+)
+from spotus.assignments.tokens import check_embed_token
+from spotus.assignments.viewsets import AssignmentViewSet, ResponseViewSet
+from spotus.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def list_responses(user, params):
+    """Call the response list API as the given user"""
+    request = APIRequestFactory().get("/api/assignment-responses/", params)
+    force_authenticate(request, user=user)
+    return ResponseViewSet.as_view({"get": "list"})(request)
+
+
+def bulk_responses(user, data, params=None):
+    """Call the bulk response API as the given user"""
+    path = "/api/assignment-responses/bulk/"
+    if params:
+        path += "?" + urlencode(params)
+    request = APIRequestFactory().post(path, data, format="json")
+    force_authenticate(request, user=user)
+    return ResponseViewSet.as_view({"post": "bulk"})(request)
+
+
+class TestResponseViewSet:
+    """Test the response API"""
+
+    def test_filter_assignment(self):
+        """Responses may be filtered by assignment"""
+        assignment = AssignmentFactory()
+        responses = ResponseFactory.create_batch(2, assignment=assignment)
+        ResponseFactory()
+        response = list_responses(
+            UserFactory(is_staff=True), {"assignment": assignment.pk}
+        )
+        assert response.status_code == 200
+        assert response.data["count"] == 2
+        assert [r["id"] for r in response.data["results"]] == [r.pk for r in responses]
+
+    def test_cursor_pagination(self):
+        """Cursor pagination walks all responses without counting them"""
+        assignment = AssignmentFactory()
+        responses = ResponseFactory.create_batch(5, assignment=assignment)
+        user = UserFactory(is_staff=True)
+        params = {"assignment": assignment.pk, "pagination": "cursor", "page_size": 2}
+        seen = []
+        response = list_responses(user, params)
+        while True:
+            assert response.status_code == 200
+            assert "count" not in response.data
+            seen.extend(r["id"] for r in response.data["results"])
+            if not response.data["next"]:
+                break
+            next_params = parse_qs(urlparse(response.data["next"]).query)
+            params["cursor"] = next_params["cursor"][0]
+            response = list_responses(user, params)
+        assert seen == [r.pk for r in responses]
+
+    def test_cursor_pagination_datetime(self):
+        """Cursor pagination may be ordered by descending datetime"""
+        assignment = AssignmentFactory()
+        responses = ResponseFactory.create_batch(3, assignment=assignment)
+        response = list_responses(
+            UserFactory(is_staff=True),
+            {
+                "assignment": assignment.pk,
+                "pagination": "cursor",
+                "ordering": "-datetime",
+            },
+        )
+        assert [r["id"] for r in response.data["results"]] == [
+            r.pk for r in reversed(responses)
+        ]
+
+    def test_values(self):
+        """Values are listed by field, loading each assignment's fields once"""
+        assignments = AssignmentFactory.create_batch(2)
+        for assignment in assignments:
+            fields = AssignmentTextFieldFactory.create_batch(
+                2, assignment=assignment, gallery=True
+            )
+            for response in ResponseFactory.create_batch(2, assignment=assignment):
+                for field in fields:
+                    ValueFactory(response=response, field=field, value=field.label)
+        with CaptureQueriesContext(connection) as queries:
+            response = list_responses(UserFactory(is_staff=True), {})
+        field_queries = [q for q in queries if 'FROM "assignments_field"' in q["sql"]]
+        assert len(field_queries) == 1
+        # the values are read from the responses
+        assert not [q for q in queries if 'FROM "assignments_value"' in q["sql"]]
+        for result in response.data["results"]:
+            assert [v["field"] for v in result["values"]] == [
+                v["value"] for v in result["values"]
+            ]
+            assert len(result["values"]) == 2
+
+    def test_filter_value(self):
+        """Responses may be filtered by a field's value"""
+        field = AssignmentTextFieldFactory()
+        response = ResponseFactory(assignment=field.assignment)
+        ValueFactory(response=response, field=field, value="Yes")
+        ValueFactory(response__assignment=field.assignment, field=field, value="No")
+        result = list_responses(
+            UserFactory(is_staff=True), {"value": "{}:Yes".format(field.pk)}
+        )
+        assert [r["id"] for r in result.data["results"]] == [response.pk]
+
+    def test_bulk_ids(self):
+        """Responses may be flagged in bulk by id"""
+        assignment = AssignmentFactory()
+        responses = ResponseFactory.create_batch(3, assignment=assignment)
+        response = bulk_responses(
+            assignment.user,
+            {"ids": [responses[0].pk, responses[1].pk], "flag": True, "gallery": True},
+        )
+        assert response.status_code == 200
+        assert response.data["count"] == 2
+        assert list(Response.objects.order_by("pk").values_list("flag", "gallery")) == [
+            (True, True),
+            (True, True),
+            (False, False),
+        ]
+
+    def test_bulk_filter_tags(self):
+        """Responses may be tagged in bulk by filter"""
+        assignment = AssignmentFactory()
+        responses = ResponseFactory.create_batch(3, assignment=assignment)
+        responses[0].tags.add("Old", "Keep")
+        other = ResponseFactory()
+        response = bulk_responses(
+            assignment.user,
+            {"add_tags": ["new", "KEEP"], "remove_tags": ["old"]},
+            {"assignment": assignment.pk},
+        )
+        assert response.status_code == 200
+        assert response.data["count"] == 3
+        for response in responses:
+            assert sorted(t.name for t in response.tags.all()) == ["Keep", "new"]
+        assert not other.tags.exists()
+        assert Response.objects.filter(search_vector="new").count() == 3
+
+    def test_bulk_permission(self):
+        """Users may only change responses for assignments they may change"""
+        response = ResponseFactory(gallery=True)
+        api_response = bulk_responses(
+            UserFactory(), {"ids": [response.pk], "flag": True}
+        )
+        assert api_response.status_code == 403
+
+    def test_bulk_requires_selection(self):
+        """A list of ids or an assignment filter is required"""
+        api_response = bulk_responses(UserFactory(is_staff=True), {"flag": True})
+        assert api_response.status_code == 400
+
+    def test_throttle(self):
+        """The response API is rate limited per user"""
+        user = UserFactory(is_staff=True)
+        with patch.object(ResponseViewSet, "throttle_rate", "1/minute"):
+            assert list_responses(user, {}).status_code == 200
+            assert list_responses(user, {}).status_code == 429
+
+
+def assignment_action(action, assignment, user=None, **headers):
+    """Call an assignment API action"""
+    request = APIRequestFactory().get(
+        "/api/assignments/{}/{}/".format(assignment.pk, action), **headers
+    )
+    if user is not None:
+        force_authenticate(request, user=user)
+    return AssignmentViewSet.as_view({"get": action})(request, pk=assignment.pk)
+
+
+class TestAssignmentViewSet:
+    """Test the assignment form API"""
+
+    def test_form(self):
+        """The form schema is public and cacheable"""
+        assignment = AssignmentFactory(status=Status.open)
+        AssignmentTextFieldFactory(assignment=assignment, label="Name")
+        AssignmentTextFieldFactory(assignment=assignment, label="Gone", deleted=True)
+        response = assignment_action("form", assignment)
+        assert response.status_code == 200
+        assert [f["label"] for f in response.data["fields"]] == ["Name"]
+        assert response.data["submit_url"] == "/assignments/{}-{}/embed/".format(
+            assignment.slug, assignment.pk
+        )
+        assert "public" in response["Cache-Control"]
+
+        cached = assignment_action(
+            "form", assignment, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        assert cached.status_code == 304
+
+        assignment.create_form('[{"label": "Address", "type": "text"}]')
+        changed = assignment_action(
+            "form", assignment, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        assert changed.status_code == 200
+        assert changed["ETag"] != response["ETag"]
+        assert [f["label"] for f in changed.data["fields"]] == ["Address"]
+
+    def test_form_draft(self):
+        """Draft forms are shown to their owner, and are not cached"""
+        assignment = AssignmentFactory(status=Status.draft)
+        response = assignment_action("form", assignment, assignment.user)
+        assert response.status_code == 200
+        assert "private" in response["Cache-Control"]
+
+    def test_form_draft_anonymous(self):
+        """Draft forms are not shown to others"""
+        assignment = AssignmentFactory(status=Status.draft)
+        assert assignment_action("form", assignment).status_code == 404
+
+    def test_datum(self):
+        """The datum gives the data to show and a token to submit with"""
+        assignment = AssignmentFactory(status=Status.open)
+        data = DataFactory(assignment=assignment, url="")
+        response = assignment_action("datum", assignment)
+        assert response.status_code == 200
+        assert response.data["has_assignment"]
+        assert response.data["data"]["id"] == data.pk
+        assert check_embed_token(
+            response.data["embed_token"], assignment, AnonymousUser()
+        )
+        assert "no-store" in response["Cache-Control"]
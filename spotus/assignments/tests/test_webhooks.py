@@ -0,0 +1,335 @@
+"""Tests for assignment webhooks"""
+
+# Django
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+# Standard Library
+import json
+import threading
+import uuid
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+# Third Party
+import pytest
+
+# SpotUs
+from spotus.assignments.buffer import save_submissions
+from spotus.assignments.choices import Status, WebhookEventType
+from spotus.assignments.models import Webhook, WebhookEvent
+from spotus.assignments.tasks import deliver_webhooks
+from spotus.assignments.tests.factories import AssignmentFactory, ResponseFactory
+from spotus.assignments.tests.test_viewsets import bulk_responses
+from spotus.assignments.viewsets import WebhookViewSet
+from spotus.assignments.webhooks import deliver, prune_events, record_events, sign
+from spotus.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+class Receiver(HTTPServer):
+    """A local stand in for a webhook's receiver, recording the deliveries
+    posted to it, and responding with `status`
+    """
+
+    def __init__(self):
+        self.deliveries = []
+        self.status = 200
+        super().__init__(("127.0.0.1", 0), ReceiverHandler)
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}/hook/".format(self.server_port)
+
+
+class ReceiverHandler(BaseHTTPRequestHandler):
+    """Record each delivery"""
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Record the delivery and respond"""
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.deliveries.append((self.headers, body))
+        self.send_response(self.server.status)
+        self.end_headers()
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Do not log requests"""
+
+
+@pytest.fixture
+def receiver(settings):
+    """A receiver running in a background thread, which is on a private
+    address, so private URLs are allowed
+    """
+    settings.ALLOW_PRIVATE_URLS = True
+    server = Receiver()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def create_webhook(url="https://example.com/hook/"):
+    """A webhook for an assignment, delivering to the URL"""
+    assignment = AssignmentFactory(status=Status.open)
+    return Webhook.objects.create(assignment=assignment, user=UserFactory(), url=url)
+
+
+def record(webhook, responses, event_type=WebhookEventType.created):
+    """Record events for the responses"""
+    return record_events(event_type, [(r.pk, r.assignment_id) for r in responses])
+
+
+def webhook_api(user, method, data=None, pk=None, action=None):
+    """Call the webhook API as the given user"""
+    path = "/api/assignment-webhooks/"
+    if pk:
+        path += f"{pk}/"
+    if action:
+        path += f"{action}/"
+    request = getattr(APIRequestFactory(), method)(path, data, format="json")
+    force_authenticate(request, user=user)
+    if action:
+        view = WebhookViewSet.as_view({method: action})
+    elif pk:
+        view = WebhookViewSet.as_view({method: "retrieve"})
+    else:
+        view = WebhookViewSet.as_view({method: "create"})
+    return view(request, pk=pk) if pk else view(request)
+
+
+class TestDelivery:
+    """Test recording and delivering response events"""
+
+    def test_record(self):
+        """Events are only recorded for assignments with active webhooks"""
+        webhook = create_webhook()
+        responses = ResponseFactory.create_batch(2, assignment=webhook.assignment)
+        other = ResponseFactory()
+        assert record(webhook, responses + [other]) == {webhook.assignment_id}
+        assert list(WebhookEvent.objects.values_list("response_id", flat=True)) == [
+            r.pk for r in responses
+        ]
+        webhook.active = False
+        webhook.save()
+        assert record(webhook, responses) == set()
+        assert WebhookEvent.objects.count() == 2
+
+    def test_deliver(self, receiver):
+        """Pending events are posted in order, signed, and the cursor advanced"""
+        webhook = create_webhook(receiver.url)
+        responses = ResponseFactory.create_batch(2, assignment=webhook.assignment)
+        record(webhook, responses)
+        record(webhook, responses[:1], WebhookEventType.edited)
+        assert deliver(webhook.pk) is None
+        assert len(receiver.deliveries) == 1
+        headers, body = receiver.deliveries[0]
+        assert headers["X-SpotUs-Signature"] == sign(
+            webhook.secret, headers["X-SpotUs-Timestamp"], body
+        )
+        payload = json.loads(body)
+        events = list(WebhookEvent.objects.order_by("pk"))
+        assert payload["cursor"] == events[-1].pk
+        assert [
+            (e["id"], e["type"], e["response"]["id"]) for e in payload["events"]
+        ] == [
+            (events[0].pk, "created", responses[0].pk),
+            (events[1].pk, "created", responses[1].pk),
+            (events[2].pk, "edited", responses[0].pk),
+        ]
+        webhook.refresh_from_db()
+        assert webhook.cursor == events[-1].pk
+
+        # only new events are delivered
+        assert deliver(webhook.pk) is None
+        assert len(receiver.deliveries) == 1
+
+    @override_settings(
+        ASSIGNMENT_WEBHOOK_BATCH_SIZE=1, ASSIGNMENT_WEBHOOK_MAX_BATCHES=2
+    )
+    def test_deliver_batches(self, receiver):
+        """Events are posted in batches, and delivery continues in a new task once
+        enough have been posted
+        """
+        webhook = create_webhook(receiver.url)
+        record(webhook, ResponseFactory.create_batch(3, assignment=webhook.assignment))
+        assert deliver(webhook.pk) == 0
+        assert len(receiver.deliveries) == 2
+        assert deliver(webhook.pk) is None
+        assert [len(json.loads(b)["events"]) for _, b in receiver.deliveries] == [1] * 3
+
+    @override_settings(ASSIGNMENT_WEBHOOK_MAX_FAILURES=3)
+    def test_deliver_retry(self, receiver):
+        """Failed deliveries are retried with backoff, until too many have failed"""
+        webhook = create_webhook(receiver.url)
+        response = ResponseFactory(assignment=webhook.assignment)
+        record(webhook, [response])
+        receiver.status = 500
+        assert deliver(webhook.pk) == 10
+        # not retried until the backoff has passed
+        assert deliver(webhook.pk) is None
+        assert len(receiver.deliveries) == 1
+        Webhook.objects.update(retry_at=timezone.now())
+        assert deliver(webhook.pk) == 20
+        webhook.refresh_from_db()
+        assert (webhook.cursor, webhook.failures) == (0, 2)
+        assert webhook.last_error == "The URL responded with status 500"
+
+        receiver.status = 200
+        Webhook.objects.update(retry_at=timezone.now())
+        assert deliver(webhook.pk) is None
+        webhook.refresh_from_db()
+        assert webhook.cursor and webhook.failures == 0
+
+        receiver.status = 500
+        record(webhook, [response], WebhookEventType.edited)
+        Webhook.objects.update(failures=2)
+        assert deliver(webhook.pk) is None
+        webhook.refresh_from_db()
+        assert not webhook.active
+
+    def test_deliver_private(self, receiver, settings):
+        """Webhooks are not delivered to private addresses, without recording
+        why the connection failed
+        """
+        webhook = create_webhook(receiver.url)
+        record(webhook, [ResponseFactory(assignment=webhook.assignment)])
+        settings.ALLOW_PRIVATE_URLS = False
+        assert deliver(webhook.pk) == 10
+        assert receiver.deliveries == []
+        webhook.refresh_from_db()
+        assert webhook.last_error == (
+            "The URL may not be used: The URL's host must be on the public internet"
+        )
+
+        settings.ALLOW_PRIVATE_URLS = True
+        receiver.server_close()
+        Webhook.objects.update(retry_at=timezone.now())
+        assert deliver(webhook.pk) == 20
+        webhook.refresh_from_db()
+        assert webhook.last_error == "Could not connect to the URL"
+
+    def test_prune(self):
+        """Old events are pruned"""
+        webhook = create_webhook()
+        responses = ResponseFactory.create_batch(3, assignment=webhook.assignment)
+        record(webhook, responses)
+        WebhookEvent.objects.filter(response__in=responses[:2]).update(
+            datetime=timezone.now() - timedelta(days=31)
+        )
+        with patch("spotus.assignments.webhooks.PRUNE_BATCH_SIZE", 1):
+            assert prune_events() == 2
+        assert WebhookEvent.objects.get().response_id == responses[2].pk
+
+    def test_deliver_locked(self, receiver):
+        """Only one worker delivers to a webhook at a time"""
+        webhook = create_webhook(receiver.url)
+        record(webhook, [ResponseFactory(assignment=webhook.assignment)])
+        cache.add(f"assignments:webhook:{webhook.pk}:lock", True)
+        assert deliver(webhook.pk) is None
+        assert receiver.deliveries == []
+
+    def test_deliver_webhooks(self):
+        """Pending webhooks are delivered to by their own tasks"""
+        webhook = create_webhook()
+        Webhook.objects.create(assignment=webhook.assignment, user=webhook.user, url="")
+        with patch("spotus.assignments.tasks.deliver_webhook") as mock_task:
+            deliver_webhooks(webhook.assignment_id)
+            mock_task.delay.assert_not_called()
+            record(webhook, [ResponseFactory(assignment=webhook.assignment)])
+            deliver_webhooks()
+        assert mock_task.delay.call_count == 2
+
+    def test_submissions(self):
+        """Buffered submissions and bulk edits are recorded"""
+        webhook = create_webhook()
+        save_submissions(
+            [
+                {
+                    "id": str(uuid.uuid4()),
+                    "assignment": webhook.assignment_id,
+                    "user": None,
+                    "ip_address": None,
+                    "data": None,
+                    "public": False,
+                    "datetime": timezone.now().isoformat(),
+                    "values": [],
+                }
+            ]
+        )
+        with patch("spotus.assignments.viewsets.deliver_webhooks") as mock_task:
+            bulk_responses(
+                webhook.assignment.user,
+                {"flag": True},
+                {"assignment": webhook.assignment_id},
+            )
+        mock_task.delay.assert_called_once_with(webhook.assignment_id)
+        types = WebhookEvent.objects.order_by("pk").values_list("type", flat=True)
+        assert list(types) == [WebhookEventType.created, WebhookEventType.edited]
+
+
+class TestWebhookAPI:
+    """Test subscribing to an assignment through the API"""
+
+    def test_api(self, receiver):
+        """Editors may subscribe, starting from the latest event, and replay
+        events from a cursor
+        """
+        webhook = create_webhook(receiver.url)
+        assignment = webhook.assignment
+        record(webhook, [ResponseFactory(assignment=assignment)])
+        response = webhook_api(
+            assignment.user, "post", {"assignment": assignment.pk, "url": receiver.url}
+        )
+        assert response.status_code == 201
+        created = Webhook.objects.get(pk=response.data["id"])
+        assert created.user == assignment.user
+        assert created.cursor == WebhookEvent.objects.get().pk
+        assert response.data["secret"] == created.secret
+
+        Webhook.objects.filter(pk=created.pk).update(active=False, failures=15)
+        with patch("spotus.assignments.viewsets.deliver_webhook") as mock_task:
+            response = webhook_api(
+                assignment.user, "post", {"cursor": 0}, pk=created.pk, action="replay"
+            )
+        assert response.data["cursor"] == 0
+        assert response.data["active"]
+        mock_task.delay.assert_called_once_with(created.pk)
+
+        # other users may not see the webhook
+        assert webhook_api(UserFactory(), "get", pk=created.pk).status_code == 404
+
+    @pytest.mark.parametrize(
+        "url, allow_private",
+        [("ftp://example.com/hook/", True), (None, True), (None, False)],
+    )
+    def test_api_url(self, receiver, settings, url, allow_private):
+        """Only public http and https URLs may be subscribed"""
+        webhook = create_webhook(receiver.url)
+        settings.ALLOW_PRIVATE_URLS = allow_private
+        response = webhook_api(
+            webhook.assignment.user,
+            "post",
+            {"assignment": webhook.assignment_id, "url": url or receiver.url},
+        )
+        if url is None and allow_private:
+            assert response.status_code == 201
+        else:
+            assert response.status_code == 400
+            assert "url" in response.data
+
+    def test_api_permission(self, receiver):
+        """Only editors may subscribe to an assignment"""
+        webhook = create_webhook(receiver.url)
+        response = webhook_api(
+            UserFactory(),
+            "post",
+            {"assignment": webhook.assignment_id, "url": receiver.url},
+        )
+        assert response.status_code == 400
+        assert "assignment" in response.data
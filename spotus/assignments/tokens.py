@@ -0,0 +1,36 @@
+"""
+Signed tokens for submitting embedded assignment forms
+
+Embedded forms are shown in iframes on other sites, where our cookies are not
+sent, so the usual CSRF check can not work.  Instead, the form includes a
+signed token for the assignment and user, which is checked on submission.
+"""
+
+# Django
+from django.core.signing import BadSignature, TimestampSigner
+
+EMBED_TOKEN_SALT = "assignments.embed"
+EMBED_TOKEN_MAX_AGE = 24 * 60 * 60
+
+
+def _embed_token_value(assignment, user):
+    """The value signed by the embed token"""
+    return "{}:{}".format(assignment.pk, user.pk or "")
+
+
+def make_embed_token(assignment, user):
+    """A signed token for submitting the assignment as the user"""
+    return TimestampSigner(salt=EMBED_TOKEN_SALT).sign(
+        _embed_token_value(assignment, user)
+    )
+
+
+def check_embed_token(token, assignment, user):
+    """Check that the token was made for the assignment and user recently"""
+    try:
+        value = TimestampSigner(salt=EMBED_TOKEN_SALT).unsign(
+            token, max_age=EMBED_TOKEN_MAX_AGE
+        )
+    except BadSignature:
+        return False
+    return value == _embed_token_value(assignment, user)
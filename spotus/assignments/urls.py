@@ -26,6 +26,11 @@ urlpatterns = [
         views.AssignmentEmbededFormView.as_view(),
         name="embed",
     ),
+    path(
+        "<slug:slug>-<int:pk>/embed/client/",
+        views.AssignmentEmbededClientView.as_view(),
+        name="embed-client",
+    ),
     path(
         "confirm/", views.AssignmentEmbededConfirmView.as_view(), name="embed-confirm"
     ),
@@ -1,6 +1,7 @@
 """Views for the assignments app"""
 
 # Django
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import PermissionRequiredMixin
@@ -13,7 +14,9 @@ from django.urls import reverse
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.utils.text import slugify
+from django.views.decorators.cache import cache_control
 from django.views.decorators.clickjacking import xframe_options_exempt
+from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import (
     CreateView,
     DetailView,
@@ -32,21 +35,40 @@ from ipware import get_client_ip
 from squarelet_auth.mixins import MiniregMixin
 
 # SpotUs
-from spotus.assignments.choices import Registration, Status
+from spotus.assignments.analytics import get_stats, invalidate_analytics
+from spotus.assignments.buffer import buffer_submission
+from spotus.assignments.choices import Registration, Status, WebhookEventType
 from spotus.assignments.filters import AssignmentFilterSet
 from spotus.assignments.forms import (
     AssignmentCreationForm,
     AssignmentForm,
+    BulkMessageForm,
     DataCsvForm,
     DataFormset,
     MessageResponseForm,
 )
+from spotus.assignments.leaderboard import get_leaderboards, get_rank, record_responses
 from spotus.assignments.models import Assignment, Data, Field, Response
-from spotus.assignments.tasks import export_csv
+from spotus.assignments.search import update_search_vectors
+from spotus.assignments.tasks import (
+    deliver_webhooks,
+    drain_submissions,
+    export_consensus_csv,
+    export_csv,
+    rebuild_search_vectors,
+    refresh_field_stats,
+    send_bulk_message,
+    send_submission_emails,
+)
+from spotus.assignments.tokens import check_embed_token, make_embed_token
+from spotus.assignments.webhooks import record_events
 from spotus.core.email import TemplateEmail
+from spotus.core.replica import is_pinned, replica_view
 from spotus.core.views import FilterListView
 
 
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+@method_decorator(replica_view, name="dispatch")
 class AssignmentExploreView(TemplateView):
     """Provides a space for exploring active assignments"""
 
@@ -60,7 +82,7 @@ class AssignmentExploreView(TemplateView):
         context["assignment_count"] = Assignment.objects.exclude(
             status=Status.draft
         ).count()
-        context["assignments"] = (
+        assignments = list(
             Assignment.objects.annotate(
                 user_count=Count("responses__user", distinct=True)
             )
@@ -72,9 +94,17 @@ class AssignmentExploreView(TemplateView):
                 Prefetch("responses", queryset=Response.objects.select_related("user")),
             )[:5]
         )
+        leaderboards = get_leaderboards([None, *assignments], limit=5)
+        for assignment in assignments:
+            assignment.leaderboard = leaderboards[assignment][:3]
+        context["assignments"] = assignments
+        context["leaderboard"] = leaderboards[None]
+        if self.request.user.is_authenticated:
+            context["rank"] = get_rank(self.request.user)
         return context
 
 
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class AssignmentDetailView(DetailView):
     """A view for those with permission to view the particular assignment"""
 
@@ -100,8 +130,19 @@ class AssignmentDetailView(DetailView):
         has_perm = self.request.user.has_perm(
             "assignments.change_assignment", assignment
         )
-        if self.request.GET.get("csv") and has_perm:
-            export_csv.delay(assignment.pk, self.request.user.pk)
+        if self.request.GET.get("csv") == "consensus" and has_perm:
+            export_consensus_csv.delay(assignment.pk, self.request.user.pk)
+            messages.info(
+                self.request,
+                "Your consensus CSV is being processed.  It will be emailed to "
+                "you when it is ready.",
+            )
+        elif self.request.GET.get("csv") and has_perm:
+            export_csv.delay(
+                assignment.pk,
+                self.request.user.pk,
+                replica=not is_pinned(self.request),
+            )
             messages.info(
                 self.request,
                 "Your CSV is being processed.  It will be emailed to you when "
@@ -121,16 +162,29 @@ class AssignmentDetailView(DetailView):
             )
             return redirect(assignment)
         if request.POST.get("action") == "Close":
-            assignment.status = "close"
+            assignment.status = Status.closed
             assignment.save()
             messages.success(request, "The assignment has been closed")
+        elif request.POST.get("action") == "Add Data" and assignment.is_archived:
+            messages.error(request, "Data may not be added to an archived assignment")
         elif request.POST.get("action") == "Add Data":
             form = DataCsvForm(request.POST, request.FILES)
             if form.is_valid():
-                form.process_data_csv(assignment)
+                with transaction.atomic():
+                    form.process_data_csv(assignment)
                 messages.success(request, "The data is being added to the assignment")
             else:
                 messages.error(request, form.errors)
+        elif request.POST.get("action") == "Message Contributors":
+            form = BulkMessageForm(request.POST)
+            if form.is_valid():
+                message = form.create_message(assignment, request.user)
+                send_bulk_message.delay(message.pk)
+                messages.success(
+                    request, "Your message is being sent to the contributors"
+                )
+            else:
+                messages.error(request, form.errors)
         return redirect(assignment)
 
     def get_context_data(self, **kwargs):
@@ -141,14 +195,26 @@ class AssignmentDetailView(DetailView):
         )
         context["message_form"] = MessageResponseForm()
         context["data_form"] = DataCsvForm()
+        context["bulk_message_form"] = BulkMessageForm()
         context["edit_access"] = self.request.user.has_perm(
             "assignments.change_assignment", self.object
         )
+        if context["edit_access"]:
+            context["bulk_messages"] = self.object.bulk_messages.all()[:10]
+            context["field_stats"] = get_stats(
+                self.object, refresh=lambda field: refresh_field_stats.delay(field.pk)
+            )
         return context
 
 
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class AssignmentFormView(MiniregMixin, BaseDetailView, FormView):
-    """A view for a user to fill out the assignment form"""
+    """A view for a user to fill out the assignment form
+
+    This is not run in a transaction, so that no transaction is held open while
+    registering users with Squarelet.  The submission is saved in its own
+    transaction, and the submission emails are sent from a task once it commits.
+    """
 
     template_name = "assignments/form.html"
     form_class = AssignmentForm
@@ -184,7 +250,11 @@ class AssignmentFormView(MiniregMixin, BaseDetailView, FormView):
         if assignment.status == Status.draft:
             messages.error(request, "No submitting to draft assignments")
             return redirect(assignment)
-        if request.POST.get("submit") == "Skip":
+        action = "skip" if request.POST.get("submit") == "Skip" else "submit"
+        ip_address, _ = get_client_ip(request)
+        if assignment.is_throttled(request.user, ip_address, action):
+            return self.throttled()
+        if action == "skip":
             return self.skip()
         return super().post(request, args, kwargs)
 
@@ -207,20 +277,8 @@ class AssignmentFormView(MiniregMixin, BaseDetailView, FormView):
     def _has_assignment(self, assignment, user, ip_address):
         """Check if the user has a valid assignment to complete"""
         # pylint: disable=attribute-defined-outside-init
-        if user.is_anonymous:
-            user = None
-        else:
-            ip_address = None
-        self.data = assignment.get_data_to_show(user, ip_address)
-        if assignment.data.exists():
-            return self.data is not None
-        else:
-            return not (
-                assignment.user_limit
-                and assignment.responses.filter(
-                    user=user, ip_address=ip_address
-                ).exists()
-            )
+        has_assignment, self.data = assignment.check_assignment(user, ip_address)
+        return has_assignment
 
     def get_form_kwargs(self):
         """Add the assignment object to the form"""
@@ -275,29 +333,12 @@ class AssignmentFormView(MiniregMixin, BaseDetailView, FormView):
         else:
             user = None
             ip_address, _ = get_client_ip(self.request)
-        if user or ip_address:
-            number = (
-                self.object.responses.filter(
-                    user=user, ip_address=ip_address, data=self.data
-                ).count()
-                + 1
-            )
-        else:
-            number = 1
         if not has_data or self.data is not None:
-            response = Response.objects.create(
-                assignment=assignment,
-                user=user,
-                public=form.cleaned_data.get("public", False),
-                ip_address=ip_address,
-                data=self.data,
-                number=number,
-            )
-            response.create_values(form.cleaned_data)
+            if assignment.buffer_submissions:
+                self._buffer_response(assignment, user, ip_address, form)
+            else:
+                self._save_response(assignment, user, ip_address, form)
             messages.success(self.request, "Thank you!")
-            if assignment.submission_emails:
-                for email in assignment.submission_emails.split(","):
-                    response.send_email(email)
 
         if self.request.POST.get("submit") == "Submit and Add Another":
             return self.render_to_response(self.get_context_data(data=self.data))
@@ -309,10 +350,57 @@ class AssignmentFormView(MiniregMixin, BaseDetailView, FormView):
         else:
             return redirect("assignments:list")
 
+    @transaction.atomic
+    def _save_response(self, assignment, user, ip_address, form):
+        """Save the response"""
+        if user or ip_address:
+            number = (
+                assignment.responses.filter(
+                    user=user, ip_address=ip_address, data=self.data
+                ).count()
+                + 1
+            )
+        else:
+            number = 1
+        response = Response.objects.create(
+            assignment=assignment,
+            user=user,
+            public=form.cleaned_data.get("public", False),
+            ip_address=ip_address,
+            data=self.data,
+            number=number,
+        )
+        response.create_values(form.cleaned_data)
+        update_search_vectors(Response.objects.filter(pk=response.pk))
+        invalidate_analytics(assignment.pk)
+        transaction.on_commit(lambda: record_responses([response]))
+        if record_events(WebhookEventType.created, [(response.pk, assignment.pk)]):
+            transaction.on_commit(lambda: deliver_webhooks.delay(assignment.pk))
+        if assignment.submission_emails:
+            transaction.on_commit(lambda: send_submission_emails.delay(response.pk))
+
+    def _buffer_response(self, assignment, user, ip_address, form):
+        """Buffer the response, to be saved and numbered in a batch later"""
+        scheduled = buffer_submission(
+            assignment, user, ip_address, self.data, form.cleaned_data
+        )
+        if scheduled:
+            drain_submissions.apply_async(countdown=settings.ASSIGNMENT_BUFFER_DELAY)
+
     def form_invalid(self, form):
         """Make sure we include the data in the context"""
         return self.render_to_response(self.get_context_data(form=form, data=self.data))
 
+    def throttled(self):
+        """The user is submitting too quickly"""
+        messages.error(
+            self.request,
+            "You are submitting too quickly, please wait a moment and try again",
+        )
+        return redirect(
+            "assignments:assignment", slug=self.object.slug, pk=self.object.pk
+        )
+
     def skip(self):
         """The user wants to skip this data"""
         assignment = self.get_object()
@@ -321,9 +409,10 @@ class AssignmentFormView(MiniregMixin, BaseDetailView, FormView):
             assignment.registration != Registration.required and ip_address
         )
         if self.data is not None and self.request.user.is_authenticated:
-            Response.objects.create(
+            response = Response.objects.create(
                 assignment=assignment, user=self.request.user, data=self.data, skip=True
             )
+            record_responses([response])
             messages.info(self.request, "Skipped!")
         elif self.data is not None and can_submit_anonymous:
             Response.objects.create(
@@ -358,18 +447,29 @@ class AssignmentEditResponseView(BaseDetailView, FormView):
         """Add the user and assignment object to the form"""
         kwargs = super().get_form_kwargs()
         kwargs.update(
-            {"assignment": self.get_object().assignment, "user": self.request.user}
+            {
+                "assignment": self.object.assignment,
+                "user": self.request.user,
+                "datum": self.object.data,
+            }
         )
         return kwargs
 
     def get_initial(self):
         """Fetch the assignment data item to show with this form,
         if there is one, and the latest values"""
-        return self._get_initial("value")
+        initial = {"data_id": self.object.data_id}
+        for key, values in self.object.field_values.items():
+            values = [v for v in values if v]
+            # if a single field has multiple values, make a list of values
+            if len(values) > 1:
+                initial[key] = values
+            elif values:
+                initial[key] = values[0]
+        return initial
 
     def _get_initial(self, value_attr):
-        """Helper function to allow overriding of the value attribute for the
-        revert view"""
+        """Get the initial data from the value objects, for the revert view"""
         initial = {"data_id": self.object.data_id}
         for value in self.object.values.exclude(**{value_attr: ""}):
             key = str(value.field.pk)
@@ -405,12 +505,17 @@ class AssignmentEditResponseView(BaseDetailView, FormView):
             if field and field.field.multiple_values:
                 # for multi valued fields, collect all old and new values together
                 # and recreate all values
-                original_value = (
-                    response.values.filter(field_id=field_id)
+                # evaluate the original values before they are deleted
+                original_value = list(
+                    response.values.filter(
+                        assignment=response.assignment_id, field_id=field_id
+                    )
                     .exclude(original_value="")
                     .values_list("original_value", flat=True)
                 )
-                response.values.filter(field_id=field_id).delete()
+                response.values.filter(
+                    assignment=response.assignment_id, field_id=field_id
+                ).delete()
                 for orig, new in zip_longest(original_value, new_value, fillvalue=""):
                     response.values.create(
                         field_id=field_id, value=new, original_value=orig
@@ -421,6 +526,15 @@ class AssignmentEditResponseView(BaseDetailView, FormView):
                 response.values.update_or_create(
                     field_id=field_id, defaults={"value": new_value}
                 )
+        response.update_field_values()
+        update_search_vectors(Response.objects.filter(pk=response.pk))
+        invalidate_analytics(response.assignment_id)
+        if record_events(
+            WebhookEventType.edited, [(response.pk, response.assignment_id)]
+        ):
+            transaction.on_commit(
+                lambda: deliver_webhooks.delay(response.assignment_id)
+            )
 
         return redirect(
             "assignments:detail",
@@ -439,24 +553,77 @@ class AssignmentRevertResponseView(AssignmentEditResponseView):
 
 
 @method_decorator(xframe_options_exempt, name="dispatch")
+@method_decorator(csrf_exempt, name="dispatch")
 class AssignmentEmbededFormView(AssignmentFormView):
-    """A view to embed an assignment"""
+    """A view to embed an assignment
+    This is CSRF exempt, and checks a signed embed token instead
+    """
 
     template_name = "assignments/embed.html"
 
+    def get_embed_token(self):
+        """A signed token for submitting this assignment as this user"""
+        return make_embed_token(self.object, self.request.user)
+
+    def post(self, request, *args, **kwargs):
+        """Check the embed token in place of the CSRF token"""
+        if not check_embed_token(
+            request.POST.get("embed_token", ""), self.object, request.user
+        ):
+            messages.error(request, "This form has expired, please try again")
+            return redirect(
+                "assignments:embed", slug=self.object.slug, pk=self.object.pk
+            )
+        return super().post(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        """Add the embed token"""
+        context = super().get_context_data(**kwargs)
+        context["embed_token"] = self.get_embed_token()
+        return context
+
     def form_valid(self, form):
         """Redirect to embedded confirmation page"""
         super().form_valid(form)
         return redirect("assignments:embed-confirm")
 
+    def skip(self):
+        """Stay in the embed after skipping"""
+        super().skip()
+        return redirect("assignments:embed", slug=self.object.slug, pk=self.object.pk)
+
+    def throttled(self):
+        """Stay in the embed when throttled"""
+        super().throttled()
+        return redirect("assignments:embed", slug=self.object.slug, pk=self.object.pk)
+
 
 @method_decorator(xframe_options_exempt, name="dispatch")
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+@method_decorator(
+    cache_control(public=True, max_age=settings.ASSIGNMENT_FORM_MAX_AGE),
+    name="dispatch",
+)
+class AssignmentEmbededClientView(TemplateView):
+    """A lightweight page to embed an assignment
+    The form is rendered client side from the API, so this page does not need
+    the database, and may be cached.  The form is submitted to the embedded
+    form view.
+    """
+
+    template_name = "assignments/embed_client.html"
+
+
+@method_decorator(xframe_options_exempt, name="dispatch")
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class AssignmentEmbededConfirmView(TemplateView):
     """Embedded confirm page"""
 
     template_name = "assignments/embed_confirm.html"
 
 
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+@method_decorator(replica_view, name="dispatch")
 class AssignmentListView(FilterListView):
     """List of crowdfunds"""
 
@@ -468,11 +635,7 @@ class AssignmentListView(FilterListView):
     def get_queryset(self):
         """Get all open assignments and all assignments you own"""
         queryset = super().get_queryset()
-        queryset = (
-            queryset.select_related("user")
-            .prefetch_related("data", "responses")
-            .distinct()
-        )
+        queryset = queryset.select_related("user").prefetch_related("data", "responses")
         return queryset.get_viewable(self.request.user)
 
     def get_context_data(self, **kwargs):
@@ -581,7 +744,10 @@ class AssignmentUpdateView(UpdateView):
         assignment.status = status
         assignment.save()
         form.save_m2m()
+        gallery = assignment.get_gallery_field_ids()
         assignment.create_form(form.cleaned_data["form_json"])
+        if assignment.get_gallery_field_ids() != gallery:
+            transaction.on_commit(lambda: rebuild_search_vectors.delay(assignment.pk))
         form.process_data_csv(assignment)
         if formset.is_valid():
             formset.save(doccloud_each_page=form.cleaned_data["doccloud_each_page"])
@@ -589,6 +755,7 @@ class AssignmentUpdateView(UpdateView):
         return redirect(assignment)
 
 
+@transaction.non_atomic_requests
 def oembed(request):
     """AJAX view to get oembed data"""
     if "url" in request.GET:
@@ -598,6 +765,7 @@ def oembed(request):
         return HttpResponseBadRequest()
 
 
+@transaction.non_atomic_requests
 def message_response(request):
     """AJAX view to send an email to the user of a response"""
     form = MessageResponseForm(request.POST)
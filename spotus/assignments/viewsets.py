@@ -3,18 +3,56 @@ Viewsets for the Assignment application API
 """
 
 # Django
-from django.db.models import Q
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
 from rest_framework import mixins, permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.response import Response as APIResponse
+
+# Standard Library
+import hashlib
+import json
+from functools import partial
 
 # Third Party
 from django_filters import rest_framework as django_filters
+from ipware import get_client_ip
 
 # SpotUs
-from spotus.assignments.models import Assignment, Response
+from spotus.assignments.analytics import (
+    get_distribution,
+    get_stats,
+    invalidate_analytics,
+)
+from spotus.assignments.choices import Status, WebhookEventType
+from spotus.assignments.models import Assignment, Response, Webhook
+from spotus.assignments.search import ResponseSearchFilter
 from spotus.assignments.serializers import (
+    AssignmentFormSerializer,
+    ConsensusSerializer,
+    DataSerializer,
+    DistributionFilterSerializer,
     ResponseAdminSerializer,
+    ResponseBulkSerializer,
     ResponseGallerySerializer,
+    WebhookReplaySerializer,
+    WebhookSerializer,
 )
+from spotus.assignments.tasks import (
+    deliver_webhook,
+    deliver_webhooks,
+    refresh_distribution,
+    refresh_field_stats,
+)
+from spotus.assignments.tokens import make_embed_token
+from spotus.assignments.webhooks import get_latest_cursor, record_events
+from spotus.core.pagination import StandardCursorPagination
+from spotus.core.replica import replica_view
+from spotus.core.throttle import TokenBucketThrottle
 
 
 class DjangoObjectPermissionsOrAnonReadOnly(permissions.DjangoObjectPermissions):
@@ -25,6 +63,23 @@ class DjangoObjectPermissionsOrAnonReadOnly(permissions.DjangoObjectPermissions)
     authenticated_users_only = False
 
 
+class ResponseCursorPagination(StandardCursorPagination):
+    """Cursor pagination for responses, ordered by id or by datetime
+
+    Datetimes are nearly unique, so few responses with the same datetime are
+    skipped past on each page
+    """
+
+    orderings = {
+        "id": ("id",),
+        "-id": ("-id",),
+        "datetime": ("datetime", "id"),
+        "-datetime": ("-datetime", "-id"),
+    }
+
+
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+@method_decorator(replica_view, name="list")
 class ResponseViewSet(
     mixins.RetrieveModelMixin,
     mixins.UpdateModelMixin,
@@ -35,37 +90,380 @@ class ResponseViewSet(
 
     queryset = (
         Response.objects.select_related("assignment", "data", "user", "edit_user")
-        .prefetch_related("assignment__fields", "values", "tags")
+        .prefetch_related("tags")
         .order_by("id")
     )
     permission_classes = (DjangoObjectPermissionsOrAnonReadOnly,)
+    filter_backends = (django_filters.DjangoFilterBackend, ResponseSearchFilter)
+    throttle_classes = (TokenBucketThrottle,)
+    throttle_scope = "assignment-responses"
+    throttle_rate = settings.ASSIGNMENT_API_THROTTLE_RATE
+
+    @property
+    def paginator(self):
+        """Use cursor pagination if requested, otherwise the default page number
+        pagination, which the detail page relies on for its page counts
+        """
+        # pylint: disable=attribute-defined-outside-init
+        if not hasattr(self, "_paginator"):
+            if self.request.query_params.get("pagination") == "cursor":
+                self._paginator = ResponseCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def perform_update(self, serializer):
+        """Requests are not atomic, so save the response and its tags together"""
+        response = serializer.instance
+        with transaction.atomic():
+            super().perform_update(serializer)
+            subscribed = record_events(
+                WebhookEventType.edited, [(response.pk, response.assignment_id)]
+            )
+        if subscribed:
+            deliver_webhooks.delay(response.assignment_id)
 
     def get_serializer_class(self):
         """Get the serializer class"""
         if self.request.user.is_staff:
             return ResponseAdminSerializer
-        try:
-            assignment = Assignment.objects.get(pk=self.request.GET.get("assignment"))
-        except Assignment.DoesNotExist:
+        assignment = self._get_assignment()
+        if assignment is None:
             return ResponseGallerySerializer
 
-        if self.request.user.has_perm("assignment.change_assignment", assignment):
+        if self.request.user.has_perm("assignments.change_assignment", assignment):
             return ResponseAdminSerializer
         else:
             return ResponseGallerySerializer
 
+    def _get_assignment(self):
+        """Get the assignment being filtered on, if there is one
+        This is called once per serializer, so cache it for the request
+        """
+        # pylint: disable=attribute-defined-outside-init
+        if not hasattr(self, "_assignment"):
+            try:
+                self._assignment = Assignment.objects.get(
+                    pk=self.request.GET.get("assignment")
+                )
+            except (Assignment.DoesNotExist, ValueError):
+                self._assignment = None
+        return self._assignment
+
     def get_queryset(self):
         """Filter the queryset"""
         return self.queryset.get_viewable(self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        """An archived assignment's responses are read from its archive"""
+        assignment = self._get_assignment()
+        if assignment is None or not assignment.is_archived:
+            return super().list(request, *args, **kwargs)
+        # the archived responses are a list, which cursors can not paginate
+        self._paginator = self.pagination_class()
+        page = self.paginate_queryset(self._filter_archived(assignment))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def _filter_archived(self, assignment):
+        """Filter the archived responses as the database's responses would be"""
+        user = self.request.user
+        responses = assignment.archived_responses
+        is_editor = user.is_staff or user.pk == assignment.user_id
+        if not is_editor:
+            responses = [r for r in responses if r.gallery]
+        filterset = self.Filter(self.request.query_params, queryset=self.queryset)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        data = filterset.form.cleaned_data
+        if data.get("id") is not None:
+            responses = [r for r in responses if r.pk == data["id"]]
+        if data.get("flag") is not None:
+            responses = [r for r in responses if r.flag == data["flag"]]
+        if data.get("value"):
+            field_id, _, value = data["value"].partition(":")
+            responses = [
+                r for r in responses if value in r.field_values.get(field_id, [])
+            ]
+        term = self.request.query_params.get(
+            ResponseSearchFilter.search_param, ""
+        ).strip()
+        if term:
+            # match substrings of values and tags, as the search does, only in
+            # the gallery fields for users who may not change the assignment
+            term = term.lower()
+            if not is_editor:
+                gallery = {str(pk) for pk in assignment.get_gallery_field_ids()}
+            responses = [
+                r
+                for r in responses
+                if any(
+                    term in v.lower()
+                    for field_id, values in r.field_values.items()
+                    if is_editor or field_id in gallery
+                    for v in values
+                )
+                or any(term in t.name.lower() for t in r.tags.all())
+            ]
+        return responses
+
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=(permissions.IsAuthenticated,),
+        pagination_class=None,
+    )
+    def bulk(self, request):
+        """Flag, gallery or tag many responses in one request
+
+        The responses are chosen by a list of `ids`, or by the same filters as
+        the list view, given as query parameters.  The user must be allowed to
+        change every assignment the chosen responses belong to.
+        """
+        serializer = ResponseBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        queryset = self.filter_queryset(self.get_queryset())
+        if "ids" in serializer.validated_data:
+            queryset = queryset.filter(pk__in=serializer.validated_data["ids"])
+        elif "assignment" not in request.query_params:
+            raise ValidationError("Either give a list of ids or filter by assignment")
+
+        responses = dict(queryset.order_by().values_list("pk", "assignment_id"))
+        for assignment in Assignment.objects.filter(pk__in=set(responses.values())):
+            if not request.user.has_perm("assignments.change_assignment", assignment):
+                raise PermissionDenied(
+                    "You do not have permission to edit {}".format(assignment)
+                )
+
+        with transaction.atomic():
+            serializer.apply(list(responses))
+            subscribed = record_events(WebhookEventType.edited, responses.items())
+        invalidate_analytics(*set(responses.values()))
+        for assignment_pk in subscribed:
+            deliver_webhooks.delay(assignment_pk)
+        return APIResponse({"count": len(responses)})
+
     class Filter(django_filters.FilterSet):
         """API Filter for Assignment Responses"""
 
-        assignment = django_filters.NumberFilter(name="assignment__id")
+        assignment = django_filters.NumberFilter(field_name="assignment__id")
+        value = django_filters.CharFilter(
+            method="filter_value",
+            help_text="Responses with a value for a field, given as field_id:value",
+        )
+
+        def filter_value(self, queryset, name, value):
+            """Filter on the current values, using their GIN index"""
+            field_id, _, value = value.partition(":")
+            return queryset.filter(field_values__contains={field_id: [value]})
 
         class Meta:
             model = Response
             fields = ("id", "flag")
 
-    filter_class = Filter
-    search_fields = ("values__value", "tags__name")
+    filterset_class = Filter
+
+
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+class AssignmentViewSet(viewsets.GenericViewSet):
+    """API views for rendering assignment forms client side, such as in embeds
+
+    The form schema only changes when the assignment is edited, so it may be
+    cached by browsers and CDNs, and is validated by ETag.  The data to show
+    is specific to each visitor, and is fetched separately.
+    """
+
+    queryset = Assignment.objects.all()
+    permission_classes = (permissions.AllowAny,)
+
+    def get_queryset(self):
+        """Only allow viewable assignments"""
+        return self.queryset.get_viewable(self.request.user)
+
+    @action(detail=True)
+    def form(self, request, pk=None):
+        """The form schema"""
+        assignment = self.get_object()
+        etag = self._get_form_etag(assignment)
+        if etag in request.META.get("HTTP_IF_NONE_MATCH", ""):
+            response = APIResponse(status=304)
+        else:
+            schema = cache.get_or_set(
+                "assignments:form:{}".format(etag.strip('"')),
+                lambda: AssignmentFormSerializer(assignment).data,
+            )
+            response = APIResponse(schema)
+        response["ETag"] = etag
+        if assignment.status == Status.open:
+            patch_cache_control(
+                response, public=True, max_age=settings.ASSIGNMENT_FORM_MAX_AGE
+            )
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def _get_form_etag(self, assignment):
+        """The ETag changes whenever the form or the assignment is edited"""
+        values = [
+            assignment.pk,
+            assignment.form_version,
+            assignment.slug,
+            assignment.title,
+            assignment.description,
+            assignment.status,
+            assignment.registration,
+            assignment.ask_public,
+            assignment.multiple_per_page,
+        ]
+        digest = hashlib.md5(json.dumps(values).encode("utf8")).hexdigest()
+        return '"{}"'.format(digest)
+
+    @action(detail=True)
+    def datum(self, request, pk=None):
+        """The next data item for this visitor to complete, and a token to
+        submit the form with
+        """
+        assignment = self.get_object()
+        ip_address, _ = get_client_ip(request)
+        has_assignment, data = assignment.check_assignment(request.user, ip_address)
+        response = APIResponse(
+            {
+                "has_assignment": has_assignment,
+                "data": DataSerializer(data).data if data is not None else None,
+                "embed_token": make_embed_token(assignment, request.user),
+            }
+        )
+        patch_cache_control(response, private=True, no_store=True)
+        return response
+
+    @action(detail=True)
+    def consensus(self, request, pk=None):
+        """The consensus for each of the assignment's data items and fields
+
+        Filter by `data` and `field` ids, and by `max_agreement` to find the
+        answers which most need reviewing.
+        """
+        assignment = self._get_editable_object()
+        try:
+            filters = {
+                name: cast(request.query_params[name])
+                for name, cast in (
+                    ("data", int),
+                    ("field", int),
+                    ("max_agreement", float),
+                )
+                if request.query_params.get(name)
+            }
+        except ValueError as exc:
+            raise ValidationError(str(exc))
+
+        consensus = assignment.get_consensus()
+        if assignment.is_archived:
+            consensus = [
+                c
+                for c in consensus
+                if c.data_id == filters.get("data", c.data_id)
+                and c.field_id == filters.get("field", c.field_id)
+                and c.agreement <= filters.get("max_agreement", c.agreement)
+            ]
+        else:
+            if "data" in filters:
+                consensus = consensus.filter(data=filters["data"])
+            if "field" in filters:
+                consensus = consensus.filter(field=filters["field"])
+            if "max_agreement" in filters:
+                consensus = consensus.filter(agreement__lte=filters["max_agreement"])
+        page = self.paginate_queryset(consensus)
+        return self.get_paginated_response(ConsensusSerializer(page, many=True).data)
+
+    @action(detail=True)
+    def distribution(self, request, pk=None):
+        """The number of responses giving each answer to the assignment's
+        select and checkbox fields
+
+        Filter the responses by `flag`, `gallery`, `tag`, and the `start` and
+        `end` dates they were submitted.  The counts are `stale` if responses
+        have been submitted or edited since they were counted, while they are
+        recounted, and `pending`, with no counts, until they are first counted.
+        """
+        assignment = self._get_editable_object()
+        # a plain dict, as missing booleans in form data are read as false
+        serializer = DistributionFilterSerializer(data=request.query_params.dict())
+        serializer.is_valid(raise_exception=True)
+        return APIResponse(
+            get_distribution(
+                assignment,
+                serializer.validated_data,
+                refresh=partial(
+                    refresh_distribution.delay, assignment.pk, serializer.data
+                ),
+            )
+        )
+
+    @action(detail=True)
+    def stats(self, request, pk=None):
+        """Summaries of the answers to the assignment's number and date fields,
+        with a histogram and the responses with outlying answers for each
+
+        A field's summary is `stale` if responses have been submitted or edited
+        since it was made, while it is made again, and `pending`, with no
+        summary, until it is first made.
+        """
+        assignment = self._get_editable_object()
+        return APIResponse(
+            {
+                "fields": get_stats(
+                    assignment,
+                    refresh=lambda field: refresh_field_stats.delay(field.pk),
+                )
+            }
+        )
+
+    def _get_editable_object(self):
+        """Get the assignment, which the user must be allowed to change"""
+        assignment = self.get_object()
+        if not self.request.user.has_perm("assignments.change_assignment", assignment):
+            raise PermissionDenied(
+                "You do not have permission to edit {}".format(assignment)
+            )
+        return assignment
+
+
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+class WebhookViewSet(viewsets.ModelViewSet):
+    """API views for subscribing to an assignment's new and edited responses,
+    which are posted to the webhook's URL as they are saved
+    """
+
+    queryset = Webhook.objects.order_by("pk")
+    serializer_class = WebhookSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        """Only the webhooks for assignments the user may edit"""
+        if self.request.user.is_staff:
+            return self.queryset
+        return self.queryset.filter(assignment__user=self.request.user)
+
+    def perform_create(self, serializer):
+        """New webhooks are sent the events recorded after they subscribe"""
+        serializer.save(
+            user=self.request.user,
+            cursor=get_latest_cursor(serializer.validated_data["assignment"].pk),
+        )
+
+    @action(detail=True, methods=["post"])
+    def replay(self, request, pk=None):
+        """Deliver the events after the given `cursor` again, in order, and
+        reactivate the webhook if too many deliveries had failed
+        """
+        webhook = self.get_object()
+        serializer = WebhookReplaySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        webhook.cursor = serializer.validated_data["cursor"]
+        webhook.active = True
+        webhook.failures = 0
+        webhook.retry_at = None
+        webhook.save()
+        deliver_webhook.delay(webhook.pk)
+        return APIResponse(self.get_serializer(webhook).data)
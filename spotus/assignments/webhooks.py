@@ -0,0 +1,272 @@
+"""
+Webhooks for an assignment's new and edited responses
+
+Whenever responses are created or edited, an event is recorded for each of
+them, in the same transaction, if their assignment has any webhooks.  Each
+webhook keeps a cursor of the last event delivered to it, and the events after
+it are posted to its URL in batches, in order of id, so new responses arrive in
+order of their ids.  Each delivery is signed with the webhook's secret, so it
+may be verified, and is retried with exponential backoff until it succeeds, so
+events are delivered at least once, and may be told apart by their ids.
+
+Recording events takes a lock on their assignment until the transaction
+commits, so that each assignment's events commit in order of id, and a cursor
+never passes an event which has not committed yet.  Only one worker delivers to
+a webhook at a time, so that its events stay in order.  Delivery is started
+once the events commit, and any which are missed, such as events committed
+while another worker was delivering, are picked up by the periodic
+`deliver_webhooks` task.
+
+Webhook URLs must be public, and are checked again before each delivery, as
+their hosts' addresses may change.  Only the status of a failed delivery is
+recorded for its owner, so webhooks may not be used to probe other hosts.
+Events are pruned after `ASSIGNMENT_WEBHOOK_EVENT_DAYS`, so they may only be
+replayed from that far back.
+"""
+
+# Django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Exists, Max, OuterRef, Q
+from django.utils import timezone
+
+# Standard Library
+import hashlib
+import hmac
+import json
+import logging
+from datetime import timedelta
+
+# Third Party
+import requests
+
+# SpotUs
+from spotus.assignments.choices import WebhookEventType
+from spotus.assignments.models import Response, Webhook, WebhookEvent
+from spotus.assignments.serializers import ResponseAdminSerializer
+from spotus.core.network import validate_public_url
+
+logger = logging.getLogger(__name__)
+
+# failed deliveries are retried after this many seconds, doubling each time
+RETRY_DELAY = 10
+MAX_RETRY_DELAY = 60 * 60
+# longer than the delivery task may run
+LOCK_TIMEOUT = 10 * 60
+# the first key of the advisory locks taken while recording events
+LOCK_NAMESPACE = 48
+# how many old events to delete at once
+PRUNE_BATCH_SIZE = 10000
+
+
+def get_subscribed(assignment_pks):
+    """The assignments which have active webhooks"""
+    return set(
+        Webhook.objects.filter(assignment__in=assignment_pks, active=True)
+        .values_list("assignment_id", flat=True)
+        .distinct()
+    )
+
+
+def record_events(event_type, responses):
+    """Record that responses, given as pairs of their ids and their assignment
+    ids, have been created or edited, returning the assignments with webhooks
+    to deliver to once they commit
+    """
+    responses = list(responses)
+    subscribed = get_subscribed({a for _, a in responses})
+    with connection.cursor() as cursor:
+        # in order, so that transactions recording several never deadlock
+        for assignment_pk in sorted(subscribed):
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(%s, %s)", [LOCK_NAMESPACE, assignment_pk]
+            )
+    WebhookEvent.objects.bulk_create(
+        WebhookEvent(assignment_id=assignment_pk, response_id=pk, type=event_type)
+        for pk, assignment_pk in sorted(responses)
+        if assignment_pk in subscribed
+    )
+    return subscribed
+
+
+def get_latest_cursor(assignment_pk):
+    """The id of the assignment's latest event, for new webhooks to start from"""
+    return (
+        WebhookEvent.objects.filter(assignment=assignment_pk).aggregate(
+            cursor=Max("pk")
+        )["cursor"]
+        or 0
+    )
+
+
+def get_pending(assignment_pk=None):
+    """The active webhooks which have events to deliver now"""
+    webhooks = (
+        Webhook.objects.filter(active=True)
+        .filter(Q(retry_at=None) | Q(retry_at__lte=timezone.now()))
+        .filter(
+            Exists(
+                WebhookEvent.objects.filter(
+                    assignment=OuterRef("assignment"), pk__gt=OuterRef("cursor")
+                )
+            )
+        )
+    )
+    if assignment_pk is not None:
+        webhooks = webhooks.filter(assignment=assignment_pk)
+    return webhooks
+
+
+def deliver(webhook_pk):
+    """Deliver the webhook's pending events, returning how many seconds to wait
+    before delivering again if there are more events to deliver, or None
+    """
+    lock = f"assignments:webhook:{webhook_pk}:lock"
+    if not cache.add(lock, True, LOCK_TIMEOUT):
+        # another worker is delivering
+        return None
+    try:
+        webhook = Webhook.objects.filter(pk=webhook_pk, active=True).first()
+        if webhook is None or (webhook.retry_at and webhook.retry_at > timezone.now()):
+            return None
+        for _ in range(settings.ASSIGNMENT_WEBHOOK_MAX_BATCHES):
+            events = list(
+                WebhookEvent.objects.filter(
+                    assignment=webhook.assignment_id, pk__gt=webhook.cursor
+                ).order_by("pk")[: settings.ASSIGNMENT_WEBHOOK_BATCH_SIZE]
+            )
+            if not events:
+                return None
+            try:
+                post(webhook, events)
+            except requests.exceptions.RequestException as exc:
+                return _failed(webhook, exc)
+            webhook.cursor = events[-1].pk
+            webhook.failures = 0
+            webhook.retry_at = None
+            webhook.last_error = ""
+            webhook.save(update_fields=["cursor", "failures", "retry_at", "last_error"])
+        # there may be more events, which are delivered by a new task, to stay
+        # within the time limit
+        return 0
+    finally:
+        cache.delete(lock)
+
+
+def post(webhook, events):
+    """Post the events to the webhook's URL, signed with its secret"""
+    try:
+        validate_public_url(webhook.url)
+    except ValidationError as exc:
+        raise requests.exceptions.InvalidURL(exc.messages[0])
+    body = json.dumps(
+        {
+            "webhook": webhook.pk,
+            "assignment": webhook.assignment_id,
+            "cursor": events[-1].pk,
+            "events": serialize_events(webhook.assignment_id, events),
+        },
+        cls=DjangoJSONEncoder,
+    ).encode("utf8")
+    timestamp = str(int(timezone.now().timestamp()))
+    response = requests.post(
+        webhook.url,
+        data=body,
+        headers={
+            "Content-Type": "application/json",
+            "X-SpotUs-Timestamp": timestamp,
+            "X-SpotUs-Signature": sign(webhook.secret, timestamp, body),
+        },
+        timeout=settings.ASSIGNMENT_WEBHOOK_TIMEOUT,
+        allow_redirects=False,
+    )
+    response.raise_for_status()
+
+
+def sign(secret, timestamp, body):
+    """The signature of a delivery, which receivers may check by signing the
+    timestamp and body the same way
+    """
+    message = timestamp.encode("utf8") + b"." + body
+    return (
+        "sha256=" + hmac.new(secret.encode("utf8"), message, hashlib.sha256).hexdigest()
+    )
+
+
+def serialize_events(assignment_pk, events):
+    """The events, with their responses as they are now"""
+    responses = (
+        Response.objects.filter(
+            assignment=assignment_pk,
+            pk__in={e.response_id for e in events},
+            skip=False,
+        )
+        .select_related("data", "user", "edit_user")
+        .prefetch_related("tags")
+    )
+    responses = {r["id"]: r for r in ResponseAdminSerializer(responses, many=True).data}
+    # responses which have since been deleted or archived are left out
+    return [
+        {
+            "id": event.pk,
+            "type": WebhookEventType.attributes[event.type],
+            "datetime": event.datetime,
+            "response": responses[event.response_id],
+        }
+        for event in events
+        if event.response_id in responses
+    ]
+
+
+def prune_events():
+    """Delete the events older than `ASSIGNMENT_WEBHOOK_EVENT_DAYS`, in
+    batches, returning how many were deleted
+    """
+    cutoff = timezone.now() - timedelta(days=settings.ASSIGNMENT_WEBHOOK_EVENT_DAYS)
+    total = 0
+    while True:
+        pks = list(
+            WebhookEvent.objects.filter(datetime__lt=cutoff).values_list(
+                "pk", flat=True
+            )[:PRUNE_BATCH_SIZE]
+        )
+        if not pks:
+            return total
+        total += WebhookEvent.objects.filter(pk__in=pks).delete()[0]
+
+
+def _describe_error(exc):
+    """Describe a failed delivery for the webhook's owner, without any of the
+    response or the error, which could reveal other hosts
+    """
+    if isinstance(exc, requests.exceptions.HTTPError):
+        return f"The URL responded with status {exc.response.status_code}"
+    elif isinstance(exc, requests.exceptions.InvalidURL):
+        return f"The URL may not be used: {exc}"
+    elif isinstance(exc, requests.exceptions.Timeout):
+        return "The URL did not respond in time"
+    elif isinstance(exc, requests.exceptions.ConnectionError):
+        return "Could not connect to the URL"
+    else:
+        return "The delivery failed"
+
+
+def _failed(webhook, exc):
+    """Back off after a failed delivery, or deactivate the webhook after too
+    many, returning how many seconds to wait before retrying
+    """
+    logger.warning("Could not deliver webhook %s: %s", webhook.pk, exc)
+    webhook.failures += 1
+    webhook.last_error = _describe_error(exc)
+    if webhook.failures >= settings.ASSIGNMENT_WEBHOOK_MAX_FAILURES:
+        webhook.active = False
+        webhook.retry_at = None
+        delay = None
+    else:
+        delay = min(RETRY_DELAY * 2 ** (webhook.failures - 1), MAX_RETRY_DELAY)
+        webhook.retry_at = timezone.now() + timedelta(seconds=delay)
+    webhook.save(update_fields=["failures", "last_error", "active", "retry_at"])
+    return delay
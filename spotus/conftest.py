@@ -1,7 +1,17 @@
+# Django
+from django.core.cache import cache
+
+# Standard Library
+from unittest.mock import patch
+
 # Third Party
+import fakeredis
 import pytest
 
 # SpotUs
+from spotus.assignments.tests.budgets import BUDGETS
+from spotus.core.querycount import QueryBudget
+from spotus.core.redis import get_redis
 from spotus.users.models import User
 from spotus.users.tests.factories import UserFactory
 
@@ -11,6 +21,60 @@ def media_storage(settings, tmpdir):
     settings.MEDIA_ROOT = tmpdir.strpath
 
 
+@pytest.fixture(autouse=True)
+def fake_redis():
+    """Use a fake Redis server"""
+    conn = fakeredis.FakeRedis()
+    get_redis.cache_clear()
+    with patch("redis.Redis.from_url", return_value=conn):
+        yield conn
+    get_redis.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Do not share cached values, such as analytics or delivery locks, between
+    tests
+    """
+    cache.clear()
+
+
+# the budgets used by this test run, to report how much of each was used
+_query_budgets = []
+
+
+@pytest.fixture
+def query_budget():
+    """Get a budget from the registry by name, which is enforced on the block
+    it is used as a context manager for
+    """
+    budgets = []
+
+    def get_budget(name):
+        budget = QueryBudget(name, *BUDGETS[name])
+        budgets.append(budget)
+        return budget
+
+    yield get_budget
+    _query_budgets.extend(budgets)
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Report how many queries each budget's block made, so that budgets may be
+    lowered after improvements
+    """
+    if not _query_budgets:
+        return
+    terminalreporter.section("query budgets")
+    used = {}
+    for budget in _query_budgets:
+        used[budget.name] = max(used.get(budget.name, 0), len(budget))
+    for name, queries in sorted(used.items()):
+        terminalreporter.write_line(
+            f"{name}: {queries} of {BUDGETS[name].queries} queries"
+        )
+
+
 @pytest.fixture
 def user() -> User:
     return UserFactory()
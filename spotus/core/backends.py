@@ -0,0 +1,27 @@
+"""
+Custom authentication backends
+"""
+
+# Third Party
+from rules.permissions import ObjectPermissionBackend
+
+
+class CachedObjectPermissionBackend(ObjectPermissionBackend):
+    """Rules based object permissions, caching the results on the user object
+
+    The user is loaded once per request, so permission checks are only run
+    once per permission and object for each request.
+    """
+
+    def has_perm(self, user, perm, *args, **kwargs):
+        obj = args[0] if args else kwargs.get("obj")
+        if obj is not None and obj.pk is None:
+            return super().has_perm(user, perm, *args, **kwargs)
+        if obj is None:
+            key = (perm, None, None)
+        else:
+            key = (perm, obj._meta.label, obj.pk)
+        cache = user.__dict__.setdefault("_perm_cache_rules", {})
+        if key not in cache:
+            cache[key] = super().has_perm(user, perm, *args, **kwargs)
+        return cache[key]
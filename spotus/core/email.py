@@ -15,12 +15,15 @@ class TemplateEmail(EmailMultiAlternatives):
     """
     The TemplateEmail class provides a base for our transactional emails.  It
     supports sending a templated email to a user and providing extra template
-    context.  It always adds a diagnostic email as a BCC'd address.  A HTML
+    context.  It adds a diagnostic email as a BCC'd address, unless
+    `bcc_diagnostics` is False, such as for emails sent in bulk.  A HTML
     template should be provided by subclasses or instances.  The summary
     attribute is blank by default and is a hack to populate the "email preview"
     display within some (not all) email clients.  Subjects are expected to be
     provided at initialization, however a subclass may provide a static subject
-    attribute if it is provided to the super __init__ method as as kwarg.
+    attribute if it is provided to the super __init__ method as as kwarg.  The
+    html and text may be provided already rendered, to send the same email to
+    many users without rendering it for each of them.
     """
 
     user = None
@@ -33,6 +36,9 @@ class TemplateEmail(EmailMultiAlternatives):
         extra_context = kwargs.pop("extra_context", None)
         html_template = kwargs.pop("html_template", None)
         summary = kwargs.pop("summary", None)
+        html = kwargs.pop("html", None)
+        text = kwargs.pop("text", None)
+        bcc_diagnostics = kwargs.pop("bcc_diagnostics", True)
         # Initialize the base class
         super().__init__(**kwargs)
 
@@ -45,11 +51,13 @@ class TemplateEmail(EmailMultiAlternatives):
         if html_template:
             self.html_template = html_template
 
-        context = self.get_context_data(extra_context)
-        html = render_to_string(self.html_template, context)
+        if html is None:
+            context = self.get_context_data(extra_context)
+            html = render_to_string(self.html_template, context)
 
-        self.bcc.append(settings.DIAGNOSTICS_EMAIL)
-        self.body = html2text(html)
+        if bcc_diagnostics:
+            self.bcc.append(settings.DIAGNOSTICS_EMAIL)
+        self.body = html2text(html) if text is None else text
         self.attach_alternative(html, "text/html")
 
     def get_context_data(self, extra_context):
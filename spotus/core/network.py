@@ -0,0 +1,44 @@
+"""
+Checks for URLs the site requests on behalf of its users, such as webhooks, so
+they may not be used to reach the site's own network
+"""
+
+# Django
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+# Standard Library
+import ipaddress
+import socket
+from urllib.parse import urlsplit
+
+SCHEMES = ("http", "https")
+
+
+def is_public_address(address):
+    """Is the IP address reachable on the public internet"""
+    # the zone of a link local IPv6 address is not part of the address
+    address = ipaddress.ip_address(address.split("%")[0])
+    return address.is_global and not address.is_multicast
+
+
+def validate_public_url(url):
+    """Validate that the URL is http or https, and that its host only resolves
+    to public addresses, unless private URLs are allowed, for development
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in SCHEMES or not parts.hostname:
+        raise ValidationError("Enter an http or https URL")
+    if settings.ALLOW_PRIVATE_URLS:
+        return
+    try:
+        addresses = {
+            info[4][0]
+            for info in socket.getaddrinfo(
+                parts.hostname, None, type=socket.SOCK_STREAM
+            )
+        }
+    except (socket.gaierror, UnicodeError):
+        raise ValidationError("The URL's host could not be found")
+    if not all(is_public_address(a) for a in addresses):
+        raise ValidationError("The URL's host must be on the public internet")
@@ -1,9 +1,9 @@
 """
-Provides a pagination class for the API
+Provides pagination classes for the API
 """
 
 # Django
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class StandardPagination(PageNumberPagination):
@@ -12,3 +12,29 @@ class StandardPagination(PageNumberPagination):
     page_size = 50
     max_page_size = 200
     page_size_query_param = "page_size"
+
+
+class StandardCursorPagination(CursorPagination):
+    """Cursor based pagination, for walking deep into large result sets
+
+    This does not count the results and does not use offsets, so the cost of
+    fetching a page does not grow with how far into the results it is.
+    Subclasses may set `orderings` to a map of allowed values for the
+    `ordering` query parameter to the fields to order by.  The cursor is
+    positioned by the first field of the ordering alone, skipping past any
+    earlier results with the same value, so the first field should be unique or
+    nearly unique.  Later fields only keep the order stable between pages.
+    """
+
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = "page_size"
+    ordering_query_param = "ordering"
+    orderings = {"id": ("id",), "-id": ("-id",)}
+    ordering = ("id",)
+
+    def get_ordering(self, request, queryset, view):
+        """Allow the ordering to be chosen from the whitelisted orderings"""
+        return self.orderings.get(
+            request.query_params.get(self.ordering_query_param), self.ordering
+        )
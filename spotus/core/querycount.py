@@ -0,0 +1,86 @@
+"""
+Counting the queries made by a block of code
+
+Queries are recorded on every database connection, as some views read from the
+replica, and may be summarized by fingerprint, their SQL with the values left
+out, so that a query repeated for each row stands out.
+"""
+
+# Django
+from django.db import connections
+
+# Standard Library
+import re
+from collections import Counter
+from contextlib import ExitStack
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+# the selected columns, which are long and rarely tell queries apart
+COLUMNS_RE = re.compile(r"^SELECT (DISTINCT )?.+? FROM ")
+
+
+def fingerprint(sql):
+    """The query with its values replaced, so that queries which only differ
+    in their values have the same fingerprint
+    """
+    sql = " ".join(sql.replace("%s", "?").split())
+    sql = STRING_RE.sub("?", sql)
+    sql = NUMBER_RE.sub("?", sql)
+    sql = LIST_RE.sub("(...)", sql)
+    return COLUMNS_RE.sub(r"SELECT \1... FROM ", sql)
+
+
+class CountQueries:
+    """Record the SQL of each query made inside this block"""
+
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self._record))
+        return self
+
+    def __exit__(self, *exc):
+        self._stack.close()
+
+    def __len__(self):
+        return len(self.queries)
+
+    def _record(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def fingerprints(self):
+        """Each fingerprint and how many times it was queried, most often first"""
+        return Counter(fingerprint(q) for q in self.queries).most_common()
+
+
+class QueryBudget(CountQueries):
+    """Fail if this block makes more queries than the budget allows, listing
+    the queries it made by fingerprint
+    """
+
+    def __init__(self, name, queries, size):
+        super().__init__()
+        self.name = name
+        self.budget = queries
+        self.size = size
+
+    def __exit__(self, exc_type, *exc):
+        super().__exit__(exc_type, *exc)
+        if exc_type is None and len(self) > self.budget:
+            raise AssertionError(self.report())
+
+    def report(self):
+        """Describe the queries made over the budget"""
+        lines = [
+            f"{self.name} made {len(self)} queries at size {self.size}, "
+            f"over its budget of {self.budget}:"
+        ]
+        lines.extend(f"{count:>5} x {sql}" for sql, count in self.fingerprints())
+        return "\n".join(lines)
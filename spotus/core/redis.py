@@ -0,0 +1,19 @@
+"""
+Redis connection shared by features which use Redis directly, rather than
+through the cache
+"""
+
+# Django
+from django.conf import settings
+
+# Standard Library
+from functools import lru_cache
+
+# Third Party
+import redis
+
+
+@lru_cache(maxsize=None)
+def get_redis():
+    """The Redis connection"""
+    return redis.Redis.from_url(settings.REDIS_URL)
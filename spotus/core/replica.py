@@ -0,0 +1,108 @@
+"""
+Read replica database routing
+
+Reads go to the primary database unless they are made inside `use_replica`,
+which the read heavy views and tasks which tolerate some replication lag are
+wrapped in.  So that users see their own submissions and edits, any request
+which writes pins the user to the primary with a cookie for a short time,
+during which their requests to replica views read from the primary.
+"""
+
+# Django
+from django.conf import settings
+
+# Standard Library
+from contextlib import ContextDecorator
+from functools import wraps
+from threading import local
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+_state = local()
+
+
+class use_replica(ContextDecorator):
+    """Send reads to the replica inside this block or function
+    If the replica is not configured, reads stay on the primary
+    """
+
+    # pylint: disable=invalid-name
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+
+    def __enter__(self):
+        # save the previous state, so blocks may be nested
+        self.previous = getattr(_state, "replica", False)
+        _state.replica = self.enabled
+
+    def __exit__(self, *exc):
+        _state.replica = self.previous
+
+
+def replica_view(view_func):
+    """Send the view's reads to the replica, unless the user is pinned to
+    the primary
+    """
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if hasattr(request, "user"):
+            # load the session and user from the primary first, as they may
+            # have just been created by logging in
+            request.user.is_authenticated  # pylint: disable=pointless-statement
+        with use_replica(enabled=not is_pinned(request)):
+            return view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+def is_pinned(request):
+    """Has the user written recently enough that they should read from
+    the primary
+    """
+    return settings.REPLICA_PIN_COOKIE in request.COOKIES
+
+
+class PinPrimaryMiddleware:
+    """Pin users to the primary for a short time after any request which
+    may have written to the database
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+            )
+        return response
+
+
+class ReplicaRouter:
+    """Route reads inside `use_replica` to the replica, and everything else to
+    the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        """Use the replica if enabled and configured"""
+        if settings.REPLICA_DATABASE and getattr(_state, "replica", False):
+            return settings.REPLICA_DATABASE
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        """Always write to the primary"""
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """The replica has the same data as the primary"""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """The replica is migrated by replication"""
+        return db == "default"
@@ -1,4 +1,188 @@
+"""Tests for the core app"""
+
 # Django
-from django.test import TestCase
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import router
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+# Standard Library
+from unittest.mock import patch
+
+# Third Party
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+# SpotUs
+from spotus.assignments.choices import Status
+from spotus.assignments.models import Assignment
+from spotus.assignments.tests.factories import AssignmentFactory
+from spotus.core.network import validate_public_url
+from spotus.core.querycount import QueryBudget, fingerprint
+from spotus.core.replica import PinPrimaryMiddleware, replica_view, use_replica
+from spotus.core.throttle import (
+    get_throttled_counts,
+    is_throttled,
+    parse_rate,
+    validate_rate,
+)
+
+
+class TestThrottle:
+    """Test the token bucket rate limiting"""
+
+    def test_parse_rate(self):
+        """Rates are parsed to a number and period in seconds"""
+        assert parse_rate("10/minute") == (10, 60)
+        assert parse_rate("5/s") == (5, 1)
+        with pytest.raises(ValidationError):
+            parse_rate("10 a minute")
+        with pytest.raises(ValidationError):
+            validate_rate("0/day")
+
+    def test_is_throttled(self):
+        """Requests are throttled once the bucket is empty, and allowed again
+        once it has refilled
+        """
+        with patch("spotus.core.throttle.time", return_value=1000):
+            assert not is_throttled("throttle:test", "2/minute", "test")
+            assert not is_throttled("throttle:test", "2/minute", "test")
+            assert is_throttled("throttle:test", "2/minute", "test")
+            assert not is_throttled("throttle:other", "2/minute", "test")
+        with patch("spotus.core.throttle.time", return_value=1030):
+            assert not is_throttled("throttle:test", "2/minute", "test")
+            assert is_throttled("throttle:test", "2/minute", "test")
+        assert get_throttled_counts() == {"test": 2}
+
+    def test_redis_error(self, fake_redis):
+        """Requests are allowed if Redis is unavailable"""
+        with patch.object(
+            fake_redis, "evalsha", side_effect=RedisConnectionError
+        ), patch.object(fake_redis, "eval", side_effect=RedisConnectionError):
+            assert not is_throttled("throttle:test", "1/minute", "test")
+            assert not is_throttled("throttle:test", "1/minute", "test")
+
+
+def read_db():
+    """The database reads are currently routed to"""
+    return Assignment.objects.all().db
+
+
+class TestReplicaRouter:
+    """Test routing reads to the replica"""
+
+    def test_use_replica(self, settings):
+        """Reads inside use_replica go to the replica, and writes never do"""
+        settings.REPLICA_DATABASE = "replica"
+        assert read_db() == "default"
+        with use_replica():
+            assert read_db() == "replica"
+            assert router.db_for_write(Assignment) == "default"
+            with use_replica(enabled=False):
+                assert read_db() == "default"
+            assert read_db() == "replica"
+        assert read_db() == "default"
+
+    def test_not_configured(self):
+        """Reads stay on the primary if there is no replica"""
+        with use_replica():
+            assert read_db() == "default"
+
+    def test_replica_view(self, rf, settings):
+        """Views read from the replica unless the user is pinned"""
+        settings.REPLICA_DATABASE = "replica"
+        view = replica_view(lambda request: read_db())
+        assert view(rf.get("/")) == "replica"
+        request = rf.get("/")
+        request.COOKIES[settings.REPLICA_PIN_COOKIE] = "1"
+        assert view(request) == "default"
+
+    def test_pin_middleware(self, rf, settings):
+        """Successful writes pin the user to the primary"""
+        middleware = PinPrimaryMiddleware(lambda request: HttpResponse(status=302))
+        response = middleware(rf.post("/"))
+        assert response.cookies[settings.REPLICA_PIN_COOKIE]["max-age"] == (
+            settings.REPLICA_PIN_SECONDS
+        )
+        assert settings.REPLICA_PIN_COOKIE not in middleware(rf.get("/")).cookies
+        middleware = PinPrimaryMiddleware(lambda request: HttpResponse(status=400))
+        assert settings.REPLICA_PIN_COOKIE not in middleware(rf.post("/")).cookies
+
+
+class TestNetwork:
+    """Test checking URLs are public"""
+
+    @pytest.mark.parametrize(
+        "url, address, valid",
+        [
+            ("https://example.com/hook", "93.184.216.34", True),
+            ("ftp://example.com/hook", "93.184.216.34", False),
+            ("http://example.com/hook", "10.0.0.1", False),
+            ("http://example.com/hook", "127.0.0.1", False),
+            ("http://example.com/hook", "169.254.169.254", False),
+            ("http://example.com/hook", "fe80::1%eth0", False),
+            ("http://example.com/hook", "::ffff:127.0.0.1", False),
+        ],
+    )
+    def test_validate_public_url(self, settings, url, address, valid):
+        """Only http and https URLs resolving to public addresses are valid"""
+        settings.ALLOW_PRIVATE_URLS = False
+        with patch(
+            "spotus.core.network.socket.getaddrinfo",
+            return_value=[(None, None, None, "", (address, 0))],
+        ):
+            if valid:
+                validate_public_url(url)
+            else:
+                with pytest.raises(ValidationError):
+                    validate_public_url(url)
+
+
+class TestQueryCount:
+    """Test counting queries against budgets"""
+
+    def test_fingerprint(self):
+        """Queries which only differ in their values have the same fingerprint"""
+        sql = (
+            'SELECT "a"."id", "a"."name" FROM "a" WHERE "a"."id" IN (%s, %s) '
+            "AND \"a\".\"name\" = 'it''s'  LIMIT 21"
+        )
+        assert fingerprint(sql) == (
+            'SELECT ... FROM "a" WHERE "a"."id" IN (...) AND "a"."name" = ? LIMIT ?'
+        )
+
+    @pytest.mark.django_db
+    def test_budget(self):
+        """Blocks which make more queries than their budget fail, listing them"""
+        with QueryBudget("test", queries=1, size=1) as budget:
+            Assignment.objects.count()
+        assert len(budget) == 1
+        with pytest.raises(AssertionError, match='2 x SELECT ... FROM "assignments_'):
+            with QueryBudget("test", queries=1, size=1):
+                Assignment.objects.count()
+                Assignment.objects.count()
+
+
+@override_settings(REPLICA_DATABASE="replica")
+class TestReplicaDatabase(TestCase):
+    """Test reading from a second database
+
+    The replica is a separate connection to the test database, so it does not
+    see data written inside the test's transaction, as with replication lag
+    """
+
+    databases = {"default", "replica"}
 
-# Create your tests here.
+    def test_lag(self):
+        """Replica views do not see unreplicated writes, unless the user has
+        just written
+        """
+        assignment = AssignmentFactory(status=Status.open)
+        url = reverse("assignments:list")
+        response = self.client.get(url)
+        assert assignment not in response.context["object_list"]
+        self.client.cookies[settings.REPLICA_PIN_COOKIE] = "1"
+        response = self.client.get(url)
+        assert assignment in response.context["object_list"]
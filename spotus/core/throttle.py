@@ -0,0 +1,122 @@
+"""
+Token bucket rate limiting, backed by Redis
+
+Each bucket holds up to a rate's number of tokens, and refills continuously
+over the rate's period.  Each request takes a token, and is throttled if the
+bucket is empty, which allows short bursts while limiting the sustained rate.
+The bucket is checked and updated by a Lua script, so each check is a single
+round trip to Redis.  Throttled requests are counted per day, by metric name.
+"""
+
+# Django
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from rest_framework.throttling import BaseThrottle
+
+# Standard Library
+import logging
+from time import time
+
+# Third Party
+from redis.exceptions import RedisError
+
+# SpotUs
+from spotus.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+METRICS_KEY = "throttle:throttled:{}"
+METRICS_TIMEOUT = 30 * 24 * 60 * 60
+
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "time")
+local tokens = tonumber(bucket[1]) or capacity
+local last = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+else
+  redis.call("HINCRBY", KEYS[2], ARGV[4], 1)
+  redis.call("EXPIRE", KEYS[2], ARGV[5])
+end
+redis.call("HMSET", KEYS[1], "tokens", tokens, "time", now)
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+return allowed
+"""
+
+
+def parse_rate(rate):
+    """Parse a rate such as 10/minute into the number of requests and the
+    period in seconds
+    """
+    try:
+        num, period = rate.split("/")
+        return int(num), PERIODS[period[0]]
+    except (ValueError, KeyError, IndexError):
+        raise ValidationError(
+            "Invalid rate %(rate)s, should be a number per second, minute, "
+            "hour or day, such as 10/minute",
+            params={"rate": rate},
+        )
+
+
+def validate_rate(rate):
+    """Validate a rate"""
+    num, _ = parse_rate(rate)
+    if num < 1:
+        raise ValidationError("The rate must allow at least one request")
+
+
+def is_throttled(key, rate, metric):
+    """Take a token from the bucket with the given key, returning True if the
+    request should be throttled
+
+    If Redis is unavailable, requests are allowed rather than failing
+    """
+    num, period = parse_rate(rate)
+    script = get_redis().register_script(TOKEN_BUCKET_SCRIPT)
+    try:
+        allowed = script(
+            keys=[key, METRICS_KEY.format(timezone.now().date().isoformat())],
+            args=[num, num / period, time(), metric, METRICS_TIMEOUT],
+        )
+    except RedisError:
+        logger.warning("Could not check the rate limit for %s", key, exc_info=True)
+        return False
+    if not allowed:
+        logger.info("Throttled %s for %s", metric, key)
+    return not allowed
+
+
+def get_throttled_counts(date=None):
+    """The number of throttled requests on the given day, by metric"""
+    if date is None:
+        date = timezone.now().date()
+    counts = get_redis().hgetall(METRICS_KEY.format(date.isoformat()))
+    return {metric.decode(): int(count) for metric, count in counts.items()}
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """API throttle for a view's scope, by user or IP address"""
+
+    rate = None
+
+    def allow_request(self, request, view):
+        if request.user.is_authenticated:
+            ident = "user:{}".format(request.user.pk)
+        else:
+            ident = "ip:{}".format(self.get_ident(request))
+        scope = getattr(view, "throttle_scope", view.__class__.__name__)
+        return not is_throttled(
+            "throttle:{}:{}".format(scope, ident), self.get_rate(view), scope
+        )
+
+    def get_rate(self, view):
+        """The rate for the view"""
+        return getattr(view, "throttle_rate", self.rate)
@@ -348,11 +348,27 @@ $(document).ready(function(){
         }
       });
     });
+    function bulkUpdate(checkboxes, changes) {
+      // Apply the changes to all of the given responses in one request
+      changes.ids = checkboxes.map(function(){
+        return $(this).data("assignment");
+      }).get();
+      $.ajax({
+        url: "/api/assignment-responses/bulk/",
+        type: "POST",
+        contentType: "application/json",
+        data: JSON.stringify(changes)
+      });
+    }
     $('.flag-all').click(function(){
-      $('.flag-checkbox').prop('checked', $(this).prop('checked')).change();
+      var checked = $(this).prop('checked');
+      bulkUpdate($('.flag-checkbox').prop('checked', checked), {'flag': checked});
     });
     $('.gallery-all').click(function(){
-      $('.gallery-checkbox').prop('checked', $(this).prop('checked')).change();
+      var checked = $(this).prop('checked');
+      bulkUpdate(
+        $('.gallery-checkbox').prop('checked', checked), {'gallery': checked}
+      );
     });
     $('.message-link').click(function(e){
       e.preventDefault();
@@ -0,0 +1,230 @@
+/* embed.js
+**
+** Renders an embedded assignment form client side from the JSON API.
+** The form schema is cacheable, so only fetching the data to show is dynamic.
+** The form is submitted to the embedded form view as a normal form post.
+*/
+
+(function() {
+
+  var REGISTRATION_REQUIRED = 0,
+    REGISTRATION_OFF = 1,
+    STATUS_OPEN = 1;
+
+  function el(tag, attrs, text) {
+    // Create an element with the given attributes and text
+    var element = document.createElement(tag);
+    for (var name in attrs || {}) {
+      if (attrs[name] !== null && attrs[name] !== undefined && attrs[name] !== false) {
+        element.setAttribute(name, attrs[name] === true ? "" : attrs[name]);
+      }
+    }
+    if (text) {
+      element.textContent = text;
+    }
+    return element;
+  }
+
+  function sub(text, metadata) {
+    // Swap in template tags from the data's metadata
+    if (!text || !metadata) {
+      return text;
+    }
+    return text.replace(/\{\s*(\w+)\s*\}/g, function(match, key) {
+      return metadata.hasOwnProperty(key) ? metadata[key] : match;
+    });
+  }
+
+  function fieldWrapper(id, label, required) {
+    // The wrapper for a form field, matching lib/pattern/field.html
+    var wrapper = el("div", {"class": "field"}),
+      header = el("header");
+    header.appendChild(el("label", {"for": id}, label));
+    if (required) {
+      header.appendChild(el("span", {"class": "required"}, "Required"));
+    }
+    wrapper.appendChild(header);
+    return wrapper;
+  }
+
+  function renderField(field, metadata) {
+    var id = "id_" + field.name,
+      label = sub(field.label, metadata),
+      required = field.required && field.type !== "checkbox2",
+      wrapper, input;
+
+    if (field.type === "header") {
+      return el("h2", {}, label);
+    }
+    if (field.type === "paragraph") {
+      return el("p", {}, label);
+    }
+
+    wrapper = fieldWrapper(id, label, required);
+    if (field.type === "select") {
+      input = el("select", {"id": id, "name": field.name, "required": required});
+      field.values.forEach(function(choice) {
+        input.appendChild(el("option", {"value": choice.value}, choice.label));
+      });
+    } else if (field.type === "checkbox-group") {
+      input = el("ul", {"id": id});
+      field.values.forEach(function(choice, i) {
+        var item = el("li"),
+          choiceLabel = el("label", {"for": id + "_" + i});
+        choiceLabel.appendChild(el("input", {
+          "type": "checkbox",
+          "name": field.name,
+          "value": choice.value,
+          "id": id + "_" + i
+        }));
+        choiceLabel.appendChild(document.createTextNode(" " + choice.label));
+        item.appendChild(choiceLabel);
+        input.appendChild(item);
+      });
+    } else if (field.type === "textarea") {
+      input = el("textarea", {
+        "id": id, "name": field.name, "required": required, "maxlength": 2000
+      });
+    } else if (field.type === "checkbox2") {
+      input = el("input", {"type": "checkbox", "id": id, "name": field.name});
+    } else if (field.type === "number") {
+      input = el("input", {
+        "type": "number",
+        "step": "any",
+        "id": id,
+        "name": field.name,
+        "required": required,
+        "min": field.min,
+        "max": field.max
+      });
+    } else if (field.type === "date") {
+      input = el("input", {
+        "type": "date",
+        "id": id,
+        "name": field.name,
+        "required": required
+      });
+    } else {
+      input = el("input", {
+        "type": "text", "id": id, "name": field.name, "required": required
+      });
+    }
+    wrapper.appendChild(input);
+    if (field.description) {
+      wrapper.appendChild(
+        el("p", {"class": "help-text"}, sub(field.description, metadata))
+      );
+    }
+    return wrapper;
+  }
+
+  function renderForm(container, schema, datum) {
+    var data = datum.data,
+      metadata = data ? data.metadata : null,
+      open = schema.status === STATUS_OPEN,
+      wrapper = el("div", {"class": "assignment form"}),
+      header = el("header", {"class": "assignment-form__header"}),
+      description = el("div"),
+      inputs = el("div", {"class": "assignment-form__inputs"}),
+      form = el("form", {"method": "post", "action": schema.submit_url}),
+      buttons = el("div", {"class": "buttons"}),
+      required;
+
+    header.appendChild(el("h1", {}, schema.title));
+    // the description is rendered from markdown and sanitized server side
+    description.innerHTML = schema.description;
+    header.appendChild(description);
+    wrapper.appendChild(header);
+
+    if (!datum.has_assignment) {
+      inputs.appendChild(el("p", {},
+        "Sorry, there are no assignments left for you to complete at this " +
+        "time for this assignment"
+      ));
+      wrapper.appendChild(inputs);
+      container.appendChild(wrapper);
+      return;
+    }
+
+    form.appendChild(el("input", {
+      "type": "hidden", "name": "embed_token", "value": datum.embed_token
+    }));
+    if (data) {
+      form.appendChild(el("input", {
+        "type": "hidden", "name": "data_id", "value": data.id
+      }));
+    }
+    schema.fields.forEach(function(field) {
+      form.appendChild(renderField(field, metadata));
+    });
+    // visitors in embeds are always anonymous, as our cookies are not sent
+    if (schema.registration !== REGISTRATION_OFF) {
+      required = schema.registration === REGISTRATION_REQUIRED;
+      form.appendChild(fieldWrapper("id_full_name", "Full Name or Handle (Public)", required))
+        .appendChild(el("input", {
+          "type": "text", "id": "id_full_name", "name": "full_name", "required": required
+        }));
+      form.appendChild(fieldWrapper("id_email", "Email", required))
+        .appendChild(el("input", {
+          "type": "email", "id": "id_email", "name": "email", "required": required
+        }));
+    }
+    if (schema.ask_public) {
+      form.appendChild(fieldWrapper("id_public", "Publicly credit you", false))
+        .appendChild(el("input", {"type": "checkbox", "id": "id_public", "name": "public"}));
+    }
+
+    buttons.appendChild(el("input", {
+      "type": "submit", "name": "submit", "value": "Submit",
+      "class": "blue button", "disabled": !open
+    }));
+    if (schema.multiple_per_page) {
+      buttons.appendChild(el("input", {
+        "type": "submit", "name": "submit", "value": "Submit and Add Another",
+        "class": "blue button", "disabled": !open
+      }));
+    }
+    if (data) {
+      buttons.appendChild(el("input", {
+        "type": "submit", "name": "submit", "value": "Skip",
+        "class": "button", "formnovalidate": true, "disabled": !open
+      }));
+    }
+    form.appendChild(buttons);
+    inputs.appendChild(form);
+    wrapper.appendChild(inputs);
+
+    if (data && data.embed) {
+      var embed = el("div", {"class": "assignment-form__data"});
+      // the embed html comes from oEmbed providers, as in the server side form
+      embed.innerHTML = data.embed;
+      wrapper.appendChild(embed);
+    }
+    container.appendChild(wrapper);
+  }
+
+  function getJSON(url, options) {
+    return fetch(url, options).then(function(response) {
+      if (!response.ok) {
+        throw new Error(response.statusText);
+      }
+      return response.json();
+    });
+  }
+
+  var container = document.getElementById("assignment-embed");
+  if (container) {
+    Promise.all([
+      // the schema may come from the browser or CDN cache
+      getJSON(container.dataset.formUrl),
+      getJSON(container.dataset.datumUrl, {"cache": "no-store"})
+    ]).then(function(results) {
+      renderForm(container, results[0], results[1]);
+    }).catch(function() {
+      container.appendChild(el("p", {},
+        "Sorry, this assignment could not be loaded.  Please try again later."
+      ));
+    });
+  }
+
+})();